@@ -0,0 +1,99 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+# =======================================
+# AsyncHTTPClient.get_url使用预编译ApiTemplate前后的对比
+# legacy_get_url为预编译之前每次调用都格式化并检查_api_prefix/_api_name/_api_suffix的实现
+# python benchmark/bench_get_url.py [number]
+# =======================================
+
+import os
+import sys
+import timeit
+from typing import Optional
+from urllib.parse import urlencode
+
+from pydantic import BaseModel
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from omi_async_http_client._model import RequestModel
+from omi_async_http_client.async_http_client import APIClient
+from omi_async_http_client.fastapi_testclient_backend import FastAPITestClientBackend
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="/tenants/{tenant}", api_suffix="detail")
+class TenantResource(BaseModel):
+    id: Optional[str]
+
+
+def legacy_get_url(client, opt_id=None, extra_params=None, model=None):
+    params = dict({"client_id": client.client_id})
+    if opt_id is not None:
+        params = {**params, **{k: v for k, v in opt_id.items() if v is not None and str(v) not in ["", "/", "?", "="]}}
+    if extra_params is not None:
+        params = {
+            **params,
+            **{k: v for k, v in extra_params.items() if v is not None and str(v) not in ["", "/", "?", "="]},
+        }
+    if model is None:
+        model = client.model
+    api_name = getattr(model, "_api_name", "")
+    assert api_name, "A api name can not be blank or nothing."
+    api_name = api_name.format(**params)
+    prefix = getattr(model, "_api_prefix", "")
+    prefix = prefix.format(**params)
+    suffix = getattr(model, "_api_suffix", "")
+    suffix = suffix.format(**params)
+    assert not api_name.endswith("/"), "A api name must not end with '/'"
+    assert not prefix.endswith("/"), "A api suffix must not end with '/'"
+    assert not suffix.endswith("/"), "A api suffix must not end with '/'"
+    if client.resource_endpoint.endswith("/"):
+        if prefix and prefix.startswith("/"):
+            prefix = prefix[1:]
+    else:
+        if prefix and not prefix.startswith("/"):
+            prefix = "/" + prefix
+    if api_name != "" and not api_name.startswith("/"):
+        api_name = "/" + api_name
+    if suffix != "" and not suffix.startswith("/"):
+        suffix = "/" + suffix
+    return f"{client.resource_endpoint}{prefix}{api_name}{suffix}?{urlencode(params)}"
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    client = APIClient(model=TenantResource,
+                       app=None,
+                       http_backend=FastAPITestClientBackend(test_client=None),
+                       client_id="client_id",
+                       client_secret="client_secret",
+                       resource_endpoint="http://localhost:8003/mock")
+    opt_id = {"id": "1"}
+    extra_params = {"tenant": "t1", "name": "alpha"}
+
+    # 两种实现必须生成相同的url，保证对比的是同一个结果
+    assert legacy_get_url(client, opt_id, extra_params) == client.get_url(opt_id, extra_params)
+    legacy = timeit.timeit(lambda: legacy_get_url(client, opt_id, extra_params), number=number)
+    compiled = timeit.timeit(lambda: client.get_url(opt_id, extra_params), number=number)
+    print(f"legacy_get_url   : {legacy / number * 1e6:.2f} us/call  {legacy_get_url(client, opt_id, extra_params)}")
+    print(f"compiled get_url : {compiled / number * 1e6:.2f} us/call  {client.get_url(opt_id, extra_params)}")
+    print(f"speed-up         : {legacy / compiled:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+# =======================================
+# HttpxClientBackend HTTP/1.1连接池与HTTP/2多路复用模式的对比
+# 使用hypercorn启动mock_fastapi作为支持h2c的本地服务
+# pip install hypercorn h2
+# python benchmark/bench_httpx_http2.py [concurrency] [rounds]
+# =======================================
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from omi_async_http_client._model import RequestModel
+from omi_async_http_client.async_http_client import APIClient
+from omi_async_http_client.httpx_backend import HttpxClientBackend
+
+HOST = "127.0.0.1"
+PORT = 8013
+BASE_URL = f"http://{HOST}:{PORT}"
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="/mock", api_suffix="")
+class ResourceID(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+    description: Optional[str]
+
+
+def start_server(config_file):
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    # hypercorn默认每个连接处理1000个请求后发送GOAWAY，压测时取消该限制
+    config_file.write(b"keep_alive_max_requests = 100000000\n")
+    config_file.flush()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "hypercorn", "mock_fastapi:app",
+         "--bind", f"{HOST}:{PORT}", "--config", config_file.name],
+        cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    time.sleep(2)
+    return process
+
+
+async def run(http2: bool, concurrency: int, rounds: int):
+    backend = HttpxClientBackend(http2=http2, config={"HTTP2_PRIOR_KNOWLEDGE": True})
+    client = APIClient(model=ResourceID,
+                       http_backend=backend,
+                       client_id="client_id",
+                       client_secret="client_secret",
+                       resource_endpoint=BASE_URL)
+    # 预热连接
+    await client.retrieve(opt_id={"id": "1"})
+
+    peak = {"connections": 0, "streams_per_connection": 0.0}
+
+    async def sample():
+        while True:
+            stats = backend.get_connection_stats()
+            peak["connections"] = max(peak["connections"], stats["connections"])
+            peak["streams_per_connection"] = max(peak["streams_per_connection"], stats["streams_per_connection"])
+            await asyncio.sleep(0.001)
+
+    sampler = asyncio.ensure_future(sample())
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*[
+            client.retrieve(opt_id={"id": str(i % 5 + 1)}) for i in range(concurrency)
+        ])
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    stats = backend.get_connection_stats()
+    await client.close()
+
+    total = concurrency * rounds
+    print(f"{'HTTP/2  ' if http2 else 'HTTP/1.1'} requests={total} elapsed={elapsed:.3f}s "
+          f"rps={total / elapsed:.0f} peak_connections={peak['connections']} "
+          f"peak_streams_per_connection={peak['streams_per_connection']:.1f} "
+          f"http2_connections={stats['http2_connections']}")
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.NamedTemporaryFile(suffix=".toml") as config_file:
+        server = start_server(config_file)
+        try:
+            asyncio.run(run(http2=False, concurrency=concurrency, rounds=rounds))
+            asyncio.run(run(http2=True, concurrency=concurrency, rounds=rounds))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
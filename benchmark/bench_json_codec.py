@@ -0,0 +1,93 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+# =======================================
+# backend使用的JSON codec对比
+# legacy为替换之前json.dumps(data)后再由HTTP库转换为bytes，以及response.json()解码的方式
+# 使用1条，100条，10000条资源记录模拟小，中，大三种payload
+# python benchmark/bench_json_codec.py [seconds]
+# =======================================
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from omi_async_http_client._codec import OrjsonCodec, StdlibJSONCodec, orjson
+
+PAYLOAD_SIZES = [1, 100, 10000]
+
+
+def build_payload(size):
+    return {
+        "code": 0,
+        "detail": [
+            {
+                "id": str(i),
+                "name": f"resource-{i}",
+                "description": "description of resource " * 4,
+                "tags": ["alpha", "bravo", "charlie"],
+                "score": i * 0.5,
+                "enabled": i % 2 == 0,
+            }
+            for i in range(size)
+        ],
+        "page": 1,
+        "limit": size,
+    }
+
+
+def legacy_encode(obj):
+    return json.dumps(obj).encode("utf-8")
+
+
+def legacy_decode(data):
+    return json.loads(data.decode("utf-8"))
+
+
+def measure(func, seconds):
+    # 先估算单次耗时，再按照时间预算决定执行次数
+    number = max(int(seconds / max(timeit.timeit(func, number=1), 1e-7)), 1)
+    return timeit.timeit(func, number=number) / number
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    codecs = [("legacy", legacy_encode, legacy_decode)]
+    for codec in [StdlibJSONCodec()] + ([OrjsonCodec()] if orjson is not None else []):
+        codecs.append((codec.name, codec.encode, codec.decode))
+    if orjson is None:
+        print("orjson is not installed, pip install orjson to compare it")
+
+    for size in PAYLOAD_SIZES:
+        payload = build_payload(size)
+        body = legacy_encode(payload)
+        print(f"records={size} bytes={len(body)}")
+        baseline = None
+        for name, encode, decode in codecs:
+            encoded = measure(lambda: encode(payload), seconds)
+            decoded = measure(lambda: decode(body), seconds)
+            total = encoded + decoded
+            baseline = baseline or total
+            print(f"  {name:<8} encode {encoded * 1e6:10.2f} us  decode {decoded * 1e6:10.2f} us  "
+                  f"speed-up {baseline / total:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,10 @@
 from typing import Optional
+import hashlib
+import json
 import secrets
 import uvicorn
-from fastapi import FastAPI, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel,Field
 
 from omi_async_http_client import RequestModel
@@ -95,10 +97,20 @@ def resources_get_all():
 
 
 @app.get("/mock/resources")
-def resources_get(name: Optional[str]):
+def resources_get(name: Optional[str] = None, id: Optional[str] = None):
+    if id is not None:
+        # batch retrieve, eg. /mock/resources?id=1,2,3
+        ids = id.split(",")
+        return JSONResponse(
+            status_code=200,
+            content={
+                "code": 100,
+                "message": "success",
+                "detail": [item for item in resources if item["id"] in ids]
+            })
     resp = []
     for item in resources:
-        if item["name"].find(name) > -1:
+        if item["name"].find(name or "") > -1:
             resp.append(item)
     if len(resp) > 0:
         return JSONResponse(
@@ -117,6 +129,30 @@ def resources_get(name: Optional[str]):
             })
 
 
+@app.get("/mock/paged_resources")
+def resources_get_paged(page: int = 1, size: int = 2, with_total: bool = True):
+    # paged retrieve, eg. /mock/paged_resources?page=1&size=2
+    total_pages = (len(resources) + size - 1) // size
+    if page < 1 or page > total_pages:
+        return JSONResponse(
+            status_code=404,
+            content={
+                "code": 101,
+                "message": "not found",
+                "detail": {}
+            })
+    content = {
+        "status": "success",
+        "page": page,
+        "has_next": page < total_pages,
+        "count": len(resources),
+        "resources": resources[(page - 1) * size:page * size]
+    }
+    if with_total:
+        content["total_pages"] = total_pages
+    return JSONResponse(status_code=200, content=content)
+
+
 @app.get("/mock/resources/{id}")
 def resources_get_by_id(id: str):
     if id == "500":
@@ -147,6 +183,42 @@ def resources_get_by_id(id: str):
         })
 
 
+@app.get("/mock/versioned_resources/{id}")
+def resources_get_versioned(id: str, request: Request):
+    # conditional retrieve with ETag/Last-Modified
+    for item in resources:
+        if item["id"] == id:
+            headers = {
+                "ETag": '"%s"' % hashlib.md5(json.dumps(item, sort_keys=True).encode()).hexdigest(),
+                "Last-Modified": "Wed, 21 Oct 2020 07:28:00 GMT",
+            }
+            if request.headers.get("If-None-Match") == headers["ETag"]:
+                return Response(status_code=304, headers=headers)
+            return JSONResponse(status_code=200, content=item, headers=headers)
+    return JSONResponse(
+        status_code=404,
+        content={
+            "code": 101,
+            "message": "not found",
+            "detail": {}
+        })
+
+
+@app.get("/mock/cached_resources/{id}")
+def resources_get_cached(id: str, cache_control: str = "max-age=60"):
+    # retrieve with Cache-Control, eg. /mock/cached_resources/1?cache_control=max-age=0,stale-while-revalidate=60
+    for item in resources:
+        if item["id"] == id:
+            return JSONResponse(status_code=200, content=item, headers={"Cache-Control": cache_control})
+    return JSONResponse(
+        status_code=404,
+        content={
+            "code": 101,
+            "message": "not found",
+            "detail": {}
+        })
+
+
 @app.put("/mock/resources/{id}")
 def resources_put(id: str, resource: Resource, username = Depends(get_current_username)):
     for item in resources:
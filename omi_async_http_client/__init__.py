@@ -15,14 +15,38 @@ limitations under the License.
 
 """
 
+from ._cache import CacheEntry, ResponseCache, MemoryResponseCache
 from ._exceptions import HTTPException
 from ._model import *
+from ._registry import BackendRegistry, backend_registry
+from ._sqlite_cache import SQLiteResponseCache
 from ._status_code import status_codes, StatuCode
 from .async_http_client import APIClient
+from .async_http_client import APIClientFactory
+from .async_http_client import api_client_factory
 from .async_http_client import AsyncHTTPClientBackend
 from .async_http_client import AsyncHTTPClientContext
 from .async_http_client import AsyncHttpClientSession
 
-from .aiohttp_backend import AioHttpClientBackend
-from .fastapi_testclient_backend import FastAPITestClientBackend
-from .requests_backend import RequestsClientBackend
+# backend依赖aiohttp，requests，FastAPI TestClient等第三方库，首次访问时才导入，保持import omi_async_http_client的开销最小
+_LAZY_BACKENDS = {
+    "AioHttpClientBackend": ".aiohttp_backend",
+    "FastAPITestClientBackend": ".fastapi_testclient_backend",
+    "HttpxClientBackend": ".httpx_backend",
+    "RequestsClientBackend": ".requests_backend",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_BACKENDS.get(name, None)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # 缓存到模块中，之后的访问不再经过__getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_BACKENDS))
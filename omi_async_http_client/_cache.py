@@ -0,0 +1,593 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import time
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from ._singleflight import SingleFlight
+
+
+class CacheEntry:
+    """
+    ResponseCache中的缓存项，保存Retrieve操作返回的response内容
+    key - str, 缓存key
+    path - str, 请求url的path部分，用于按资源路径失效缓存
+    status_code - int, 响应代码
+    response - Dict, 响应内容
+    size - int, 响应内容的估算字节数
+    stored_at - float, 写入时间，time.time()
+    expires_at - float, 过期时间，time.time()
+    stale_while_revalidate - float, 过期后仍可直接使用并在后台刷新的时间，单位：秒
+    stale_if_error - float, 过期后刷新发生错误时仍可使用的时间，单位：秒
+    delta - float, 获取response所用的时间，单位：秒，用于判断是否提前刷新
+    """
+
+    __slots__ = ("key", "path", "status_code", "response", "size", "stored_at", "expires_at",
+                 "stale_while_revalidate", "stale_if_error", "delta")
+
+    def __init__(
+            self,
+            key: str,
+            path: str,
+            status_code: int,
+            response: Dict,
+            size: int = 0,
+            stored_at: float = None,
+            expires_at: float = None,
+            stale_while_revalidate: float = 0,
+            stale_if_error: float = 0,
+            delta: float = 0,
+    ):
+        self.key = key
+        self.path = path
+        self.status_code = status_code
+        self.response = response
+        self.size = size
+        self.stored_at = time.time() if stored_at is None else stored_at
+        self.expires_at = self.stored_at if expires_at is None else expires_at
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.delta = delta
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    @property
+    def discard_at(self) -> float:
+        """
+        缓存项完全不可用的时间，包括过期后的stale时间
+        """
+        return self.expires_at + max(self.stale_while_revalidate, self.stale_if_error)
+
+    def is_fresh(self, max_age: Optional[float] = None) -> bool:
+        """
+        缓存项是否仍然有效
+        max_age - (Optional) float, 可以接受的最大缓存时间，单位：秒，超过时视为无效
+        """
+        now = time.time()
+        if now >= self.expires_at:
+            return False
+        return max_age is None or now - self.stored_at <= max_age
+
+    def should_refresh_early(self, beta: float = 1.0) -> bool:
+        """
+        按照XFetch算法(probabilistic early expiration)判断是否提前刷新仍然有效的缓存项，
+        越接近过期时间，获取response所用的时间(delta)越长，提前刷新的概率越高
+        beta - float, 提前刷新的倾向，大于1时更早刷新，小于等于0时不提前刷新
+        """
+        if beta <= 0 or self.delta <= 0:
+            return False
+        return time.time() - self.delta * beta * math.log(1.0 - random.random()) >= self.expires_at
+
+    def is_stale_while_revalidate(self) -> bool:
+        """
+        缓存项已过期，但仍在stale-while-revalidate时间内，可以直接使用并在后台刷新
+        """
+        return time.time() < self.expires_at + self.stale_while_revalidate
+
+    def is_stale_if_error(self) -> bool:
+        """
+        缓存项已过期，但仍在stale-if-error时间内，刷新发生错误时可以继续使用
+        """
+        return time.time() < self.expires_at + self.stale_if_error
+
+    def to_record(self) -> List:
+        """
+        转换为写入快照文件的记录
+        """
+        return [self.key, self.path, self.status_code, self.response, self.stored_at, self.expires_at,
+                self.stale_while_revalidate, self.stale_if_error, self.delta]
+
+    @classmethod
+    def from_record(cls, record: List, size: int = 0) -> "CacheEntry":
+        """
+        从快照文件的记录创建缓存项，@See to_record
+        """
+        key, path, status_code, response, stored_at, expires_at, stale_while_revalidate, stale_if_error, delta = record
+        return cls(key=key, path=path, status_code=status_code, response=response, size=size, stored_at=stored_at,
+                   expires_at=expires_at, stale_while_revalidate=stale_while_revalidate,
+                   stale_if_error=stale_if_error, delta=delta)
+
+    def __repr__(self) -> str:
+        class_name = self.__class__.__name__
+        return f"{class_name}(key={self.key!r},status_code={self.status_code!r},expires_at={self.expires_at!r})"
+
+
+class CachePolicy:
+    """
+    根据响应头Cache-Control得到的缓存策略
+    ttl - float, 缓存的有效时间，单位：秒
+    stale_while_revalidate - float, 过期后仍可直接使用并在后台刷新的时间，单位：秒
+    stale_if_error - float, 过期后刷新发生错误时仍可使用的时间，单位：秒
+    """
+
+    __slots__ = ("ttl", "stale_while_revalidate", "stale_if_error")
+
+    def __init__(self, ttl: float, stale_while_revalidate: float = 0, stale_if_error: float = 0):
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+
+    def __repr__(self) -> str:
+        class_name = self.__class__.__name__
+        return f"{class_name}(ttl={self.ttl!r},stale_while_revalidate={self.stale_while_revalidate!r}," \
+               f"stale_if_error={self.stale_if_error!r})"
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    解析Cache-Control响应头，返回指令名称(小写)和值的Dict，没有值的指令值为None
+    Usage::
+    #    >>> parse_cache_control('max-age=60, stale-while-revalidate=30, private')
+    #    {'max-age': '60', 'stale-while-revalidate': '30', 'private': None}
+    """
+    directives = {}
+    if not value:
+        return directives
+    for directive in value.split(","):
+        name, _, argument = directive.strip().partition("=")
+        if not name:
+            continue
+        directives[name.strip().lower()] = argument.strip().strip('"') if argument else None
+    return directives
+
+
+def get_seconds(directives: Dict[str, Optional[str]], name: str) -> Optional[float]:
+    """
+    读取Cache-Control中以秒为单位的指令值，不存在或格式错误时返回None
+    """
+    try:
+        return max(float(directives[name]), 0)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def open_snapshot_file(path: str, mode: str):
+    """
+    打开gzip压缩的快照文件，gzip在第一次使用快照时才导入，不影响import omi_async_http_client的耗时
+    """
+    import gzip
+    return gzip.open(path, mode, encoding="utf-8")
+
+
+class ResponseCache:
+    """
+    AsyncHTTPClient.retrieve使用的response缓存接口，缓存key由model类型，不含rnd的url，header和auth身份组成
+    ttl - float, 缓存的有效时间，单位：秒
+    vary_headers - (Optional) Iterable[str], 参与构建缓存key的header名称，默认使用全部header
+    shared - bool, 是否为多个用户共享的缓存，共享缓存不保存Cache-Control为private的响应，默认False
+    Memo::
+        fetch_lock用于缓存未命中时的请求锁，相同key同一时间只有一个请求刷新缓存，其他调用等待并共享结果，
+        多个client共享同一个ResponseCache实例时，请求锁同样在client之间共享，
+        快照文件由open_snapshot/close_snapshot按缓存实例管理，每个快照文件只读取一次，最后一个使用者关闭时保存
+    """
+    __metaclass__ = ABCMeta
+
+    DEFAULT_TTL = 60
+    DEFAULT_SNAPSHOT_BATCH_SIZE = 1000
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, ttl: float = DEFAULT_TTL, vary_headers: Optional[Iterable[str]] = None, shared: bool = False):
+        self.ttl = ttl
+        self.shared = shared
+        self.vary_headers = None if vary_headers is None else {name.lower() for name in vary_headers}
+        # 命中和未命中次数由使用者按是否采用缓存项计数，get返回的缓存项可能因为max_age等原因不被采用
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.early_refreshes = 0
+        self.fetch_lock = SingleFlight()
+        self._snapshot_users = {}
+
+    @property
+    def stampedes_avoided(self) -> int:
+        """
+        缓存未命中时，调用方等待其他调用的刷新结果而没有重复请求的次数，不包括预热和后台刷新
+        """
+        return self.fetch_lock.shared
+
+    @property
+    def background_joins(self) -> int:
+        """
+        预热和后台刷新加入正在进行的刷新而没有重复请求的次数
+        """
+        return self.fetch_lock.background_shared
+
+    @property
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stampedes_avoided": self.stampedes_avoided,
+            "background_joins": self.background_joins,
+            "early_refreshes": self.early_refreshes,
+        }
+
+    def make_key(self, model: Any, url: str, header: Optional[Dict], auth: Any) -> str:
+        """
+        构建缓存key，格式为"{model} {url} {principal} {digest}"
+        principal为auth中的username，digest为header和auth内容的摘要，避免在key中保存client_secret等敏感信息
+        """
+        model_name = f"{model.__module__}.{model.__qualname__}" if isinstance(model, type) else str(model)
+        headers = sorted(
+            (str(k).lower(), str(v)) for k, v in (header or {}).items()
+            if self.vary_headers is None or str(k).lower() in self.vary_headers
+        )
+        if isinstance(auth, Dict):
+            principal = str(auth.get("username", ""))
+            auths = sorted((str(k), str(v)) for k, v in auth.items())
+        else:
+            principal = ""
+            auths = repr(auth)
+        digest = hashlib.sha256(repr((headers, auths)).encode("utf-8")).hexdigest()[:32]
+        return f"{model_name} {url} {principal} {digest}"
+
+    def create_entry(self, key: str, url: str, status_code: int, response: Dict,
+                     ttl: Optional[float] = None, policy: Optional[CachePolicy] = None, delta: float = 0) -> CacheEntry:
+        """
+        使用response创建缓存项，ttl不指定时使用缓存的ttl
+        policy - (Optional) CachePolicy, 根据响应头得到的缓存策略，指定时优先于ttl
+        delta - float, 获取response所用的时间，单位：秒
+        """
+        stored_at = time.time()
+        if policy is not None:
+            ttl = policy.ttl
+        return CacheEntry(
+            key=key,
+            path=urlsplit(url).path,
+            status_code=status_code,
+            response=response,
+            size=self.estimate_size(response),
+            stored_at=stored_at,
+            expires_at=stored_at + (self.ttl if ttl is None else ttl),
+            stale_while_revalidate=policy.stale_while_revalidate if policy is not None else 0,
+            stale_if_error=policy.stale_if_error if policy is not None else 0,
+            delta=delta,
+        )
+
+    def get_cache_policy(self, headers: Optional[Dict]) -> Optional[CachePolicy]:
+        """
+        根据响应头Cache-Control得到缓存策略，响应不允许缓存时返回None
+            no-store - 不缓存
+            private - 共享缓存(shared=True)不缓存
+            no-cache - 缓存，但每次使用前都需要重新请求
+            s-maxage/max-age - 缓存的有效时间，共享缓存优先使用s-maxage，都没有指定时使用缓存的ttl
+            stale-while-revalidate/stale-if-error - 过期后仍可使用的时间
+        """
+        headers = {str(k).lower(): v for k, v in (headers or {}).items()}
+        if "cache-control" not in headers:
+            return CachePolicy(ttl=self.ttl)
+        directives = parse_cache_control(headers["cache-control"])
+        if "no-store" in directives or (self.shared and "private" in directives):
+            return None
+        ttl = get_seconds(directives, "s-maxage") if self.shared else None
+        if ttl is None:
+            ttl = get_seconds(directives, "max-age")
+        if "no-cache" in directives:
+            ttl = 0
+        elif ttl is None:
+            ttl = self.ttl
+        return CachePolicy(
+            ttl=ttl,
+            stale_while_revalidate=get_seconds(directives, "stale-while-revalidate") or 0,
+            stale_if_error=get_seconds(directives, "stale-if-error") or 0,
+        )
+
+    def estimate_size(self, response: Dict) -> int:
+        """
+        估算response的字节数，用于按容量淘汰缓存，默认返回0，即不统计
+        """
+        return 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        获取缓存项，不存在或已超过stale时间时返回None，已过期但仍在stale时间内的缓存项也会返回，由调用方判断是否可用
+        """
+
+    @abstractmethod
+    async def set(self, key: str, entry: CacheEntry):
+        """
+        写入缓存项
+        """
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """
+        删除缓存项
+        """
+
+    @abstractmethod
+    async def clear(self):
+        """
+        清空缓存
+        """
+
+    @abstractmethod
+    def iter_entries(self) -> AsyncIterator[CacheEntry]:
+        """
+        遍历缓存中的全部缓存项，包括已过期但仍在stale时间内的缓存项，不影响命中统计和LRU顺序
+        """
+
+    async def set_many(self, entries: List[CacheEntry]):
+        """
+        批量写入缓存项，默认逐个调用set
+        """
+        for entry in entries:
+            await self.set(entry.key, entry)
+
+    async def dump(self, path: str, batch_size: int = DEFAULT_SNAPSHOT_BATCH_SIZE) -> int:
+        """
+        将缓存内容保存到快照文件，返回保存的缓存项数量，
+        快照为gzip压缩的JSON lines格式，第一行为快照信息，之后每行为一个缓存项
+        path - str, 快照文件的路径，先写入临时文件，完成后替换，写入过程中不会破坏原有的快照
+        batch_size - int, 每次写入文件的缓存项数量，每批之间让出event loop
+        """
+        loop = asyncio.get_event_loop()
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        snapshot = await loop.run_in_executor(None, open_snapshot_file, temp_path, "wt")
+        count = 0
+        try:
+            await loop.run_in_executor(None, snapshot.write, json.dumps(
+                {"version": self.SNAPSHOT_VERSION, "created_at": time.time()}) + "\n")
+            lines = []
+            async for entry in self.iter_entries():
+                lines.append(json.dumps(entry.to_record(), separators=(",", ":"), default=str))
+                if len(lines) >= batch_size:
+                    await loop.run_in_executor(None, snapshot.write, "\n".join(lines) + "\n")
+                    count += len(lines)
+                    lines = []
+            if lines:
+                await loop.run_in_executor(None, snapshot.write, "\n".join(lines) + "\n")
+                count += len(lines)
+        finally:
+            await loop.run_in_executor(None, snapshot.close)
+        await loop.run_in_executor(None, os.replace, temp_path, path)
+        return count
+
+    async def load(self, path: str, limit: Optional[int] = None,
+                   batch_size: int = DEFAULT_SNAPSHOT_BATCH_SIZE) -> int:
+        """
+        从快照文件读取缓存项写入缓存，跳过已超过stale时间的缓存项，返回写入的缓存项数量
+        path - str, 快照文件的路径
+        limit - (Optional) int, 最多读取的缓存项数量，用于限制缓存占用，默认全部读取，
+            快照按最久未使用的顺序保存，设置limit时保留快照末尾即最近使用的limit个缓存项
+        batch_size - int, 每次从文件读取的缓存项数量，文件读取在executor中执行，每批之间让出event loop，
+            读取大的快照文件时不会长时间阻塞event loop
+        Exceptions::
+            ValueError, 快照文件的格式或版本不正确时抛出
+        """
+        loop = asyncio.get_event_loop()
+        snapshot = await loop.run_in_executor(None, open_snapshot_file, path, "rt")
+        count = 0
+        try:
+            header = json.loads(await loop.run_in_executor(None, snapshot.readline) or "{}")
+            if header.get("version", None) != self.SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported response cache snapshot {path}")
+            # 设置limit时只保留最后limit行，不解析前面较久未使用的缓存项
+            records = None if limit is None else deque(maxlen=limit)
+            while True:
+                lines = await loop.run_in_executor(None, lambda: list(itertools.islice(snapshot, batch_size)))
+                if not lines:
+                    break
+                if records is None:
+                    count += await self.load_records(lines)
+                else:
+                    records.extend(lines)
+            if records:
+                records = list(records)
+                for start in range(0, len(records), batch_size):
+                    count += await self.load_records(records[start:start + batch_size])
+        finally:
+            await loop.run_in_executor(None, snapshot.close)
+        return count
+
+    async def load_records(self, lines: List[str]) -> int:
+        """
+        将快照中的缓存项写入缓存，跳过已超过stale时间的缓存项，返回写入的缓存项数量，@See load
+        """
+        now = time.time()
+        entries = []
+        for line in lines:
+            record = json.loads(line)
+            entry = CacheEntry.from_record(record, size=self.estimate_size(record[3]))
+            if entry.discard_at > now:
+                entries.append(entry)
+        await self.set_many(entries)
+        return len(entries)
+
+    def close(self):
+        """
+        释放缓存持有的连接等资源，由AsyncHTTPClient.close调用，默认不需要释放
+        Memo::
+            关闭后仍然可以继续使用，需要时重新获取资源，多个client共享同一个缓存时互不影响
+        """
+
+    async def open_snapshot(self, path: str, limit: Optional[int] = None) -> Optional[int]:
+        """
+        登记一个快照文件的使用者，第一个使用者打开时从快照文件读取缓存内容，返回读取的缓存项数量，
+        快照已经被其他使用者读取或文件不存在时返回None
+        path - str, 快照文件的路径
+        limit - (Optional) int, 最多读取的缓存项数量，@See load
+        Memo::
+            使用者登记后再读取，读取失败时也需要调用close_snapshot
+        Exceptions::
+            OSError, ValueError, 快照文件无法读取或格式不正确时抛出
+        """
+        users = self._snapshot_users.get(path, 0)
+        self._snapshot_users[path] = users + 1
+        if users > 0 or not os.path.exists(path):
+            return None
+        return await self.load(path, limit=limit)
+
+    async def close_snapshot(self, path: str) -> Optional[int]:
+        """
+        注销一个快照文件的使用者，最后一个使用者关闭时将缓存内容保存到快照文件，返回保存的缓存项数量，
+        仍有其他使用者或没有登记的使用者时返回None
+        path - str, 快照文件的路径
+        """
+        users = self._snapshot_users.get(path, 0)
+        if users <= 0:
+            return None
+        if users > 1:
+            self._snapshot_users[path] = users - 1
+            return None
+        del self._snapshot_users[path]
+        return await self.dump(path)
+
+    @abstractmethod
+    async def invalidate_path(self, path: str, include_descendants: bool = True) -> int:
+        """
+        删除url的path部分为path的缓存项，返回删除的条数
+        include_descendants - bool, 是否同时删除path下级路径的缓存项，例如path为/resources时同时删除/resources/1
+        """
+
+    @staticmethod
+    def match_path(entry_path: str, path: str, include_descendants: bool = True) -> bool:
+        """
+        判断缓存项的path是否与path相同，或者是path的下级路径
+        """
+        path = path.rstrip("/") or "/"
+        entry_path = entry_path.rstrip("/") or "/"
+        if entry_path == path:
+            return True
+        return include_descendants and entry_path.startswith(path if path.endswith("/") else path + "/")
+
+
+class MemoryResponseCache(ResponseCache):
+    """
+    使用内存保存的ResponseCache，支持TTL过期，按条数和字节数的LRU淘汰
+    ttl - float, 缓存的有效时间，单位：秒，默认60
+    max_entries - int, 最大缓存条数，默认1024
+    max_bytes - (Optional) int, 缓存内容的最大字节数，按response序列化为JSON后的长度估算，默认不限制
+    vary_headers - (Optional) Iterable[str], 参与构建缓存key的header名称，默认使用全部header
+    shared - bool, 是否为多个用户共享的缓存，默认False
+    Usage::
+    #    >>> cache = MemoryResponseCache(ttl=30, max_entries=10000, max_bytes=64 * 1024 * 1024)
+    #    >>> client = APIClient(model=Staff, ..., config={"RESPONSE_CACHE": cache})
+    """
+
+    DEFAULT_MAX_ENTRIES = 1024
+
+    def __init__(
+            self,
+            ttl: float = ResponseCache.DEFAULT_TTL,
+            max_entries: int = DEFAULT_MAX_ENTRIES,
+            max_bytes: Optional[int] = None,
+            vary_headers: Optional[Iterable[str]] = None,
+            shared: bool = False,
+    ):
+        super().__init__(ttl=ttl, vary_headers=vary_headers, shared=shared)
+        assert max_entries > 0, "max_entries must be greater than 0"
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> Dict:
+        return {
+            **super().stats,
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+        }
+
+    def estimate_size(self, response: Dict) -> int:
+        if self.max_bytes is None:
+            return 0
+        return len(json.dumps(response, separators=(",", ":"), default=str))
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key, None)
+        if entry is not None and time.time() >= entry.discard_at:
+            self._remove(key)
+            entry = None
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self.total_bytes += entry.size
+        # 按LRU顺序淘汰超出容量的缓存项
+        while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+
+    async def clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
+
+    async def iter_entries(self) -> AsyncIterator[CacheEntry]:
+        # 按LRU顺序遍历，读取快照时最近使用的缓存项最后写入
+        for entry in list(self._entries.values()):
+            yield entry
+
+    async def invalidate_path(self, path: str, include_descendants: bool = True) -> int:
+        keys = [key for key, entry in self._entries.items() if self.match_path(entry.path, path, include_descendants)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.size
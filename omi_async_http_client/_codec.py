@@ -0,0 +1,123 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+import json
+from abc import ABCMeta, abstractmethod
+from typing import Any, Union
+
+from pydantic import BaseModel
+
+
+def load_orjson():
+    """
+    返回orjson模块，未安装时返回None，orjson在第一次使用时才导入，不影响import omi_async_http_client的耗时
+    """
+    try:
+        import orjson
+    except ImportError:  # pragma: no cover
+        return None
+    return orjson
+
+
+def default_serializer(obj: Any) -> Any:
+    """
+    JSON编码时处理内置类型以外的对象，BaseModel转换为Dict
+    """
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+class JSONCodec:
+    """
+    backend编码请求body和解码响应内容使用的JSON codec，encode直接返回bytes，避免str到bytes的额外复制
+    """
+    __metaclass__ = ABCMeta
+
+    name = ""
+
+    @abstractmethod
+    def encode(self, obj: Any) -> bytes:
+        """
+        将obj编码为UTF-8的JSON bytes
+        """
+
+    @abstractmethod
+    def decode(self, data: Union[bytes, str]) -> Any:
+        """
+        解码JSON内容，data为空时返回None
+        """
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+class StdlibJSONCodec(JSONCodec):
+    """
+    使用标准库json的codec
+    """
+    name = "json"
+
+    def __init__(self):
+        # 复用同一个JSONEncoder，避免json.dumps在传入参数时每次创建新的encoder
+        self._encoder = json.JSONEncoder(separators=(",", ":"), default=default_serializer)
+
+    def encode(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj).encode("utf-8")
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        if not data:
+            return None
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    使用orjson的codec，需要安装orjson
+    """
+    name = "orjson"
+
+    def __init__(self):
+        self._orjson = load_orjson()
+        if self._orjson is None:
+            raise ValueError("orjson is not installed, pip install orjson")
+
+    def encode(self, obj: Any) -> bytes:
+        # 与标准库json一致，允许int，float，bool，None等非str的Dict key
+        return self._orjson.dumps(obj, default=default_serializer, option=self._orjson.OPT_NON_STR_KEYS)
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        if not data:
+            return None
+        return self._orjson.loads(data)
+
+
+def get_codec(codec: Union[str, JSONCodec, None] = None) -> JSONCodec:
+    """
+    返回JSON codec
+    codec - Union[str, JSONCodec, None], JSONCodec实例直接返回；"json"使用标准库；"orjson"使用orjson，
+        未安装时抛出ValueError；None或"auto"在安装了orjson时使用orjson，否则使用标准库
+    """
+    if isinstance(codec, JSONCodec):
+        return codec
+    name = (codec or "auto").lower()
+    if name == "auto":
+        return OrjsonCodec() if load_orjson() is not None else StdlibJSONCodec()
+    if name in ("json", "stdlib"):
+        return StdlibJSONCodec()
+    if name == "orjson":
+        return OrjsonCodec()
+    raise ValueError('Cannot resolve json codec %s' % codec)
@@ -0,0 +1,183 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Type
+
+from ._exceptions import HTTPException
+from ._model import get_collection_model
+from ._status_code import status_codes
+
+
+class RetrieveBatchLoader:
+    """
+    DataLoader风格的按ID批量获取，在一个时间窗口内收集多个协程的load(id)调用，
+    合并为一次集合资源的请求，例如：GET /resources?id=1,2,3，再将结果按ID拆分给各个调用者。
+    client - AsyncHTTPClient, 发起请求使用的client
+    id_key - str, default = "id", 资源ID的参数名称，同时用于在返回的资源列表中匹配ID
+    batch_model - (Optional) Type, 集合资源使用的model，默认使用get_collection_model(client.model)，
+        即去掉client.model的_api_name末尾的"/{id_key}"得到
+    batch_window - float, default = 0, 收集load调用的时间窗口，单位：秒，0表示只收集当前event loop的一个tick
+    max_batch_size - int, default = 100, 单次请求包含的ID数量上限，达到上限时立即发起请求
+    items_key - str, default = "detail", 集合资源响应中资源列表对应的字段
+    separator - str, default = ",", 拼接多个ID使用的分隔符
+    Memo::
+        集合资源响应中没有包含的ID，会对相应的调用者抛出404 HTTPException
+        同一个窗口内相同ID的多次调用只会请求一次，共享响应中的资源内容，每个调用者各自创建结果对象
+        同一批次使用收集到的调用中最长的timeout
+    Usage::
+    #    >>> loader = RetrieveBatchLoader(client, id_key="id")
+    #    >>> alpha, bravo = await asyncio.gather(loader.load("1"), loader.load("2"))
+    """
+
+    DEFAULT_MAX_BATCH_SIZE = 100
+
+    def __init__(
+            self,
+            client,
+            id_key: str = "id",
+            batch_model: Optional[Type] = None,
+            batch_window: float = 0,
+            max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+            items_key: str = "detail",
+            separator: str = ",",
+            timeout=None,
+    ):
+        assert max_batch_size > 0, "max_batch_size must be greater than 0"
+        self.client = client
+        self.id_key = id_key
+        self.batch_model = batch_model or get_collection_model(client.model)
+        assert self.batch_model is not None, "batch_model is required when the model has no collection resource"
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.items_key = items_key
+        self.separator = separator
+        self.timeout = timeout or client.DEFAULT_HTTP_REQUEST_TIMEOUT
+        self._queue: Dict[str, List[asyncio.Future]] = {}
+        self._queue_timeout = None
+        self._handle = None
+        # 执行中的批量请求，event loop只持有task的弱引用，需要保留引用避免请求过程中被回收
+        self._tasks = set()
+        self.batches = 0
+
+    def can_load(self, opt_id: Optional[Dict]) -> bool:
+        """
+        opt_id是否只包含id_key，可以使用当前loader获取
+        """
+        return bool(opt_id) and len(opt_id) == 1 and opt_id.get(self.id_key, None) is not None
+
+    async def load(self, id_value: Any, timeout=None) -> Any:
+        """
+        获取指定ID的资源，返回client.model类型的对象
+        id_value - Any, 资源ID
+        timeout - (Optional) int, 请求的超时设置，默认使用loader的timeout
+
+        Exceptions:
+            HTTPException, 资源不存在时抛出404，集合资源请求失败时抛出相应的异常
+        """
+        item = await self.enqueue(id_value, timeout)
+        return self.client.model(**item)
+
+    async def load_response(self, id_value: Any, timeout=None) -> Dict:
+        """
+        获取指定ID的资源，返回集合资源响应中该资源的内容Dict，用于写入client的response_cache
+        @See load
+        """
+        return await self.enqueue(id_value, timeout)
+
+    async def enqueue(self, id_value: Any, timeout=None):
+        """
+        将ID加入当前批次，返回集合资源响应中该资源的内容Dict
+        """
+        key = str(id_value)
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._queue.setdefault(key, []).append(future)
+        timeout = timeout or self.timeout
+        self._queue_timeout = timeout if self._queue_timeout is None else max(self._queue_timeout, timeout)
+        if len(self._queue) >= self.max_batch_size:
+            self.dispatch()
+        elif self._handle is None:
+            if self.batch_window > 0:
+                self._handle = loop.call_later(self.batch_window, self.dispatch)
+            else:
+                self._handle = loop.call_soon(self.dispatch)
+        return await future
+
+    async def load_many(self, id_values: List[Any]) -> List[Any]:
+        return list(await asyncio.gather(*[self.load(id_value) for id_value in id_values]))
+
+    def dispatch(self):
+        """
+        立即将当前收集的ID作为一个批次发起请求
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch = self._queue
+        timeout = self._queue_timeout
+        self._queue = {}
+        self._queue_timeout = None
+        if batch:
+            task = asyncio.ensure_future(self.batch_load(batch, timeout))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """
+        立即发起已收集的批次，并等待执行中的批量请求完成，由client的shutdown调用
+        """
+        self.dispatch()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def batch_load(self, batch: Dict[str, List[asyncio.Future]], timeout=None):
+        self.batches += 1
+        try:
+            url = self.client.get_url(
+                extra_params={self.id_key: self.separator.join(batch.keys())},
+                model=self.batch_model,
+            )
+            response_dict = await self.client.get_response_dict(
+                url, self.client.get_headers(), self.client.get_auth(), timeout or self.timeout
+            )
+            items = {
+                str(item.get(self.id_key)): item
+                for item in (response_dict or {}).get(self.items_key, None) or []
+                if isinstance(item, Dict)
+            }
+        except Exception as e:
+            for futures in batch.values():
+                self.set_result(futures, exception=e)
+            return
+
+        for key, futures in batch.items():
+            item = items.get(key, None)
+            if item is None:
+                self.set_result(futures, exception=HTTPException(status_code=status_codes.NOT_FOUND))
+            else:
+                self.set_result(futures, result=item)
+
+    @staticmethod
+    def set_result(futures: List[asyncio.Future], result: Any = None, exception: Exception = None):
+        for future in futures:
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
@@ -0,0 +1,162 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+import itertools
+import logging
+from typing import Any, Dict, Iterable, Mapping, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from pydantic import BaseModel
+
+from ._exceptions import HTTPException
+
+# 默认需要脱敏的字段名称，比较时不区分大小写
+DEFAULT_REDACT_KEYS = frozenset({
+    "password",
+    "client_secret",
+    "x_client_secret",
+    "secret",
+    "token",
+    "access_token",
+    "refresh_token",
+    "authorization",
+    "proxy-authorization",
+    "cookie",
+    "set-cookie",
+})
+
+REDACTED = "***"
+
+
+def redact(value: Any, redact_keys: Iterable[str] = DEFAULT_REDACT_KEYS) -> Any:
+    """
+    返回脱敏后的副本，Mapping中名称属于redact_keys的值替换为***，BaseModel会先转换为Dict，不修改传入的对象
+    """
+    if isinstance(value, BaseModel):
+        value = value.dict()
+    if isinstance(value, Mapping):
+        return {
+            k: REDACTED if str(k).lower() in redact_keys else redact(v, redact_keys)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(v, redact_keys) for v in value]
+    return value
+
+
+def redact_url(url: Any, redact_keys: Iterable[str] = DEFAULT_REDACT_KEYS) -> str:
+    """
+    返回query参数脱敏后的url
+    """
+    url = str(url)
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [
+        (k, REDACTED if k.lower() in redact_keys else v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+    ]
+    return urlunsplit(parts._replace(query=urlencode(query, safe="*")))
+
+
+class RequestLogger:
+    """
+    AsyncHTTPClient请求日志，每个请求完成后输出一条结构化日志，日志内容只在确定输出时才会构建
+    logger - logging.Logger, 输出日志使用的logger
+    sample_rate - int, 采样率，每N个正常请求输出1条INFO日志，默认1，即全部输出
+    slow_threshold - (Optional) float, 慢请求阈值，单位：秒，超过阈值的请求总是以WARNING输出
+    redact_keys - (Optional) Iterable[str], 额外需要脱敏的字段名称
+    Memo::
+        4xx属于调用方可预期的结果（如资源不存在的404），与正常请求一样以INFO输出并参与采样
+        5xx和传输异常总是以ERROR输出，不受采样率影响
+        结构化内容通过extra的omi_http字段传递，logger开启DEBUG时会包含请求body和响应内容
+        header，auth，body和url query中的client_secret，password，authorization等字段会脱敏
+    Usage::
+    #    >>> request_logger = RequestLogger(logger, sample_rate=100, slow_threshold=1.0)
+    #    >>> request_logger.log_request("get", url, header, auth, None, response, elapsed)
+    """
+
+    def __init__(
+            self,
+            logger: logging.Logger,
+            sample_rate: int = 1,
+            slow_threshold: Optional[float] = None,
+            redact_keys: Optional[Iterable[str]] = None,
+    ):
+        self.logger = logger
+        self.sample_rate = max(int(sample_rate), 1)
+        self.slow_threshold = slow_threshold
+        self.redact_keys = DEFAULT_REDACT_KEYS | frozenset(str(k).lower() for k in (redact_keys or ()))
+        self._counter = itertools.count()
+        self.sampled_out = 0
+
+    def get_level(self, elapsed: float, error: Optional[BaseException]) -> Optional[int]:
+        """
+        返回本次请求输出日志使用的level，不需要输出时返回None
+        """
+        if error is not None and not (isinstance(error, HTTPException) and 400 <= error.status_code < 500):
+            return logging.ERROR
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            return logging.WARNING
+        if not self.logger.isEnabledFor(logging.INFO):
+            return None
+        if self.sample_rate > 1 and next(self._counter) % self.sample_rate:
+            self.sampled_out += 1
+            return None
+        return logging.INFO
+
+    def log_request(
+            self,
+            method: str,
+            url: Any,
+            header: Optional[Dict],
+            auth: Any,
+            data: Any,
+            response: Any,
+            elapsed: float,
+            error: Optional[BaseException] = None,
+    ):
+        """
+        记录一次请求，method为backend的方法名称，response为backend的返回值，请求失败时传入error
+        """
+        level = self.get_level(elapsed, error)
+        if level is None or not self.logger.isEnabledFor(level):
+            return
+        if error is not None:
+            status_code = getattr(error, "status_code", None)
+        elif isinstance(response, Mapping):
+            status_code = response.get("status_code", None)
+        else:
+            status_code = getattr(response, "status_code", None)
+        record = {
+            "method": method.upper(),
+            "url": redact_url(url, self.redact_keys),
+            "status_code": status_code,
+            "elapsed": elapsed,
+            "principal": auth.get("username", None) if isinstance(auth, Mapping) else None,
+            "headers": redact(header, self.redact_keys),
+        }
+        if error is not None:
+            record["error"] = repr(error)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            record["request"] = redact(data, self.redact_keys)
+            record["response"] = redact(response, self.redact_keys)
+        self.logger.log(
+            level,
+            "<AsyncHTTPClient>:%s %s STATUS_CODE=%s ELAPSED=%.3fs",
+            record["method"], record["url"], status_code, elapsed,
+            extra={"omi_http": record},
+        )
@@ -15,7 +15,9 @@ limitations under the License.
 
 """
 
-from typing import Dict, Union, Any
+import re
+from string import Formatter
+from typing import Any, Dict, Optional, Tuple, Type, Union
 
 from pydantic import BaseModel, PositiveInt
 
@@ -81,11 +83,159 @@ class MessageModel(BaseModel):
     detail: Union[Dict, Any]
 
 
+class ApiTemplate:
+    """
+    预编译的API路径模板，由model的_api_prefix，_api_name，_api_suffix组成"{prefix}{api_name}{suffix}"，
+    编译时记录各部分中的占位符，构建URL时只需要替换占位符，不再每次解析格式字符串
+    api_name - str, 资源名称，不能为空
+    api_prefix - str, 前缀
+    api_suffix - str, 后缀
+    Memo::
+        与str.format一致，替换占位符后检查各部分不能以'/'结尾，并补足或剔除开头的'/'，
+        resource_endpoint以'/'结尾时，会去掉prefix开头的'/'
+        {name}以外形式的占位符，例如{id:>4}，{obj.attr}，所在部分在构建URL时使用str.format
+    Usage::
+    #    >>> template = ApiTemplate("/resources/{id}", "/v1", "")
+    #    >>> template.placeholders
+    #    frozenset({'id'})
+    #    >>> template.render({"id": 1})
+    #    '/v1/resources/1'
+    """
+
+    __slots__ = ("api_name", "api_prefix", "api_suffix", "placeholders", "_parts")
+
+    def __init__(self, api_name: str, api_prefix: str = "", api_suffix: str = ""):
+        # api_name不能为空
+        assert api_name, "A api name can not be blank or nothing."
+        self.api_name = api_name
+        self.api_prefix = api_prefix
+        self.api_suffix = api_suffix
+        self._parts = tuple((part, self.compile(part)) for part in (api_prefix, api_name, api_suffix))
+        self.placeholders = frozenset(
+            field for _, segments in self._parts if segments is not None
+            for _, field in segments if field is not None
+        )
+
+    @staticmethod
+    def compile(part: str) -> Optional[Tuple[Tuple[str, Optional[str]], ...]]:
+        """
+        将part拆分为(字面量, 占位符)的列表，part包含{name}以外形式的占位符或格式错误时返回None，构建URL时使用str.format
+        """
+        segments = []
+        try:
+            for literal, field_name, format_spec, conversion in Formatter().parse(part):
+                if field_name is not None and (
+                        not field_name or format_spec or conversion or any(c in field_name for c in ".[")):
+                    return None
+                segments.append((literal, field_name))
+        except ValueError:
+            return None
+        return tuple(segments)
+
+    def matches(self, model: Any) -> bool:
+        """
+        模板是否由model当前的_api_name，_api_prefix，_api_suffix编译
+        """
+        return (getattr(model, "_api_name", "") is self.api_name
+                and getattr(model, "_api_prefix", "") is self.api_prefix
+                and getattr(model, "_api_suffix", "") is self.api_suffix)
+
+    def render(self, params: Dict[str, Any], endpoint_with_slash: bool = False) -> str:
+        """
+        使用params替换占位符，返回API路径
+        endpoint_with_slash - bool, resource_endpoint是否以'/'结尾
+
+        Exceptions::
+            KeyError, params中没有占位符对应的值时抛出
+            AssertionError, 替换占位符后api_name，prefix，suffix以'/'结尾时抛出
+        """
+        prefix, api_name, suffix = [
+            part.format(**params) if segments is None
+            else "".join([literal if field is None else f"{literal}{params[field]}" for literal, field in segments])
+            for part, segments in self._parts
+        ]
+
+        # api_name，prefix，suffix都不能以‘/’结尾
+        assert not api_name.endswith("/"), "A api name must not end with '/'"
+        assert not prefix.endswith("/"), "A api suffix must not end with '/'"
+        assert not suffix.endswith("/"), "A api suffix must not end with '/'"
+
+        if endpoint_with_slash:
+            # resource_endpoint以“/”结尾时，剔除prefix开头的'/'
+            if prefix.startswith("/"):
+                prefix = prefix[1:]
+        elif prefix and not prefix.startswith("/"):
+            # resource_endpoint不以“/”结尾时，prefix非空且非"/"开头，补一个"/"
+            prefix = "/" + prefix
+
+        # 非"/"开头，补一个"/"
+        if api_name != "" and not api_name.startswith("/"):
+            api_name = "/" + api_name
+
+        # 非空且非"/"开头，补一个"/"
+        if suffix != "" and not suffix.startswith("/"):
+            suffix = "/" + suffix
+
+        return f"{prefix}{api_name}{suffix}"
+
+
+def get_api_template(model: Any) -> ApiTemplate:
+    """
+    获取model预编译的ApiTemplate，model没有编译过或者_api_name等属性发生了变化时重新编译并保存在model中
+    """
+    template = getattr(model, "_api_template", None)
+    if template is None or not template.matches(model):
+        template = ApiTemplate(
+            getattr(model, "_api_name", ""),
+            getattr(model, "_api_prefix", ""),
+            getattr(model, "_api_suffix", ""),
+        )
+        setattr(model, "_api_template", template)
+    return template
+
+
+# _api_name末尾的占位符，例如：/resources/{id}中的/{id}
+TRAILING_PLACEHOLDER_PATTERN = re.compile(r"(/\{[^/{}]*\})+$")
+
+
+def get_collection_model(model: Any) -> Optional[Type]:
+    """
+    获取model所属集合资源使用的model，去掉_api_name末尾的占位符，
+    例如：/resources/{id} -> /resources，/users/{uid}/orders/{id} -> /users/{uid}/orders，无法得到集合资源时返回None
+    Memo::
+        集合model及其ApiTemplate保存在model中，只在model的_api_name等属性发生变化时重新生成
+    """
+    if not getattr(model, "_api_name", ""):
+        return None
+    template = get_api_template(model)
+    cached = getattr(model, "_collection_model", None)
+    if cached is not None and cached[0] is template:
+        return cached[1]
+    collection_name = TRAILING_PLACEHOLDER_PATTERN.sub("", template.api_name)
+    collection_model = None
+    if collection_name:
+        collection_model = type(
+            f"{getattr(model, '__name__', 'Model')}Collection",
+            (),
+            {
+                "_api_name": collection_name,
+                "_api_prefix": template.api_prefix,
+                "_api_suffix": template.api_suffix,
+            },
+        )
+        get_api_template(collection_model)
+    setattr(model, "_collection_model", (template, collection_model))
+    return collection_model
+
+
 def real_api_request_model(**kwargs):
     def decorator(cls):
         for key, val in kwargs.items():
             if val is not None:
                 setattr(cls, "_" + key, val)  # key -> _key for internal use
+        # 预编译API路径模板
+        if getattr(cls, "_api_name", None):
+            get_api_template(cls)
         return cls
 
     return decorator
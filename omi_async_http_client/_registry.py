@@ -0,0 +1,196 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+import importlib
+import logging
+import threading
+from typing import Any, Dict, Hashable, Optional, Type, Union
+
+logger = logging.getLogger(__name__)
+
+# 第三方backend使用的entry points分组
+ENTRY_POINT_GROUP = "omi_async_http_client.backends"
+
+# 内置backend，key为小写的别名
+BUILTIN_BACKENDS = {
+    "requests": "omi_async_http_client.requests_backend.RequestsClientBackend",
+    "requestsclientbackend": "omi_async_http_client.requests_backend.RequestsClientBackend",
+    "aiohttp": "omi_async_http_client.aiohttp_backend.AioHttpClientBackend",
+    "aiohttpclientbackend": "omi_async_http_client.aiohttp_backend.AioHttpClientBackend",
+    "httpx": "omi_async_http_client.httpx_backend.HttpxClientBackend",
+    "httpxclientbackend": "omi_async_http_client.httpx_backend.HttpxClientBackend",
+    "fastapi_test_client": "omi_async_http_client.fastapi_testclient_backend.FastAPITestClientBackend",
+    "fastapitestclientbackend": "omi_async_http_client.fastapi_testclient_backend.FastAPITestClientBackend",
+}
+
+
+def import_backend_class(path: str) -> Type:
+    """
+    按照module.ClassName格式的路径导入backend类型，无法导入时抛出ImportError或AttributeError
+    """
+    module_name, _, class_name = path.rpartition(".")
+    if not module_name:
+        raise ImportError("No module for %s" % path)
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError:
+        # 兼容module.Class.InnerClass格式的路径
+        return getattr(import_backend_class(module_name), class_name)
+    return getattr(module, class_name)
+
+
+def get_config_key(config: Any) -> Hashable:
+    """
+    生成识别相同config的key，Dict按内容比较，其他对象按实例比较
+    """
+    if config is None:
+        return None
+    if isinstance(config, Dict):
+        return tuple(sorted((str(k), repr(v)) for k, v in config.items()))
+    return id(config)
+
+
+class BackendRegistry:
+    """
+    http_backend名称到backend类型的注册表，AsyncHTTPClient使用str作为http_backend参数时通过注册表解析backend类型。
+    支持的名称
+        1.内置的别名，如requests，aiohttp，httpx，fastapi_test_client以及对应的类名，不区分大小写
+        2.register注册的名称
+        3.第三方package在entry points分组omi_async_http_client.backends中声明的名称
+        4.module.ClassName格式的完整路径
+    Memo::
+        解析结果会被缓存，相同名称只导入一次
+        entry points只在第一次遇到未知名称时读取一次
+        get_shared_instance按backend类型，resource_endpoint和config共享backend实例，共享的实例不随client关闭，
+        需要调用close_shared_instances释放
+    Usage::
+    #    >>> backend_registry.register("my_backend", "my_package.backend.MyClientBackend")
+    #    >>> backend_class = backend_registry.resolve("my_backend")
+    """
+
+    def __init__(self, entry_point_group: str = ENTRY_POINT_GROUP):
+        self.entry_point_group = entry_point_group
+        self._backends: Dict[str, Union[str, Type]] = dict(BUILTIN_BACKENDS)
+        self._classes: Dict[str, Type] = {}
+        self._instances: Dict[Hashable, Any] = {}
+        self._entry_points_loaded = False
+        self._lock = threading.Lock()
+
+    def register(self, name: str, backend: Union[str, Type]):
+        """
+        注册backend，backend可以是类型，也可以是module.ClassName格式的路径
+        """
+        key = name.lower()
+        with self._lock:
+            self._backends[key] = backend
+            self._classes.pop(key, None)
+
+    def load_entry_points(self):
+        """
+        读取entry points中声明的backend，已经注册的名称不会被覆盖
+        """
+        self._entry_points_loaded = True
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:
+            return
+        try:
+            eps = entry_points()
+            if hasattr(eps, "select"):
+                eps = eps.select(group=self.entry_point_group)
+            else:
+                eps = eps.get(self.entry_point_group, [])
+        except Exception as e:
+            logger.warning("<BackendRegistry>:ENTRY_POINTS_FAILED=%r", e)
+            return
+        for ep in eps:
+            self._backends.setdefault(ep.name.lower(), ep)
+
+    def resolve(self, name: str) -> Type:
+        """
+        解析name对应的backend类型，无法解析时抛出ValueError
+        """
+        key = name.lower()
+        backend_class = self._classes.get(key, None)
+        if backend_class is not None:
+            return backend_class
+        with self._lock:
+            backend = self._backends.get(key, None)
+            if backend is None and not self._entry_points_loaded:
+                self.load_entry_points()
+                backend = self._backends.get(key, None)
+            if backend is None:
+                backend = name
+            try:
+                if isinstance(backend, str):
+                    backend_class = import_backend_class(backend)
+                elif isinstance(backend, type):
+                    backend_class = backend
+                else:
+                    # importlib.metadata.EntryPoint
+                    backend_class = backend.load()
+            except (ImportError, AttributeError) as e:
+                raise ValueError('Cannot resolve http_backend type %s' % name) from e
+            self._classes[key] = backend_class
+        return backend_class
+
+    def get_shared_instance(self, backend_class: Type, endpoint: Optional[str], config: Any, factory):
+        """
+        返回backend_class，endpoint和config相同的共享backend实例，不存在时使用factory()创建
+        """
+        key = (backend_class, endpoint, get_config_key(config))
+        instance = self._instances.get(key, None)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(key, None)
+                if instance is None:
+                    instance = self._instances[key] = factory()
+        return instance
+
+    def is_shared_instance(self, instance: Any) -> bool:
+        return any(shared is instance for shared in self._instances.values())
+
+    async def release_shared_instance(self, instance: Any):
+        """
+        关闭并移除指定的共享backend实例
+        """
+        with self._lock:
+            keys = [key for key, shared in self._instances.items() if shared is instance]
+            for key in keys:
+                del self._instances[key]
+        if keys:
+            await instance.close()
+
+    async def close_shared_instances(self):
+        """
+        关闭并移除所有共享的backend实例
+        """
+        with self._lock:
+            instances = list(self._instances.values())
+            self._instances.clear()
+        for instance in instances:
+            await instance.close()
+
+    def clear(self):
+        """
+        清除已缓存的backend类型，重新读取entry points，注册的backend和共享实例保留
+        """
+        with self._lock:
+            self._classes.clear()
+            self._entry_points_loaded = False
+
+
+backend_registry = BackendRegistry()
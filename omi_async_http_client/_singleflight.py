@@ -0,0 +1,68 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    合并相同key的并发调用，同一时间相同key只执行一次调用，其他调用等待并共享执行结果，异常同样会共享给所有等待者。
+    Memo::
+        调用在独立的Task中执行，发起调用的协程被取消不会影响其他等待者
+        预热、后台刷新等后台调用以background=True发起，加入已有调用时单独计入background_shared，不计入shared
+    Usage::
+    #    >>> flight = SingleFlight()
+    #    >>> result = await flight.do("key", lambda: fetch())
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+        self.background_shared = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]], background: bool = False) -> Any:
+        """
+        执行func，如果相同key的调用正在执行，则等待其结果
+        key - Hashable, 合并调用使用的key
+        func - Callable, 无参数的协程函数
+        background - bool, 是否为后台发起的调用，默认False，即调用方发起的调用
+        """
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            self.executions += 1
+            flight = asyncio.ensure_future(func())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda future: self._done(key, future))
+        elif background:
+            self.background_shared += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(flight)
+
+    def _done(self, key: Hashable, future: asyncio.Future):
+        if self._flights.get(key) is future:
+            del self._flights[key]
+        # 所有等待者都被取消时，避免出现未获取的异常警告
+        if not future.cancelled():
+            future.exception()
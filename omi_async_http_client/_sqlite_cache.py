@@ -0,0 +1,347 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import asyncio
+import json
+import threading
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from ._cache import CacheEntry, ResponseCache
+
+if TYPE_CHECKING:  # pragma: no cover
+    import sqlite3
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    使用本地SQLite文件保存的ResponseCache，进程重启后缓存仍然可用，同一台主机上的多个进程可以共享同一个缓存文件。
+    支持TTL过期，按条数和字节数淘汰最久未使用的缓存项
+    path - str, SQLite数据库文件的路径
+    ttl - float, 缓存的有效时间，单位：秒，默认60
+    max_entries - int, 最大缓存条数，默认10000
+    max_bytes - (Optional) int, 缓存内容的最大字节数，按response序列化为JSON后的长度计算，默认不限制
+    vary_headers - (Optional) Iterable[str], 参与构建缓存key的header名称，默认使用全部header
+    shared - bool, 是否为多个用户共享的缓存，默认False
+    busy_timeout - float, 其他进程正在写入时等待数据库锁的时间，单位：秒，默认5
+    access_flush_size - int, 缓存命中时暂存的最近使用时间达到该数量时写入数据库，默认100
+    access_flush_interval - float, 暂存的最近使用时间距离上次写入超过该时间时写入数据库，单位：秒，默认1
+    Memo::
+        数据库使用WAL模式，读写互不阻塞，多进程同时写入时由SQLite的文件锁保证一致性；
+        数据库操作在默认的executor中执行，不会阻塞event loop；
+        缓存命中只读取数据库，最近使用时间先暂存在内存中，批量写入，淘汰、保存快照和close之前也会写入，
+        其他进程看到的最近使用时间最多延迟access_flush_interval；
+        缓存条数和字节数由触发器保存在responses_stats表中，写入时不需要统计整个表
+    Usage::
+    #    >>> cache = SQLiteResponseCache("/var/cache/omi/response_cache.db", ttl=300, max_bytes=256 * 1024 * 1024)
+    #    >>> client = APIClient(model=Staff, ..., config={"RESPONSE_CACHE": cache})
+    """
+
+    DEFAULT_MAX_ENTRIES = 10000
+    DEFAULT_BUSY_TIMEOUT = 5
+    DEFAULT_ACCESS_FLUSH_SIZE = 100
+    DEFAULT_ACCESS_FLUSH_INTERVAL = 1
+
+    def __init__(
+            self,
+            path: str,
+            ttl: float = ResponseCache.DEFAULT_TTL,
+            max_entries: int = DEFAULT_MAX_ENTRIES,
+            max_bytes: Optional[int] = None,
+            vary_headers: Optional[Iterable[str]] = None,
+            shared: bool = False,
+            busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+            access_flush_size: int = DEFAULT_ACCESS_FLUSH_SIZE,
+            access_flush_interval: float = DEFAULT_ACCESS_FLUSH_INTERVAL,
+    ):
+        super().__init__(ttl=ttl, vary_headers=vary_headers, shared=shared)
+        assert max_entries > 0, "max_entries must be greater than 0"
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.busy_timeout = busy_timeout
+        self.access_flush_size = access_flush_size
+        self.access_flush_interval = access_flush_interval
+        self._lock = threading.Lock()
+        self._connection = None
+        # 暂存的缓存命中时间，key -> accessed_at
+        self._accessed: Dict[str, float] = {}
+        self._accessed_flushed_at = time.time()
+
+    def __len__(self) -> int:
+        return self._execute(lambda connection: self._count(connection)[0])
+
+    @property
+    def stats(self) -> Dict:
+        entries, total_bytes = self._execute(self._count)
+        return {
+            **super().stats,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
+
+    def connect(self) -> "sqlite3.Connection":
+        """
+        打开数据库连接并创建缓存表，首次使用缓存时自动调用，sqlite3在此时才导入
+        """
+        import sqlite3
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, "
+            "path TEXT NOT NULL, "
+            "status_code INTEGER NOT NULL, "
+            "response TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "stored_at REAL NOT NULL, "
+            "expires_at REAL NOT NULL, "
+            "stale_while_revalidate REAL NOT NULL DEFAULT 0, "
+            "stale_if_error REAL NOT NULL DEFAULT 0, "
+            "discard_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL, "
+            "delta REAL NOT NULL DEFAULT 0)"
+        )
+        # 兼容早期创建的没有delta列的缓存文件
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(responses)")]
+        if "delta" not in columns:
+            connection.execute("ALTER TABLE responses ADD COLUMN delta REAL NOT NULL DEFAULT 0")
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_path ON responses (path)")
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_discard_at ON responses (discard_at)")
+        # INSERT OR REPLACE替换缓存项时同样触发DELETE触发器
+        connection.execute("PRAGMA recursive_triggers=ON")
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses_stats ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), "
+                "entries INTEGER NOT NULL, "
+                "bytes INTEGER NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN "
+                "UPDATE responses_stats SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0; END"
+            )
+            connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN "
+                "UPDATE responses_stats SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0; END"
+            )
+            # 兼容早期创建的没有统计表的缓存文件，只在首次创建时统计一次
+            connection.execute(
+                "INSERT OR IGNORE INTO responses_stats (id, entries, bytes) "
+                "SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return connection
+
+    def close(self):
+        """
+        关闭数据库连接，缓存内容保留在文件中，暂存的最近使用时间在关闭前写入
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._flush_accessed(self._connection)
+                self._connection.close()
+                self._connection = None
+
+    def _execute(self, func: Callable[["sqlite3.Connection"], Any]) -> Any:
+        with self._lock:
+            if self._connection is None:
+                self._connection = self.connect()
+            return func(self._connection)
+
+    async def _run(self, func: Callable[["sqlite3.Connection"], Any]) -> Any:
+        return await asyncio.get_event_loop().run_in_executor(None, self._execute, func)
+
+    @staticmethod
+    def _count(connection: "sqlite3.Connection"):
+        return connection.execute("SELECT entries, bytes FROM responses_stats WHERE id = 0").fetchone()
+
+    def _flush_accessed(self, connection: "sqlite3.Connection"):
+        """
+        将暂存的最近使用时间批量写入数据库，调用时需要持有_lock
+        """
+        self._accessed_flushed_at = time.time()
+        if not self._accessed:
+            return
+        accessed = [(accessed_at, key) for key, accessed_at in self._accessed.items()]
+        self._accessed.clear()
+        if connection.in_transaction:
+            connection.executemany("UPDATE responses SET accessed_at = ? WHERE key = ?", accessed)
+            return
+        # 在一个事务中写入，只获取一次写锁
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("UPDATE responses SET accessed_at = ? WHERE key = ?", accessed)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        now = time.time()
+
+        def select(connection: "sqlite3.Connection"):
+            row = connection.execute(
+                "SELECT path, status_code, response, size, stored_at, expires_at, stale_while_revalidate, "
+                "stale_if_error, discard_at, delta FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            if now >= row[8]:
+                connection.execute("DELETE FROM responses WHERE key = ? AND discard_at <= ?", (key, now))
+                return None
+            self._accessed[key] = now
+            if (len(self._accessed) >= self.access_flush_size
+                    or now - self._accessed_flushed_at >= self.access_flush_interval):
+                self._flush_accessed(connection)
+            return row
+
+        row = await self._run(select)
+        if row is None:
+            return None
+        return CacheEntry(
+            key=key,
+            path=row[0],
+            status_code=row[1],
+            response=json.loads(row[2]),
+            size=row[3],
+            stored_at=row[4],
+            expires_at=row[5],
+            stale_while_revalidate=row[6],
+            stale_if_error=row[7],
+            delta=row[9],
+        )
+
+    async def set(self, key: str, entry: CacheEntry):
+        entry.key = key
+        await self.set_many([entry])
+
+    async def set_many(self, entries: List[CacheEntry]):
+        """
+        在一个事务中批量写入缓存项，按entries的顺序作为最近使用的顺序
+        """
+        if not entries:
+            return
+        now = time.time()
+        rows = []
+        for index, entry in enumerate(entries):
+            content = json.dumps(entry.response, separators=(",", ":"), default=str)
+            rows.append((entry.key, entry.path, entry.status_code, content, len(content), entry.stored_at,
+                         entry.expires_at, entry.stale_while_revalidate, entry.stale_if_error, entry.discard_at,
+                         now + index * 1e-6, entry.delta))
+
+        def insert(connection: "sqlite3.Connection") -> int:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # 写入前更新暂存的最近使用时间，淘汰时按准确的使用顺序
+                self._flush_accessed(connection)
+                connection.executemany(
+                    "INSERT OR REPLACE INTO responses (key, path, status_code, response, size, stored_at, "
+                    "expires_at, stale_while_revalidate, stale_if_error, discard_at, accessed_at, delta) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                evictions = self._evict(connection, now)
+                connection.execute("COMMIT")
+                return evictions
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+        self.evictions += await self._run(insert)
+
+    async def iter_entries(self) -> AsyncIterator[CacheEntry]:
+        # 按最久未使用的顺序分批读取，读取快照时最近使用的缓存项最后写入
+        await self._run(self._flush_accessed)
+        accessed_at, last_key = -1.0, ""
+        while True:
+            rows = await self._run(lambda connection: connection.execute(
+                "SELECT key, path, status_code, response, size, stored_at, expires_at, stale_while_revalidate, "
+                "stale_if_error, delta, accessed_at FROM responses "
+                "WHERE accessed_at > ? OR (accessed_at = ? AND key > ?) ORDER BY accessed_at, key LIMIT ?",
+                (accessed_at, accessed_at, last_key, self.DEFAULT_SNAPSHOT_BATCH_SIZE),
+            ).fetchall())
+            if not rows:
+                return
+            for row in rows:
+                yield CacheEntry(
+                    key=row[0],
+                    path=row[1],
+                    status_code=row[2],
+                    response=json.loads(row[3]),
+                    size=row[4],
+                    stored_at=row[5],
+                    expires_at=row[6],
+                    stale_while_revalidate=row[7],
+                    stale_if_error=row[8],
+                    delta=row[9],
+                )
+            accessed_at, last_key = rows[-1][10], rows[-1][0]
+
+    def _evict(self, connection: "sqlite3.Connection", now: float) -> int:
+        """
+        删除已超过stale时间的缓存项，再按最久未使用的顺序淘汰超出容量的缓存项，返回淘汰的条数
+        """
+        connection.execute("DELETE FROM responses WHERE discard_at <= ?", (now,))
+        entries, total_bytes = self._count(connection)
+        evictions = 0
+        if entries > self.max_entries:
+            evictions += connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (entries - self.max_entries,),
+            ).rowcount
+            total_bytes = self._count(connection)[1]
+        if self.max_bytes is not None and total_bytes > self.max_bytes:
+            # 按最久未使用的顺序累计字节数，删除超出容量部分
+            keys = []
+            for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                if total_bytes <= self.max_bytes:
+                    break
+                keys.append((key,))
+                total_bytes -= size
+            connection.executemany("DELETE FROM responses WHERE key = ?", keys)
+            evictions += len(keys)
+        return evictions
+
+    async def delete(self, key: str):
+        await self._run(lambda connection: connection.execute("DELETE FROM responses WHERE key = ?", (key,)))
+
+    async def clear(self):
+        await self._run(lambda connection: connection.execute("DELETE FROM responses"))
+
+    async def invalidate_path(self, path: str, include_descendants: bool = True) -> int:
+        path = path.rstrip("/") or "/"
+        if not include_descendants:
+            return await self._run(lambda connection: connection.execute(
+                "DELETE FROM responses WHERE path IN (?, ?)", (path, path + "/")
+            ).rowcount)
+        # 使用范围查询代替LIKE，可以利用path索引，且不受path中%和_字符的影响
+        prefix = path if path.endswith("/") else path + "/"
+        return await self._run(lambda connection: connection.execute(
+            "DELETE FROM responses WHERE path = ? OR (path >= ? AND path < ?)",
+            (path, prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)),
+        ).rowcount)
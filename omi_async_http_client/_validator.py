@@ -0,0 +1,138 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+class ValidatorEntry:
+    """
+    ValidatorStore中保存的校验信息
+    etag - str, 响应头ETag的值
+    last_modified - str, 响应头Last-Modified的值
+    response - Dict, 已解析的响应内容，收到304 Not Modified时直接复用
+    """
+
+    __slots__ = ("etag", "last_modified", "response")
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], response: Dict):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.response = response
+
+
+class ValidatorStore:
+    """
+    按规范化url保存GET请求响应的ETag/Last-Modified，用于HTTP条件请求(conditional request)。
+    后续相同url的GET请求会带上If-None-Match/If-Modified-Since请求头，服务器返回304 Not Modified时，
+    直接使用之前已解析的响应内容，不需要再次下载和解码响应。
+    max_entries - int, 最多保存的url数量，超出时淘汰最久未使用的url，默认1024
+    Memo::
+        规范化url会去掉客户端为避免中间缓存而添加的rnd参数，并加入auth身份，不同身份的响应互不复用
+    Usage::
+    #    >>> store = ValidatorStore()
+    #    >>> headers = store.prepare_headers(url, headers, auth)
+    #    >>> store.store(url, auth, response_headers, response_dict)
+    #    >>> response_dict = store.get_response(url, auth)
+    """
+
+    DEFAULT_MAX_ENTRIES = 1024
+    IGNORED_PARAMS = ("rnd",)
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, ValidatorEntry]" = OrderedDict()
+        self.revalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def canonical_url(cls, url: Any) -> str:
+        """
+        去掉url中的rnd参数，得到用于识别资源的规范化url
+        """
+        parts = urlsplit(str(url))
+        if not parts.query:
+            return str(url)
+        query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in cls.IGNORED_PARAMS]
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+    @staticmethod
+    def get_principal(auth: Any) -> str:
+        """
+        获取auth中的身份标识，只使用username，不保存password
+        """
+        if auth is None:
+            return ""
+        if isinstance(auth, Dict):
+            return str(auth.get("username", ""))
+        if isinstance(auth, (tuple, list)) and auth:
+            return str(auth[0])
+        principal = getattr(auth, "login", None) or getattr(auth, "username", None)
+        if principal:
+            return str(principal)
+        # 无法获取username的auth对象按实例区分，不同身份的响应不会互相复用
+        return f"{type(auth).__name__}:{id(auth)}"
+
+    def make_key(self, url: Any, auth: Any) -> Tuple:
+        return self.canonical_url(url), self.get_principal(auth)
+
+    def prepare_headers(self, url: Any, headers: Optional[Dict], auth: Any) -> Optional[Dict]:
+        """
+        如果url已保存校验信息，返回增加了If-None-Match/If-Modified-Since的请求头，否则原样返回headers
+        """
+        entry = self._entries.get(self.make_key(url, auth))
+        if entry is None:
+            return headers
+        headers = dict(headers) if headers else {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url: Any, auth: Any, response_headers: Optional[Mapping], response: Dict):
+        """
+        保存200响应的校验信息和已解析的响应内容，响应中没有ETag/Last-Modified时清除旧的校验信息
+        """
+        key = self.make_key(url, auth)
+        etag = response_headers.get("ETag") if response_headers else None
+        last_modified = response_headers.get("Last-Modified") if response_headers else None
+        if not etag and not last_modified:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = ValidatorEntry(etag, last_modified, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_response(self, url: Any, auth: Any) -> Optional[Dict]:
+        """
+        收到304 Not Modified时调用，返回之前保存的响应内容，没有保存时返回None
+        """
+        key = self.make_key(url, auth)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.revalidations += 1
+        return entry.response
+
+    def clear(self):
+        self._entries.clear()
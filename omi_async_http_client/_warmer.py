@@ -0,0 +1,221 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from ._exceptions import HTTPException
+
+logger = logging.getLogger(__name__)
+
+
+class WarmKey:
+    """
+    RefreshAheadWarmer跟踪的缓存key，保存重新请求需要的参数和访问次数
+    """
+
+    __slots__ = ("key", "url", "header", "auth", "timeout", "hits", "expires_at", "accessed_at")
+
+    def __init__(self, key: str, url: str, header: Dict, auth: Any, timeout):
+        self.key = key
+        self.url = url
+        self.header = header
+        self.auth = auth
+        self.timeout = timeout
+        self.hits = 0.0
+        self.expires_at: Optional[float] = None
+        self.accessed_at = time.time()
+
+
+class RefreshAheadWarmer:
+    """
+    response_cache的后台预热，按缓存key统计retrieve的访问频率，定期在访问最多的top_k个key过期前重新请求并写入缓存，
+    热点资源的retrieve因此总是命中缓存
+    client - AsyncHTTPClient, 使用的client，需要设置response_cache
+    top_k - int, 预热访问频率最高的key的数量
+    interval - float, 检查的间隔，单位：秒，默认1
+    refresh_ahead - float, 在过期前多长时间内刷新，单位：秒，默认5
+    concurrency - int, 同时执行的刷新请求数量上限，默认4
+    jitter - float, 检查间隔和刷新时间的随机抖动比例，避免多个进程同时刷新，默认0.1
+    max_keys - int, 最多跟踪的key数量，超出时淘汰访问频率最低的key，默认1024
+    min_hits - float, 衰减后的访问次数达到该值的key才会被预热，默认2，只访问过一次的key不会被预热
+    idle_timeout - (Optional) float, 超过该时间没有访问的key不再跟踪，单位：秒，默认不限制，client使用response_cache的ttl
+    Memo::
+        访问次数在每次检查后减半，统计的是近期的访问频率，衰减到PRUNE_HITS以下的key不再跟踪；
+        在FastAPI app中使用时，client通过setup_app在app的startup/shutdown事件中启动和停止预热
+    Usage::
+    #    >>> client = APIClient(model=Staff, app=app, ..., config={"RESPONSE_CACHE": True, "RESPONSE_CACHE_WARM_TOP_K": 10})
+    #    >>> await client.warmer.start()
+    """
+
+    DEFAULT_INTERVAL = 1
+    DEFAULT_REFRESH_AHEAD = 5
+    DEFAULT_CONCURRENCY = 4
+    DEFAULT_JITTER = 0.1
+    DEFAULT_MAX_KEYS = 1024
+    DEFAULT_MIN_HITS = 2
+    # 衰减后的访问次数低于该值的key不再跟踪
+    PRUNE_HITS = 0.1
+
+    def __init__(
+            self,
+            client,
+            top_k: int,
+            interval: float = DEFAULT_INTERVAL,
+            refresh_ahead: float = DEFAULT_REFRESH_AHEAD,
+            concurrency: int = DEFAULT_CONCURRENCY,
+            jitter: float = DEFAULT_JITTER,
+            max_keys: int = DEFAULT_MAX_KEYS,
+            min_hits: float = DEFAULT_MIN_HITS,
+            idle_timeout: Optional[float] = None,
+    ):
+        assert top_k > 0, "top_k must be greater than 0"
+        assert concurrency > 0, "concurrency must be greater than 0"
+        self.client = client
+        self.top_k = top_k
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.max_keys = max(max_keys, top_k)
+        self.min_hits = min_hits
+        self.idle_timeout = idle_timeout
+        self._keys: Dict[str, WarmKey] = {}
+        self._task: Optional[asyncio.Future] = None
+        self.refreshes = 0
+        self.failures = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def record(self, key: str, url: str, header: Dict, auth: Any, timeout, expires_at: Optional[float] = None):
+        """
+        记录一次retrieve对缓存key的访问
+        expires_at - (Optional) float, 缓存项的过期时间，缓存未命中时为None，写入缓存后由stored更新
+        """
+        warm_key = self._keys.get(key)
+        if warm_key is None:
+            if len(self._keys) >= self.max_keys:
+                # 淘汰访问频率最低的key
+                del self._keys[min(self._keys.values(), key=lambda item: item.hits).key]
+            warm_key = WarmKey(key, url, header, auth, timeout)
+            self._keys[key] = warm_key
+        warm_key.hits += 1
+        warm_key.accessed_at = time.time()
+        if expires_at is not None:
+            warm_key.expires_at = expires_at
+
+    def stored(self, key: str, expires_at: float):
+        """
+        缓存key写入缓存后调用，更新过期时间
+        """
+        warm_key = self._keys.get(key)
+        if warm_key is not None:
+            warm_key.expires_at = expires_at
+
+    def get_hot_keys(self) -> List[WarmKey]:
+        """
+        返回访问频率最高的top_k个key，访问次数低于min_hits的key不会返回
+        """
+        return heapq.nlargest(
+            self.top_k,
+            (warm_key for warm_key in self._keys.values() if warm_key.hits >= self.min_hits),
+            key=lambda item: item.hits,
+        )
+
+    def decay(self, now: Optional[float] = None):
+        """
+        将所有key的访问次数减半，并移除访问次数过低或超过idle_timeout没有访问的key
+        """
+        now = time.time() if now is None else now
+        for warm_key in list(self._keys.values()):
+            warm_key.hits /= 2
+            if warm_key.hits < self.PRUNE_HITS or (
+                    self.idle_timeout is not None and now - warm_key.accessed_at > self.idle_timeout):
+                del self._keys[warm_key.key]
+
+    def __len__(self):
+        return len(self._keys)
+
+    async def refresh_due(self) -> int:
+        """
+        刷新top_k个key中即将过期的缓存，返回刷新的数量，之后将所有key的访问次数减半，@See decay
+        """
+        now = time.time()
+        due = [
+            warm_key for warm_key in self.get_hot_keys()
+            if warm_key.expires_at is not None and warm_key.expires_at - now <= self.refresh_ahead
+        ]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(warm_key: WarmKey):
+            async with semaphore:
+                if self.jitter > 0:
+                    await asyncio.sleep(random.uniform(0, self.jitter * self.interval))
+                try:
+                    await self.client.response_cache.fetch_lock.do(
+                        warm_key.key,
+                        lambda: self.client.fetch_and_store_response(
+                            warm_key.key, warm_key.url, warm_key.header, warm_key.auth, warm_key.timeout,
+                            background=True,
+                        ),
+                        background=True,
+                    )
+                    self.refreshes += 1
+                except HTTPException as e:
+                    self.failures += 1
+                    logger.info(f"<RefreshAheadWarmer>:REFRESH_FAILED={warm_key.url} STATUS_CODE={e.status_code}")
+
+        await asyncio.gather(*[refresh(warm_key) for warm_key in due])
+        self.decay()
+        return len(due)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+            try:
+                await self.refresh_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"<RefreshAheadWarmer>:ERROR={e!r}")
+
+    async def start(self):
+        """
+        启动后台预热任务，已启动时不做处理
+        """
+        if not self.running:
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        """
+        停止后台预热任务，执行中的刷新会被取消
+        """
+        task = self._task
+        self._task = None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
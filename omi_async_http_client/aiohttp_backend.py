@@ -16,7 +16,6 @@ limitations under the License.
 """
 
 import asyncio
-import json
 from typing import Dict, cast, Any, Union
 
 import aiohttp
@@ -24,25 +23,98 @@ from aiohttp import ClientError, ServerTimeoutError, ClientTimeout, BasicAuth
 
 from ._exceptions import HTTPException
 from ._status_code import status_codes
-from .async_http_client import AsyncHTTPClientBackend, ClientBackendResponse
+from .async_http_client import AsyncHTTPClientBackend, AsyncHttpClientSession, ClientBackendResponse
 
 
-# class AioHttpClientSession(AsyncHttpClientSession):
-#     def __init__(self):
-#         super().__init__()
-#         self._client_or_session = None
+class AioHttpClientSession(AsyncHttpClientSession):
+    """
+    AioHttpClientBackend使用的长连接Session，持有一个aiohttp.ClientSession和TCPConnector，
+    所有请求复用同一个连接池，避免每次请求都重新进行TCP/TLS握手。
+    连接池参数从backend的config中读取
+        HTTP_POOL_SIZE - int, 连接池的最大连接数，默认100
+        HTTP_POOL_SIZE_PER_HOST - int, 每个host的最大连接数，默认0，即不限制
+        HTTP_KEEPALIVE_TIMEOUT - float, 空闲连接的keep-alive时间，单位：秒，默认15
+    Memo::
+        aiohttp.ClientSession与创建时的event loop绑定，event loop变化时会自动重新创建
+    """
 
-#     async def create(self):
-#         pass
+    DEFAULT_POOL_SIZE = 100
+    DEFAULT_POOL_SIZE_PER_HOST = 0
+    DEFAULT_KEEPALIVE_TIMEOUT = 15
 
-#     async def destroy(self):
-#         pass
+    # 在原event loop中关闭的session的task
+    _closing = set()
+
+    def __init__(self, backend):
+        super().__init__()
+        self._backend = backend
+        self._event_loop = None
+
+    async def create(self):
+        connector = aiohttp.TCPConnector(
+            limit=self._backend.get_config_value("HTTP_POOL_SIZE", self.DEFAULT_POOL_SIZE),
+            limit_per_host=self._backend.get_config_value("HTTP_POOL_SIZE_PER_HOST",
+                                                          self.DEFAULT_POOL_SIZE_PER_HOST),
+            keepalive_timeout=self._backend.get_config_value("HTTP_KEEPALIVE_TIMEOUT",
+                                                             self.DEFAULT_KEEPALIVE_TIMEOUT),
+        )
+        self._client_or_session = aiohttp.ClientSession(connector=connector)
+        self._event_loop = asyncio.get_event_loop()
+        return self._client_or_session
+
+    async def destroy(self):
+        session = self._client_or_session
+        self._client_or_session = None
+        self._event_loop = None
+        if session is not None and not session.closed:
+            await session.close()
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        获取可用的aiohttp.ClientSession，首次调用时创建，
+        如果session已关闭或event loop发生变化，则丢弃旧的session重新创建
+        """
+        session = self._client_or_session
+        if session is not None and not session.closed and self._event_loop is asyncio.get_event_loop():
+            return session
+        if session is not None:
+            await self.discard()
+        return await self.create()
+
+    async def discard(self):
+        """
+        丢弃已关闭或绑定在其他event loop上的session，并关闭其connector持有的连接
+        Memo::
+            连接只能在创建时的event loop中关闭，原event loop未关闭时将关闭操作安排到原event loop中执行，
+            原event loop已关闭时其中的连接已无法使用，在当前event loop中标记connector为关闭
+        """
+        session = self._client_or_session
+        event_loop = self._event_loop
+        self._client_or_session = None
+        self._event_loop = None
+        if session is None or session.closed:
+            return
+        if event_loop is None or event_loop.is_closed() or event_loop is asyncio.get_event_loop():
+            await session.close()
+        else:
+            event_loop.call_soon_threadsafe(self.close_in_event_loop, session, event_loop)
+
+    @staticmethod
+    def close_in_event_loop(session: aiohttp.ClientSession, event_loop):
+        """
+        在session所属的event loop中关闭session，由discard安排执行
+        """
+        task = event_loop.create_task(session.close())
+        # 保留task的引用直到关闭完成
+        AioHttpClientSession._closing.add(task)
+        task.add_done_callback(AioHttpClientSession._closing.discard)
 
 
 class AioHttpClientBackend(AsyncHTTPClientBackend):
     def __init__(self, client=None, config=None, event_loop=None):
         super().__init__(client=client, config=config)
         self._event_loop = event_loop
+        self._session = AioHttpClientSession(self)
 
     def get_event_loop(self):
         if self._event_loop is not None:
@@ -50,6 +122,12 @@ class AioHttpClientBackend(AsyncHTTPClientBackend):
         else:
             return asyncio.get_event_loop()
 
+    async def close(self):
+        """
+        关闭backend持有的aiohttp.ClientSession及连接池
+        """
+        await self._session.destroy()
+
     async def request_http(
             self,
             method,
@@ -60,16 +138,24 @@ class AioHttpClientBackend(AsyncHTTPClientBackend):
             timeout=ClientTimeout(total=1 * 60),
     ):
         try:
-            async with aiohttp.request(
+            session = await self._session.get_session()
+            async with session.request(
                     method=method,
                     url=str(url),
-                    data=json.dumps(data),
-                    headers=headers,
-                    auth=auth,
+                    data=self.codec.encode(data),
+                    # 条件请求的校验信息按client传入的auth识别身份，发送时才转换为backend原生的auth对象
+                    headers=self.prepare_conditional_headers(method, url, headers, auth),
+                    auth=self.get_auth_method(auth),
                     timeout=timeout,
             ) as response:
                 # 获得状态代码，不需要等到response收到
                 status = response.status
+                # 条件请求命中，复用之前已解析的响应内容，不再解码响应
+                if status == status_codes.NOT_MODIFIED:
+                    not_modified = self.get_not_modified_response(method, url, auth, response.headers)
+                    if not_modified is not None:
+                        return not_modified
+                    self.filter_received_response(status, {})
                 # 服务端50x错误
                 if status_codes.is_server_error(status):
                     raise HTTPException(status_code=status)
@@ -78,19 +164,27 @@ class AioHttpClientBackend(AsyncHTTPClientBackend):
                     pass  # 跳过40x错误，由客户端程序处理
                 else:
                     pass
-                response_json = await response.json()
+                try:
+                    response_json = self.codec.decode(await response.read())
+                except ValueError as err:
+                    # 响应内容不是JSON
+                    raise HTTPException(status_code=status_codes.SERVICE_UNAVAILABLE, detail=str(err))
                 # 没有返回空白content
                 if not response_json:
                     return ClientBackendResponse(
-                        status_code=status, response={}
+                        status_code=status, response={},
+                        headers=self.get_response_headers(response.headers),
                     )
                 # 转换为字典格式
                 response_dict = cast(Dict[str, Any], response_json)
                 # 解码过滤已收到的response
                 self.filter_received_response(status, response_dict)
+                # 保存ETag/Last-Modified，用于之后的条件请求
+                self.store_validators(method, url, auth, status, response.headers, response_dict)
                 # 返回组合后的ClientBackendResponse对象
                 return ClientBackendResponse(
-                    status_code=status, response=response_dict
+                    status_code=status, response=response_dict,
+                    headers=self.get_response_headers(response.headers),
                 )
         except ServerTimeoutError as err:
             # 服务器超时错误
@@ -99,6 +193,13 @@ class AioHttpClientBackend(AsyncHTTPClientBackend):
             # 其他类型错误统一使用503代码返回
             raise HTTPException(status_code=status_codes.SERVICE_UNAVAILABLE, detail=str(err))
 
+    def create_auth_method(self, login: str, password: str) -> Any:
+        """
+        生成aiohttp.BasicAuth，Authorization头部只编码一次
+        @See AsyncHTTPClientBackend.create_auth_method(login, password)
+        """
+        return BasicAuth(login, password)
+
     async def send(self, url, data, header, auth: Union[BasicAuth, Dict], timeout: int):
         """
         Will raise NotImplementedError
@@ -110,19 +211,12 @@ class AioHttpClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.head(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = BasicAuth(login, password)
-        else:
-            auth_method = auth
-
         return await self.request_http(
             method="head",
             url=url,
             data=None,
             headers=header,
-            auth=auth_method,
+            auth=auth,
             timeout=ClientTimeout(total=timeout),
         )
 
@@ -131,19 +225,12 @@ class AioHttpClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.get(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = BasicAuth(login, password)
-        else:
-            auth_method = auth
-
         return await self.request_http(
             method="get",
             url=url,
             data=None,
             headers=header,
-            auth=auth_method,
+            auth=auth,
             timeout=ClientTimeout(total=timeout),
         )
 
@@ -152,19 +239,12 @@ class AioHttpClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.put(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = BasicAuth(login, password)
-        else:
-            auth_method = auth
-
         return await self.request_http(
             method="put",
             url=url,
             data=data,
             headers=header,
-            auth=auth_method,
+            auth=auth,
             timeout=ClientTimeout(total=timeout),
         )
 
@@ -173,19 +253,12 @@ class AioHttpClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.post(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = BasicAuth(login, password)
-        else:
-            auth_method = auth
-
         return await self.request_http(
             method="post",
             url=url,
             data=data,
             headers=header,
-            auth=auth_method,
+            auth=auth,
             timeout=ClientTimeout(total=timeout),
         )
 
@@ -194,19 +267,12 @@ class AioHttpClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.delete(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = BasicAuth(login, password)
-        else:
-            auth_method = auth
-
         return await self.request_http(
             method="delete",
             url=url,
             data=data,
             headers=header,
-            auth=auth_method,
+            auth=auth,
             timeout=ClientTimeout(total=timeout),
         )
 
@@ -248,6 +314,9 @@ class AioHttpClientBackend(AsyncHTTPClientBackend):
         elif status == status_codes.UNPROCESSABLE_ENTITY:
             # HTTPValidationError
             raise HTTPException(status_code=status, detail=response_dict)
+        elif status == status_codes.NOT_MODIFIED:
+            # 没有可复用的已解析响应，无法处理304 Not Modified
+            raise HTTPException(status_code=status, detail=status_codes.get_reason_phrase(status))
         elif status in [status_codes.OK, status_codes.CREATED, status_codes.ACCEPTED]:
             pass
         else:
@@ -15,27 +15,90 @@ limitations under the License.
 
 """
 
+import asyncio
+import collections
 import logging
+import os
 import random
 import string
+import time
+import weakref
 from abc import ABCMeta, abstractmethod
-from typing import Any, Dict, Optional, Type, TypeVar, Generic, Union
-from urllib.parse import urlencode
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterable, List, Optional, Tuple, Type, TypeVar, Generic, Union
+from urllib.parse import urlencode, urlsplit
 
 from pydantic import BaseModel, PositiveInt, ValidationError
 
+from ._cache import MemoryResponseCache, ResponseCache
+from ._codec import JSONCodec, get_codec
 from ._exceptions import HTTPException
-from ._model import MessageModel, PagedModel
+from ._loader import RetrieveBatchLoader
+from ._logging import RequestLogger
+from ._model import MessageModel, PagedModel, get_api_template, get_collection_model
+from ._registry import BackendRegistry, backend_registry, get_config_key
+from ._singleflight import SingleFlight
+from ._sqlite_cache import SQLiteResponseCache
 from ._status_code import status_codes
+from ._validator import ValidatorStore
+from ._warmer import RefreshAheadWarmer
 
 ModelType = TypeVar("ModelType", bound=BaseModel)
 
 logger = logging.getLogger(__name__)
 
+# 按快照文件路径共享的response_cache，没有client使用时自动释放
+_snapshot_response_caches = weakref.WeakValueDictionary()
+
 
 class ClientBackendResponse(BaseModel):
     status_code: PositiveInt
     response: Dict
+    headers: Dict = {}
+
+
+def get_config_value(config: Union[Dict, Any], key: str, default: Any = None) -> Any:
+    """
+    从config中读取配置项的值，config可以是Dict，也可以是settings之类带属性的对象
+    config - Union[Dict, Any], 配置对象，为None时直接返回default
+    key - str, 配置项名称
+    default - Any, 配置项未设置或为None时返回的默认值
+    """
+    if config is None:
+        return default
+    if isinstance(config, Dict):
+        value = config.get(key, None)
+    else:
+        value = getattr(config, key, None)
+    return default if value is None else value
+
+
+class FrozenDict(dict):
+    """
+    只读的Dict，AsyncHTTPClient构建时预先生成的默认headers和auth使用，所有请求共享同一个对象
+    Memo::
+        仍然是Dict的子类，backend，缓存和校验信息对Dict的判断不受影响，需要修改时请先复制，如dict(frozen)或{**frozen}
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"{self.__class__.__name__} is read-only")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+    __ior__ = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
 
 
 class AsyncHTTPClientContext:
@@ -96,10 +159,16 @@ class AsyncHttpClientSession(AsyncHTTPClientContext):
 class AsyncHTTPClientBackend:
     __metaclass__ = ABCMeta
 
+    # 缓存的backend原生auth对象数量上限
+    AUTH_METHOD_CACHE_SIZE = 128
+
     def __init__(self, client=None, config=None):
         super().__init__()
         self._client_ref = client
         self._config = config
+        self._validator_store = None
+        self._auth_methods = {}
+        self._codec = None
 
         self.setup_config()
 
@@ -118,6 +187,106 @@ class AsyncHTTPClientBackend:
         if not config:
             return
         self._config = config
+        self._codec = None
+
+    def get_config_value(self, key: str, default: Any = None) -> Any:
+        """
+        读取当前backend的配置项，@See get_config_value(config, key, default)
+        """
+        return get_config_value(self._config, key, default)
+
+    @property
+    def validator_store(self) -> Optional[ValidatorStore]:
+        """
+        HTTP条件请求使用的ValidatorStore，config中HTTP_CONDITIONAL_REQUEST为True时启用，否则为None
+            HTTP_CONDITIONAL_REQUEST - bool, GET请求是否使用ETag/Last-Modified进行条件请求，默认False
+            HTTP_CONDITIONAL_MAX_ENTRIES - int, 最多保存校验信息的url数量，默认1024
+        """
+        if self._validator_store is None and self.get_config_value("HTTP_CONDITIONAL_REQUEST", False):
+            self._validator_store = ValidatorStore(
+                self.get_config_value("HTTP_CONDITIONAL_MAX_ENTRIES", ValidatorStore.DEFAULT_MAX_ENTRIES)
+            )
+        return self._validator_store
+
+    @property
+    def codec(self) -> JSONCodec:
+        """
+        编码请求body和解码响应内容使用的JSON codec，@See get_codec
+            JSON_CODEC - Union[str, JSONCodec], "json"，"orjson"或JSONCodec实例，默认安装了orjson时使用orjson，否则使用标准库json
+        """
+        if self._codec is None:
+            self._codec = get_codec(self.get_config_value("JSON_CODEC", None))
+        return self._codec
+
+    def create_auth_method(self, login: str, password: str) -> Any:
+        """
+        使用username和password生成backend原生的HTTPBasicAuth对象，由各backend实现，默认原样返回Dict
+        """
+        return {"username": login, "password": password}
+
+    def get_auth_method(self, auth: Any) -> Any:
+        """
+        将AsyncHTTPClient.get_auth返回的Dict转换为backend原生的auth对象，非Dict时原样返回
+        Memo::
+            相同username和password的auth对象只生成一次，避免每次请求都重新编码凭据
+        """
+        if not isinstance(auth, Dict):
+            return auth
+        key = (auth.get("username", ""), auth.get("password", ""))
+        auth_method = self._auth_methods.get(key, None)
+        if auth_method is None:
+            if len(self._auth_methods) >= self.AUTH_METHOD_CACHE_SIZE:
+                self._auth_methods.clear()
+            auth_method = self._auth_methods[key] = self.create_auth_method(*key)
+        return auth_method
+
+    def prepare_conditional_headers(self, method: str, url: Any, headers: Optional[Dict], auth: Any) \
+            -> Optional[Dict]:
+        """
+        启用条件请求时，为GET请求增加If-None-Match/If-Modified-Since请求头
+        """
+        validator_store = self.validator_store
+        if validator_store is None or method.lower() != "get":
+            return headers
+        return validator_store.prepare_headers(url, headers, auth)
+
+    def get_not_modified_response(self, method: str, url: Any, auth: Any, response_headers=None) \
+            -> Optional[ClientBackendResponse]:
+        """
+        收到304 Not Modified时，返回之前已解析的响应内容，状态代码转换为200，没有可复用的响应时返回None
+        """
+        validator_store = self.validator_store
+        if validator_store is None or method.lower() != "get":
+            return None
+        response_dict = validator_store.get_response(url, auth)
+        if response_dict is None:
+            return None
+        return ClientBackendResponse(
+            status_code=status_codes.OK, response=response_dict, headers=self.get_response_headers(response_headers)
+        )
+
+    @staticmethod
+    def get_response_headers(response_headers) -> Dict:
+        """
+        将响应头转换为header名称为小写的Dict，保存在ClientBackendResponse.headers中
+        """
+        if not response_headers:
+            return {}
+        return {str(k).lower(): v for k, v in response_headers.items()}
+
+    def store_validators(self, method: str, url: Any, auth: Any, status: int, response_headers, response_dict: Dict):
+        """
+        启用条件请求时，保存GET请求200响应的ETag/Last-Modified和已解析的响应内容
+        """
+        validator_store = self.validator_store
+        if validator_store is None or method.lower() != "get" or status != status_codes.OK:
+            return
+        validator_store.store(url, auth, response_headers, response_dict)
+
+    async def close(self):
+        """
+        释放backend持有的资源，例如连接池，线程池等，默认不做任何处理
+        """
 
     @abstractmethod
     def send(self, url, data, header, auth, timeout) -> Any:
@@ -214,6 +383,8 @@ class AsyncHTTPClientBackend:
 
 class AsyncHTTPClient(Generic[ModelType]):
     DEFAULT_HTTP_REQUEST_TIMEOUT = 1 * 60
+    DEFAULT_BULK_CONCURRENCY = 10
+    DEFAULT_PAGE_PREFETCH = 1
 
     resource_endpoint: str
     client_id: str
@@ -228,7 +399,8 @@ class AsyncHTTPClient(Generic[ModelType]):
             resource_endpoint: str,
             client_id: Optional[str],
             client_secret: Optional[str],
-            config: Union[Dict, Any] = None
+            config: Union[Dict, Any] = None,
+            registry: Optional[BackendRegistry] = None,
     ):
         """
         __init__构造函数，使用参数创建一个AsyncHTTPClient实例对象，并返回
@@ -243,8 +415,51 @@ class AsyncHTTPClient(Generic[ModelType]):
         resource_endpoint - str, 资源接入服务端的endpoint, 例：http://endpoint/api/v1
         client_id - str, client_id, 用于向资源接入服务端提供客户端ID标识。AsyncHTTPClient默认会将client_id用于HTTPBasicAuth
         client_secret - str, client_secret, 用于向资源接入服务端提供客户端的认证。
+        config - (Optional) Union[Dict, Any], 额外的配置，会同时传递给http_backend，client使用的配置项
+            SINGLE_FLIGHT - bool, 合并相同的并发retrieve请求，默认False
+            RESPONSE_CACHE - Union[bool, ResponseCache], retrieve使用的response缓存，为True时使用MemoryResponseCache
+                通过当前client的create/update/delete会按资源路径删除相关的缓存，多个client可以共享同一个ResponseCache实例
+            RESPONSE_CACHE_PATH - str, 设置时使用保存在该文件中的SQLiteResponseCache，进程重启后缓存仍然可用
+            RESPONSE_CACHE_TTL - float, 缓存的有效时间，单位：秒，默认60
+            RESPONSE_CACHE_MAX_ENTRIES - int, 最大缓存条数，MemoryResponseCache默认1024，SQLiteResponseCache默认10000
+            RESPONSE_CACHE_MAX_BYTES - int, 缓存的最大字节数，默认不限制
+            RESPONSE_CACHE_SHARED - bool, 是否为共享缓存，共享缓存不保存private的响应，默认False
+            RESPONSE_CACHE_CONTROL - bool, 按照响应头Cache-Control的max-age，no-store，private，
+                stale-while-revalidate，stale-if-error决定缓存策略，默认False，即使用固定的RESPONSE_CACHE_TTL
+            RESPONSE_CACHE_EARLY_REFRESH_BETA - float, 按照XFetch算法在缓存过期前提前在后台刷新，越接近过期时间，
+                请求越慢，提前刷新的概率越高，通常设置为1.0，默认0，即不提前刷新
+            RESPONSE_CACHE_WARM_TOP_K - int, 在后台定期刷新访问最多的K个缓存key，使其在过期前更新，默认0，即不预热
+            RESPONSE_CACHE_WARM_INTERVAL - float, 预热检查的间隔，单位：秒，默认1
+            RESPONSE_CACHE_WARM_AHEAD - float, 在缓存过期前多长时间内刷新，单位：秒，默认5
+            RESPONSE_CACHE_WARM_CONCURRENCY - int, 预热同时执行的请求数量上限，默认4
+            RESPONSE_CACHE_WARM_JITTER - float, 预热检查间隔和刷新时间的随机抖动比例，默认0.1
+            RESPONSE_CACHE_WARM_MIN_HITS - float, 近期访问次数达到该值的key才会被预热，默认2
+            RESPONSE_CACHE_SNAPSHOT - str, 快照文件路径，app startup时从快照读取缓存内容，shutdown时保存缓存内容，
+                RESPONSE_CACHE为True时，设置相同快照文件的client共享同一个response_cache实例，
+                快照只读取一次，并由最后一个shutdown的client保存全部client的缓存内容
+            RESPONSE_CACHE_SNAPSHOT_LIMIT - int, startup时最多读取的缓存项数量，保留最近使用的缓存项，默认全部读取
+            RESPONSE_CACHE_SNAPSHOT_WAIT - float, 快照在后台读取，startup最多等待读取完成的时间，单位：秒，
+                默认0，即不等待，读取完成前的请求按缓存未命中处理
+            NEGATIVE_CACHE_TTL - float, retrieve结果为404时，在该时间内相同请求直接抛出HTTPException，单位：秒，
+                默认0，即不缓存；通过当前client对相同资源路径的create/update会使其失效
+            NEGATIVE_CACHE_MAX_ENTRIES - int, 404结果的最大缓存条数，默认1024
+            BATCH_RETRIEVE - bool, 将同一时间窗口内按ID的retrieve请求合并为一次集合资源请求，默认False
+            BATCH_ID_KEY - str, 批量请求使用的ID参数名称，默认"id"
+            BATCH_WINDOW - float, 收集请求的时间窗口，单位：秒，默认0，即一个event loop tick
+            BATCH_MAX_SIZE - int, 单次批量请求的ID数量上限，默认100
+            BATCH_ITEMS_KEY - str, 集合资源响应中资源列表对应的字段，默认"detail"
+            LOG_SAMPLE_RATE - int, 每N个正常请求输出1条INFO请求日志，默认1，即全部输出，5xx和传输异常总是输出
+            LOG_SLOW_THRESHOLD - float, 慢请求阈值，单位：秒，超过阈值的请求总是以WARNING输出，默认不判断
+            LOG_REDACT_KEYS - Iterable[str], 请求日志中额外需要脱敏的字段名称
+            JSON_CODEC - Union[str, JSONCodec], backend编码请求body和解码响应使用的JSON codec，"json"，"orjson"或JSONCodec实例，
+                默认安装了orjson时使用orjson，否则使用标准库json
+            HTTP_BACKEND_SHARED - bool, 使用backend名称或类型时，相同resource_endpoint和config的client共享backend实例及其连接池，
+                共享的backend不随client关闭，需要调用backend_registry.close_shared_instances，默认False
+        registry - (Optional) BackendRegistry, 解析http_backend名称和管理共享backend实例的注册表，默认使用backend_registry
         Memo::
             1.使用str作为http_backend参数时，请提供正确的，当传入的http_backend无法被解析时会抛出异常
+            2.str类型的http_backend通过backend_registry解析并缓存，第三方backend可以在entry points分组
+              omi_async_http_client.backends中声明
         Usage::
         """
         assert http_backend, "http_backend can not be empty"
@@ -252,27 +467,157 @@ class AsyncHTTPClient(Generic[ModelType]):
 
         # 保留app的引用
         self._app_ref = app
-        # 设置app
-        self.setup_app(app)
+        self._lifecycle_app = None
+        self._snapshot_opened = False
+        self._snapshot_task = None
+        self.resource_endpoint = resource_endpoint
+        # 创建和共享backend使用的注册表，close时判断backend是否为该注册表的共享实例
+        self.backend_registry = registry or backend_registry
         # 设置backend
         http_backend_instance = self.parse_backend_from_config(http_backend, config)
         self.http_backend_name = http_backend_instance.__class__.__name__
         self.http_backend = http_backend_instance
 
-        self.resource_endpoint = resource_endpoint
         self.client_id = client_id
         self.client_secret = client_secret
         self.model = model
         self.config = config
 
+        # 预先生成只读的默认headers和auth，所有请求共享
+        # 默认将client_id放在X_ClientId中，client_secret放在X_Client_Secret中，使用application/json作为Content-Type
+        self.default_headers = FrozenDict({
+            "Content-Type": "application/json",
+            "X_ClientId": client_id,
+            "X_Client_Secret": client_secret,
+        })
+        # 默认使用client_id作为username，client_secret作为password，用于HTTPBasicAuth
+        self.default_auth = FrozenDict({
+            "username": client_id,
+            "password": client_secret,
+        })
+
+        # 合并相同的并发retrieve请求，使用config中的SINGLE_FLIGHT开启
+        self.single_flight = SingleFlight() if get_config_value(config, "SINGLE_FLIGHT", False) else None
+        # retrieve使用的response缓存，使用config中的RESPONSE_CACHE开启
+        self.response_cache = self.parse_response_cache_from_config(config)
+        # 使用响应头Cache-Control决定缓存时间，使用config中的RESPONSE_CACHE_CONTROL开启
+        self.cache_control = bool(get_config_value(config, "RESPONSE_CACHE_CONTROL", False))
+        self._revalidations: Dict[str, asyncio.Future] = {}
+        # 缓存提前刷新的倾向(XFetch算法的beta)，使用config中的RESPONSE_CACHE_EARLY_REFRESH_BETA开启
+        self.early_refresh_beta = float(get_config_value(config, "RESPONSE_CACHE_EARLY_REFRESH_BETA", 0))
+        # 后台预热访问最多的缓存key，使用config中的RESPONSE_CACHE_WARM_TOP_K开启
+        self.warmer = self.parse_warmer_from_config(config)
+        # retrieve结果为404时的negative缓存，使用config中的NEGATIVE_CACHE_TTL开启
+        self.negative_cache = self.parse_negative_cache_from_config(config)
+        # 合并按ID的retrieve请求为一次集合资源请求，使用config中的BATCH_RETRIEVE开启
+        if model is not None and get_config_value(config, "BATCH_RETRIEVE", False):
+            self.batch_loader = RetrieveBatchLoader(
+                self,
+                id_key=get_config_value(config, "BATCH_ID_KEY", "id"),
+                batch_window=get_config_value(config, "BATCH_WINDOW", 0),
+                max_batch_size=get_config_value(config, "BATCH_MAX_SIZE", RetrieveBatchLoader.DEFAULT_MAX_BATCH_SIZE),
+                items_key=get_config_value(config, "BATCH_ITEMS_KEY", "detail"),
+            )
+        else:
+            self.batch_loader = None
+        # 请求日志，只在需要输出时构建日志内容
+        self.request_logger = RequestLogger(
+            logger,
+            sample_rate=get_config_value(config, "LOG_SAMPLE_RATE", 1),
+            slow_threshold=get_config_value(config, "LOG_SLOW_THRESHOLD", None),
+            redact_keys=get_config_value(config, "LOG_REDACT_KEYS", None),
+        )
+        # 设置app，需要在warmer和response_cache创建之后，用于判断是否需要关联app的生命周期
+        self.setup_app(app)
+
+    @property
+    def default_auth_method(self) -> Any:
+        """
+        默认auth对应的backend原生auth对象，在首次使用时生成并由http_backend缓存，
+        client_id，client_secret为None时创建client不受backend的auth限制
+        """
+        return self.http_backend.get_auth_method(self.default_auth)
+
     @property
     def app_ref(self):
         return self._app_ref
 
+    async def startup(self):
+        """
+        启动client的后台任务，由setup_app关联的app startup事件调用
+            设置了RESPONSE_CACHE_SNAPSHOT时，在后台从快照文件读取response_cache的内容，
+            最多等待RESPONSE_CACHE_SNAPSHOT_WAIT秒，多个client共享同一个response_cache时，快照文件只读取一次
+            设置了RESPONSE_CACHE_WARM_TOP_K时，启动response_cache的预热
+        """
+        snapshot = get_config_value(self.config, "RESPONSE_CACHE_SNAPSHOT", None)
+        if self.response_cache is not None and snapshot and not self._snapshot_opened:
+            # 快照由response_cache按实例管理，共享同一缓存的client只读取一次
+            self._snapshot_opened = True
+            self._snapshot_task = asyncio.ensure_future(self.load_snapshot(snapshot))
+            wait = get_config_value(self.config, "RESPONSE_CACHE_SNAPSHOT_WAIT", 0)
+            if wait > 0:
+                # 超时后快照继续在后台读取，不会被取消
+                await asyncio.wait([self._snapshot_task], timeout=wait)
+        if self.warmer is not None:
+            await self.warmer.start()
+
+    async def load_snapshot(self, snapshot: str):
+        """
+        从快照文件读取response_cache的内容，快照文件损坏时不影响启动，缓存从空开始，@See startup
+        """
+        try:
+            count = await self.response_cache.open_snapshot(
+                snapshot, limit=get_config_value(self.config, "RESPONSE_CACHE_SNAPSHOT_LIMIT", None)
+            )
+            if count is not None:
+                logger.info(f"<AsyncHTTPClient>:SNAPSHOT_LOADED={snapshot} ENTRIES={count}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"<AsyncHTTPClient>:SNAPSHOT_LOAD_FAILED={snapshot} ERROR={e!r}")
+
+    async def shutdown(self):
+        """
+        停止client的后台任务，由setup_app关联的app shutdown事件调用
+            设置了RESPONSE_CACHE_SNAPSHOT时，将response_cache的内容保存到快照文件，
+            多个client共享同一个response_cache时，由最后一个shutdown的client保存
+            设置了BATCH_RETRIEVE时，发起已收集的批次并等待执行中的批量请求完成
+        """
+        if self.warmer is not None:
+            await self.warmer.stop()
+        if self.batch_loader is not None:
+            await self.batch_loader.close()
+        snapshot = get_config_value(self.config, "RESPONSE_CACHE_SNAPSHOT", None)
+        if self.response_cache is not None and snapshot and self._snapshot_opened:
+            # 等待后台读取完成后再保存，避免未读取的快照内容丢失
+            if self._snapshot_task is not None:
+                await self._snapshot_task
+                self._snapshot_task = None
+            # 共享同一缓存的client中最后一个shutdown的client保存快照
+            self._snapshot_opened = False
+            count = await self.response_cache.close_snapshot(snapshot)
+            if count is not None:
+                logger.info(f"<AsyncHTTPClient>:SNAPSHOT_DUMPED={snapshot} ENTRIES={count}")
+
+    async def close(self):
+        """
+        关闭当前client，停止后台任务，取消后台的缓存刷新任务，释放response_cache和http_backend持有的连接池等资源
+        """
+        await self.shutdown()
+        for task in list(self._revalidations.values()):
+            task.cancel()
+        if self.response_cache is not None:
+            # SQLiteResponseCache关闭时写入暂存的最近使用时间，在executor中执行
+            await asyncio.get_event_loop().run_in_executor(None, self.response_cache.close)
+        # 共享的backend由创建它的注册表的close_shared_instances关闭
+        if not self.backend_registry.is_shared_instance(self.http_backend):
+            await self.http_backend.close()
+
     def setup_app(self, app):
         """
-        关联manager与app context上下文,当前manager对象的引用将被设置到`app.state.OMI_ASYNC_HTTP_CLIENT`
+        关联manager与app context上下文,当前manager对象的引用将被设置到`app.state.OMI_ASYNC_HTTP_CLIENT`，
+        并在app的startup/shutdown事件中启动和停止后台任务，@See startup, shutdown
         """
+        # 在app的生命周期中启动和停止后台任务
+        self.setup_lifecycle(app)
         # 为app增加cache_manager属性
         if isinstance(app, object) and hasattr(app, "state"):
             state = getattr(app, "state")
@@ -285,42 +630,60 @@ class AsyncHTTPClient(Generic[ModelType]):
             else:
                 pass
 
+    def has_background_tasks(self) -> bool:
+        """
+        是否设置了需要在app生命周期中启动和停止的后台任务，即response_cache的预热或快照
+        """
+        if self.warmer is not None:
+            return True
+        return self.response_cache is not None and bool(get_config_value(self.config, "RESPONSE_CACHE_SNAPSHOT", None))
+
+    def setup_lifecycle(self, app):
+        """
+        设置了后台任务时，在app的startup/shutdown事件中调用startup和shutdown
+        Memo::
+            没有后台任务的client不注册事件，避免app的事件列表持有每个client及其backend的引用
+            同一个client对同一个app只注册一次
+        """
+        if app is None or self._lifecycle_app is app or not self.has_background_tasks():
+            return
+        add_event_handler = getattr(app, "add_event_handler", None)
+        if callable(add_event_handler):
+            add_event_handler("startup", self.startup)
+            add_event_handler("shutdown", self.shutdown)
+            self._lifecycle_app = app
+
     def parse_backend_from_config(self, http_backend, config):
         """
         配置当前client的backend的实例
+        http_backend - Union[str, Type, AsyncHTTPClientBackend], backend名称，backend类型或backend实例，
+            名称使用self.backend_registry解析，@See BackendRegistry
+        Exceptions::
+            ValueError, http_backend无法解析，或者是config不同的共享backend实例时抛出
         """
-        # 如果http_backend是str, 那么反射创建一个http_backend的instance
+        # 如果http_backend是str, 那么通过backend_registry解析类型并创建一个http_backend的instance
         if isinstance(http_backend, str):
-            # alias
-            http_backend_lower = http_backend.lower()
-            if http_backend_lower in ["requestsclientbackend", "requests"]:
-                http_backend = "omi_async_http_client.requests_backend.RequestsClientBackend"
-            elif http_backend_lower in ["aiohttpclientbackend", "aiohttp"]:
-                http_backend = "omi_async_http_client.aiohttp_backend.AioHttpClientBackend"
-            elif http_backend_lower in ["httpxclientbackend", "httpx"]:
-                http_backend = "omi_async_http_client.httpx_backend.HttpxClientBackend"
-            elif http_backend_lower in ["fastapitestclientbackend", "fastapi_test_client"]:
-                http_backend = "omi_async_http_client.fastapi_testclient_backend.FastAPITestClientBackend"
+            http_backend = self.backend_registry.resolve(http_backend)
+        if isinstance(http_backend, type):
+            if not issubclass(http_backend, AsyncHTTPClientBackend):
+                raise ValueError(
+                    'http_backend type %s is not an instance of AsyncHTTPClientBackend ' % str(http_backend))
+            backend_class = http_backend
+            if get_config_value(config, "HTTP_BACKEND_SHARED", False):
+                # 相同backend类型，resource_endpoint和config的client共享同一个backend实例及其连接池
+                cache_backend_instance = self.backend_registry.get_shared_instance(
+                    backend_class, self.resource_endpoint, config,
+                    lambda: backend_class(client=self, config=config),
+                )
             else:
-                pass
-            name = http_backend.split('.')
-            used = name.pop(0)
-            try:
-                found = __import__(used)
-                # 查找模块下同名class_meta
-                for frag in name:
-                    used += '.' + frag
-                    try:
-                        # 使用getattr方式获取type
-                        found = getattr(found, frag)
-                    except AttributeError:
-                        # 使用__import__导入type
-                        __import__(used)
-                        found = getattr(found, frag)
-                # 实例化instance
-                cache_backend_instance = found(client=self, config=config)
-            except ImportError:
-                raise ValueError('Cannot resolve http_backend type %s' % http_backend)
+                cache_backend_instance = backend_class(client=self, config=config)
+        elif isinstance(http_backend, AsyncHTTPClientBackend) and self.backend_registry.is_shared_instance(http_backend):
+            # 共享的backend按config创建，不能被其他client的config覆盖，client_ref保留创建时的client
+            if get_config_key(http_backend.config or None) != get_config_key(config or None):
+                raise ValueError('shared http_backend %s is configured with a different config' % str(http_backend))
+            if http_backend.client_ref is None:
+                http_backend.set_client_ref(self)
+            cache_backend_instance = http_backend
         elif isinstance(http_backend, AsyncHTTPClientBackend):
             # 设置client_ref
             http_backend.set_client_ref(self)
@@ -332,11 +695,88 @@ class AsyncHTTPClient(Generic[ModelType]):
                 'http_backend type %s is not an instance of AsyncHTTPClientBackend ' % str(type(http_backend)))
         return cache_backend_instance
 
+    @staticmethod
+    def parse_response_cache_from_config(config) -> Optional[ResponseCache]:
+        """
+        从config中创建retrieve使用的response缓存
+        RESPONSE_CACHE为ResponseCache实例时直接使用，为True时创建MemoryResponseCache，
+        同时设置了RESPONSE_CACHE_PATH时创建保存在该文件中的SQLiteResponseCache，未设置时不使用缓存
+        """
+        response_cache = get_config_value(config, "RESPONSE_CACHE", None)
+        if response_cache is None or response_cache is False:
+            return None
+        if isinstance(response_cache, ResponseCache):
+            return response_cache
+        snapshot = get_config_value(config, "RESPONSE_CACHE_SNAPSHOT", None)
+        if snapshot:
+            # 相同快照文件的client共享缓存实例，避免各自保存快照时互相覆盖，缓存key包含model，共享不会冲突
+            response_cache = _snapshot_response_caches.get(snapshot, None)
+            if response_cache is None:
+                response_cache = AsyncHTTPClient.create_response_cache(config)
+                _snapshot_response_caches[snapshot] = response_cache
+            return response_cache
+        return AsyncHTTPClient.create_response_cache(config)
+
+    @staticmethod
+    def create_response_cache(config) -> ResponseCache:
+        """
+        按照config创建新的MemoryResponseCache或SQLiteResponseCache，@See parse_response_cache_from_config
+        """
+        path = get_config_value(config, "RESPONSE_CACHE_PATH", None)
+        if path is not None:
+            return SQLiteResponseCache(
+                path,
+                ttl=get_config_value(config, "RESPONSE_CACHE_TTL", ResponseCache.DEFAULT_TTL),
+                max_entries=get_config_value(config, "RESPONSE_CACHE_MAX_ENTRIES",
+                                             SQLiteResponseCache.DEFAULT_MAX_ENTRIES),
+                max_bytes=get_config_value(config, "RESPONSE_CACHE_MAX_BYTES", None),
+                shared=bool(get_config_value(config, "RESPONSE_CACHE_SHARED", False)),
+            )
+        return MemoryResponseCache(
+            ttl=get_config_value(config, "RESPONSE_CACHE_TTL", ResponseCache.DEFAULT_TTL),
+            max_entries=get_config_value(config, "RESPONSE_CACHE_MAX_ENTRIES", MemoryResponseCache.DEFAULT_MAX_ENTRIES),
+            max_bytes=get_config_value(config, "RESPONSE_CACHE_MAX_BYTES", None),
+            shared=bool(get_config_value(config, "RESPONSE_CACHE_SHARED", False)),
+        )
+
+    def parse_warmer_from_config(self, config) -> Optional[RefreshAheadWarmer]:
+        """
+        从config中创建response_cache的后台预热，RESPONSE_CACHE_WARM_TOP_K大于0且设置了response_cache时创建，否则不使用
+        """
+        top_k = get_config_value(config, "RESPONSE_CACHE_WARM_TOP_K", 0)
+        if not top_k or top_k <= 0 or self.response_cache is None:
+            return None
+        return RefreshAheadWarmer(
+            self,
+            top_k=top_k,
+            interval=get_config_value(config, "RESPONSE_CACHE_WARM_INTERVAL", RefreshAheadWarmer.DEFAULT_INTERVAL),
+            refresh_ahead=get_config_value(config, "RESPONSE_CACHE_WARM_AHEAD", RefreshAheadWarmer.DEFAULT_REFRESH_AHEAD),
+            concurrency=get_config_value(config, "RESPONSE_CACHE_WARM_CONCURRENCY",
+                                         RefreshAheadWarmer.DEFAULT_CONCURRENCY),
+            jitter=get_config_value(config, "RESPONSE_CACHE_WARM_JITTER", RefreshAheadWarmer.DEFAULT_JITTER),
+            min_hits=get_config_value(config, "RESPONSE_CACHE_WARM_MIN_HITS", RefreshAheadWarmer.DEFAULT_MIN_HITS),
+            idle_timeout=self.response_cache.ttl,
+        )
+
+    @staticmethod
+    def parse_negative_cache_from_config(config) -> Optional[ResponseCache]:
+        """
+        从config中创建retrieve结果为404时使用的negative缓存，NEGATIVE_CACHE_TTL大于0时创建MemoryResponseCache，否则不使用
+        """
+        ttl = get_config_value(config, "NEGATIVE_CACHE_TTL", 0)
+        if not ttl or ttl <= 0:
+            return None
+        return MemoryResponseCache(
+            ttl=ttl,
+            max_entries=get_config_value(config, "NEGATIVE_CACHE_MAX_ENTRIES", MemoryResponseCache.DEFAULT_MAX_ENTRIES),
+        )
+
     def get_url(
             self,
             opt_id: Optional[Dict] = None,
             extra_params: Optional[Dict] = None,
             with_rnd: bool = False,
+            model: Optional[Type] = None,
     ) -> str:
         """
         使用指定参数构建调用API的URL对象，返回URL类型对象，默认会将client_id放在url中
@@ -349,18 +789,20 @@ class AsyncHTTPClient(Generic[ModelType]):
                 是否在url参数中增加rnd参数，默认不增加。
                 用于请求时区别同一个资源URL的两次不同请求，参数的值默认使用8位字母和数字的组合
                 random.sample(string.ascii_letters + string.digits, 8)
+        model - (Optional) Type, 构建URL使用的model类型，默认使用client的model
         Memo::
             对于，指定了ModelType的Client，会获取ModelType的api_name，prefix，suffix属性用于
             构造API调用用的URL， API将按"{prefix}{api_name}{suffix}规则构建，对于api_name，
-            prefix，suffix中使用了占位符的情况，会使用extra_params中设定的参数值替换
+            prefix，suffix中使用了占位符的情况，会使用opt_id和extra_params中设定的参数值替换
             例如：api_name = foo/{placeholder}/bar,如果extra_params包含placeholder的mapping，
-            则会将mapping的value替换，否则Raise KeyError
+            则会将mapping的value替换，否则Raise KeyError，替换占位符使用的参数同样会拼接在url参数中
+            路径模板由@RequestModel预编译，@See ApiTemplate
 
         Usage::
         #    >>> get_url(opt_id={"id_key1":"value"}, \
         #       extra_params={"placeholder":"value","param":"value"},\
         #       with_rnd=True)
-        #    >>> http://{resource_endpoint}/{prefix}{api_name}{suffix}?id_key=value&placeholder=value&param=value
+        #    >>> http://{resource_endpoint}/{prefix}{api_name}{suffix}?client_id=value&id_key=value&param=value
         """
 
         # 默认将client_id放在url中
@@ -386,65 +828,49 @@ class AsyncHTTPClient(Generic[ModelType]):
                 },
             }
 
-        # 设置设置前缀，后缀，从前面组合的param里面获取设置的值，补足相应的前后缀
-        if self.model:
-            api_name = getattr(self.model, "_api_name", "")
-            # api_name不能为空
-            assert api_name, "A api name can not be blank or nothing."
-            # 使用params格式化
-            api_name = api_name.format(**params)
-            # 获取prefix
-            prefix = getattr(self.model, "_api_prefix", "")
-            prefix = prefix.format(**params)
-            # 获取suffix
-            suffix = getattr(self.model, "_api_suffix", "")
-            suffix = suffix.format(**params)
-
-            # api_name，prefix，suffix都不能以‘/’结尾
-            assert not api_name.endswith("/"), "A api name must not end with '/'"
-            assert not prefix.endswith("/"), "A api suffix must not end with '/'"
-            assert not suffix.endswith("/"), "A api suffix must not end with '/'"
-
-            # resource_endpoint不以“/”结尾而且不以“/” 开头 补一个"/"
-            if self.resource_endpoint.endswith("/"):
-                if prefix and prefix.startswith("/"):
-                    prefix = prefix[1:]  # 剔除'/'
-                else:
-                    pass
-            else:
-                if prefix and not prefix.startswith("/"):
-                    prefix = "/" + prefix
-                else:
-                    pass
-
-            # 非"/"开头，补一个"/"
-            if api_name != "" and not api_name.startswith("/"):
-                api_name = "/" + api_name
-
-            # 非空且非"/"开头，补一个"/"
-            if suffix != "" and not suffix.startswith("/"):
-                suffix = "/" + suffix
-
-            api_path = f"{prefix}{api_name}{suffix}"
-            # api_path = f"{self.model._api_prefix}/{self.model._api_name}/{self.model._api_suffix}"
+        # 使用model预编译的API路径模板，替换占位符，所有参数仍然保留在url参数中
+        if model is None:
+            model = self.model
+        if model:
+            api_path = get_api_template(model).render(params, self.resource_endpoint.endswith("/"))
         else:
             api_path = ""
 
+        url = f"{self.resource_endpoint}{api_path}?{urlencode(params)}"
         # 随机生成8位数字rnd,用于url
         if with_rnd:
-            params["rnd"] = "".join(
-                random.sample(string.ascii_letters + string.digits, 8)
-            )
-        url = f"{self.resource_endpoint}{api_path}?{urlencode(params)}"
-        logger.info(f"<AsyncHTTPClient>:REQUEST_URL={str(url)}")
+            url = self.with_rnd_param(url)
         return url
 
+    @staticmethod
+    def with_rnd_param(url: str) -> str:
+        """
+        在url参数的最后增加rnd参数，参数的值使用8位字母和数字的组合
+        """
+        rnd = "".join(random.sample(string.ascii_letters + string.digits, 8))
+        return f"{url}&rnd={rnd}" if "?" in url else f"{url}?rnd={rnd}"
+
+    @staticmethod
+    def get_request_key(url: str, header: Dict, auth: Any) -> Tuple:
+        """
+        构建用于识别相同请求的key，由不含rnd的url，header和auth身份组成
+        """
+        if isinstance(auth, Dict):
+            auth = tuple(sorted((k, str(v)) for k, v in auth.items()))
+        return (
+            url,
+            tuple(sorted((k, str(v)) for k, v in header.items())) if header else (),
+            auth,
+        )
+
     def get_headers(self, extra_headers: Optional[Dict] = None) -> Dict:
         """使用指定参数构建调用API的HEADERS对象，返回Dict
         extra_headers - (Optional) Dictionary
                 参与构建请求Header的参数列表，所有值都会mapping进返回Dict，只有None才会丢弃，空白字符""会保留
                 根据HTTP协议的规则，传入的extra_headers值会根据设定的编码类型自动完成转码和编码操作
                 如需传输urlencode以后结果，请自行调用后将结果传入
+        Memo::
+            extra_headers为空时返回构建时生成的只读default_headers，需要修改时请先复制
         Usage::
         #    >>> get_headers({"header_to_set1":"value1","header_to_set2":123,"header_to_set3":"",})
         #    >>> {
@@ -456,18 +882,13 @@ class AsyncHTTPClient(Generic[ModelType]):
         #            "header_to_set3":""
         #        }
         """
-        # 默认将client_id放在X_ClientId中，client_secret放在X_Client_Secret中，使用application/json作为Content-Type
-        headers = {
-            "Content-Type": "application/json",
-            "X_ClientId": self.client_id,
-            "X_Client_Secret": self.client_secret,
-        }
-        if extra_headers is not None:
+        # 没有extra_headers时直接使用构建时生成的只读headers
+        headers = self.default_headers
+        if extra_headers:
             headers = {
                 **headers,
                 **{k: v for k, v in extra_headers.items() if v is not None},
             }
-        logger.info(f"<AsyncHTTPClient>:REQUEST_HEADERS={str(headers)}")
         return headers
 
     def get_auth(self, extra_auths: Optional[Dict] = None) -> Dict:
@@ -478,6 +899,7 @@ class AsyncHTTPClient(Generic[ModelType]):
                 参与构建请求Auth的参数列表，所有值都会mapping进返回Dict，只有None才会丢弃，空白字符""会保留
         Memo::
             对于部分服务器端软件使用login而不是username的情况，此处需要根据实际使用extra_auths替换调整
+            extra_auths为空时返回构建时生成的只读default_auth，backend会复用已生成的原生auth对象
         Usage::
         #    >>> get_auth({"auth_to_set1":"value1","auth_to_set2":123,"auth_to_set3":"",})
         #    >>> {
@@ -488,17 +910,35 @@ class AsyncHTTPClient(Generic[ModelType]):
         #            "auth_to_set3":""
         #        }
         """
-        # 默认使用client_id作为username，client_secret作为password，用于HTTPBasicAuth
-        auth = {
-            "username": self.client_id,
-            "password": self.client_secret
-        }
+        # 没有extra_auths时直接使用构建时生成的只读auth
+        auth = self.default_auth
         # 增加extra_auths的值到Auth头部
-        if extra_auths is not None:
+        if extra_auths:
             auth = {**auth, **{k: v for k, v in extra_auths.items() if v is not None}}
-        logger.info(f"<AsyncHTTPClient>:REQUEST_AUTH={str(auth)}")
         return auth
 
+    async def request_backend(self, method: str, url: Any, data: Any, header: Dict, auth: Any, timeout) -> Any:
+        """
+        调用http_backend中method对应的方法发起请求，并使用request_logger记录请求日志
+        method - str, http_backend的方法名称，get/put/post/delete
+        Memo::
+            异常会原样抛出，日志只在需要输出时才会构建，@See RequestLogger
+        """
+        started = time.perf_counter()
+        try:
+            response = await getattr(self.http_backend, method)(
+                url=url,
+                data=data,
+                header=header,
+                auth=auth,
+                timeout=timeout,
+            )
+        except Exception as e:
+            self.request_logger.log_request(method, url, header, auth, data, None, time.perf_counter() - started, e)
+            raise
+        self.request_logger.log_request(method, url, header, auth, data, response, time.perf_counter() - started)
+        return response
+
     async def normal_post(
             self,
             obj_in: Union[ModelType, Dict],
@@ -508,15 +948,14 @@ class AsyncHTTPClient(Generic[ModelType]):
             timeout=DEFAULT_HTTP_REQUEST_TIMEOUT,
     ) -> Optional[MessageModel]:
         try:
-            logger.info(f"<AsyncHTTPClient>:REQUEST_BODY={str(obj_in)}")
-            response = await self.http_backend.post(
+            response = await self.request_backend(
+                "post",
                 url=self.get_url(opt_id=None, extra_params=extra_params),
                 data=obj_in,
                 header=self.get_headers(extra_headers),
                 auth=self.get_auth(extra_auths),
                 timeout=timeout,
             )
-            logger.info(f"<AsyncHTTPClient>:RESPONSE={str(response)}")
             if isinstance(response, Dict):
                 # 获取响应代码
                 status_code = response.get("status_code", 0)
@@ -567,18 +1006,17 @@ class AsyncHTTPClient(Generic[ModelType]):
         Usage::
         """
         try:
-            logger.info(f"<AsyncHTTPClient>:REQUEST_BODY={str(obj_in)}")
+            url = self.get_url(opt_id=None, extra_params=extra_params)
             # 发起post请求
-            response = await self.http_backend.post(
-                url=self.get_url(opt_id=None, extra_params=extra_params),
+            response = await self.request_backend(
+                "post",
+                url=url,
                 data=obj_in,
                 header=self.get_headers(extra_headers),
                 auth=self.get_auth(extra_auths),
                 timeout=timeout,
             )
 
-            logger.info(f"<AsyncHTTPClient>:RESPONSE={str(response)}")
-
             if isinstance(response, Dict):
                 # 获取响应代码
                 status_code = response.get("status_code", 0)
@@ -592,6 +1030,7 @@ class AsyncHTTPClient(Generic[ModelType]):
 
             # 处理正确的响应内容
             if status_code in [status_codes.OK, status_codes.CREATED, status_codes.ACCEPTED]:
+                await self.invalidate_cached_paths(url, extra_params=extra_params)
                 # 如果额外指定了extra_model,返回转换过的extra_model类型，否则返回定义的类型
                 if extra_model:
                     obj = extra_model(**response_dict)
@@ -635,17 +1074,17 @@ class AsyncHTTPClient(Generic[ModelType]):
         Usage::
         """
         try:
+            url = self.get_url(opt_id=opt_id, extra_params=extra_params)
             # 发起delete请求
-            response = await self.http_backend.delete(
-                url=self.get_url(opt_id=opt_id, extra_params=extra_params),
+            response = await self.request_backend(
+                "delete",
+                url=url,
                 data=None,
                 header=self.get_headers(extra_headers),
                 auth=self.get_auth(extra_auths),
                 timeout=timeout,
             )
 
-            logger.info(f"<AsyncHTTPClient>:RESPONSE={str(response)}")
-
             if isinstance(response, Dict):
                 # 获取响应代码
                 status_code = response.get("status_code", 0)
@@ -658,6 +1097,7 @@ class AsyncHTTPClient(Generic[ModelType]):
                 response_dict = None
 
             if status_code == status_codes.OK:
+                await self.invalidate_cached_paths(url, opt_id, extra_params)
                 if extra_model:
                     obj = extra_model(**response_dict)
                 else:
@@ -680,6 +1120,8 @@ class AsyncHTTPClient(Generic[ModelType]):
             extra_model: Type[ModelType] = None,
             timeout=DEFAULT_HTTP_REQUEST_TIMEOUT,
             paging_model: Type[ModelType] = None,
+            cache: bool = True,
+            max_age: Optional[float] = None,
     ) -> Union[ModelType, PagedModel, MessageModel]:
         """
         调用远程Resource API，完成Retrieve操作，返回Retrieve完成后的对象，可以是单个model，用户指定model，model列表或分类
@@ -691,6 +1133,9 @@ class AsyncHTTPClient(Generic[ModelType]):
         extra_auths - (Optional) Dictionary, 在http auth 中增加的相应的参数
         extra_model - (Optional) Dictionary, 指定返回response需要转换的Model类型，如不指定按client初始化使用的model类型返回
         timeout - int, default = DEFAULT_HTTP_REQUEST_TIMEOUT
+        paging_model - (Optional) Type, 指定返回分页数据使用的Model类型
+        cache - bool, default = True, client设置了response_cache时，是否使用缓存，为False时直接请求且不写入缓存
+        max_age - (Optional) float, 可以接受的缓存最大时间，单位：秒，超过时重新请求，默认使用缓存的ttl
 
         Exceptions:
             ValidationError, Resource API调用发生验证错误时抛出
@@ -700,64 +1145,339 @@ class AsyncHTTPClient(Generic[ModelType]):
         Memo::
             返回的model类型对象的优先顺位
             self.model(指定opt_id) -> extra_model -> paging_model -> MessageModel
+            config中设置了SINGLE_FLIGHT时，url(不含rnd)，header，auth和返回model类型都相同的并发请求只会调用一次backend，
+            所有调用者共享同一个结果对象或异常
+            config中设置了BATCH_RETRIEVE时，只指定了opt_id={id_key: value}的请求会由batch_loader合并为批量请求，
+            批量请求同样使用negative_cache和response_cache，缓存未命中时才会加入批次
+            config中设置了NEGATIVE_CACHE_TTL时，结果为404的请求在有效时间内直接抛出HTTPException，不会调用backend
         Usage::
         """
+        # 只指定了ID的请求，缓存未命中时交给batch_loader合并为批量请求
+        batch_id = None
+        if self.batch_loader is not None and self.batch_loader.can_load(opt_id) and not any(
+                [condition, extra_params, extra_headers, extra_auths, extra_model, paging_model]):
+            batch_id = opt_id[self.batch_loader.id_key]
+
         # 将条件拼接参数,剔除空白
         if condition is not None:
             extra_params = {
-                **extra_params,
+                **(extra_params or {}),
                 **{k: v for k, v in condition.items() if v is not None},
             }
 
+        url = self.get_url(opt_id=opt_id, extra_params=extra_params)
+        header = self.get_headers(extra_headers)
+        auth = self.get_auth(extra_auths)
+
+        # 返回的model类型对象的优先顺位
+        if opt_id:
+            # 如果指定了opt_id,返回单个数据，否则返回分页数据
+            result_model = self.model
+        elif extra_model:
+            # 如果指定了extra_model，则返回
+            result_model = extra_model
+        elif paging_model:
+            # 如果指定了paging_model,返回分页模型数据，否则返回分页数据
+            result_model = paging_model
+        else:
+            # 其他情况，返回消息model
+            result_model = MessageModel
+        # else:
+        #     # TODO 如果不指定paging_model,则自动返回一个PagedModel
+        #     raise NotImplementedError
+        #     obj = PagedModel.parse_obj(response_dict)
+        #     items_type_name = str.lower(self.model.__name__)
+        #     items_dict = response_dict.get(items_type_name, None)
+        #     items = [
+        #         self.model(**item) for item in items_dict if item is not None
+        #     ]
+        #     obj.__fields__[items_type_name] = items
+
+        if self.negative_cache is None or not cache:
+            return await self.retrieve_result(url, header, auth, timeout, result_model, cache, max_age, batch_id)
+
+        # 资源不存在的结果在negative_cache中有效时，不再发起请求
+        key = self.negative_cache.make_key(status_codes.NOT_FOUND, url, header, auth)
+        entry = await self.negative_cache.get(key)
+        if entry is not None and entry.is_fresh(max_age):
+            self.negative_cache.hits += 1
+            raise HTTPException(**entry.response)
+        self.negative_cache.misses += 1
+        try:
+            return await self.retrieve_result(url, header, auth, timeout, result_model, cache, max_age, batch_id)
+        except HTTPException as e:
+            if e.status_code == status_codes.NOT_FOUND:
+                await self.negative_cache.set(key, self.negative_cache.create_entry(
+                    key, url, e.status_code,
+                    {"status_code": e.status_code, "trace_code": e.trace_code, "detail": e.detail},
+                ))
+            raise e
+
+    async def retrieve_result(
+            self,
+            url: str,
+            header: Dict,
+            auth: Any,
+            timeout,
+            result_model: Type[BaseModel],
+            cache: bool = True,
+            max_age: Optional[float] = None,
+            batch_id: Any = None,
+    ) -> BaseModel:
+        """
+        按照response_cache，single_flight的设置执行Retrieve操作，并将response转换为result_model类型返回
+        batch_id - (Optional) Any, 不为None时使用batch_loader按该ID批量获取，@See RetrieveBatchLoader
+        @See retrieve
+        """
+        if self.response_cache is not None and cache:
+            # 使用response缓存，缓存保存的是response内容，每次返回新的model对象
+            response_dict = await self.get_cached_response_dict(
+                url, header, auth, timeout, result_model, max_age, batch_id
+            )
+            return result_model(**response_dict)
+
+        if batch_id is not None:
+            return await self.batch_loader.load(batch_id, timeout)
+
+        if self.single_flight is not None:
+            # 合并相同的并发请求，共享同一次backend调用的response，每个调用者各自创建result_model对象，互不影响
+            response = await self.fetch_response(url, header, auth, timeout)
+            return result_model(**response.response)
+        return await self.retrieve_from_backend(url, header, auth, timeout, result_model)
+
+    async def invalidate_cached_paths(
+            self,
+            url: str,
+            opt_id: Optional[Dict] = None,
+            extra_params: Optional[Dict] = None,
+    ):
+        """
+        create/update/delete成功后调用，按写入的资源路径删除缓存，不会清空整个缓存
+            negative_cache - 删除该资源路径及其下级路径的404结果，例如create /resources后，/resources/{id}不再视为不存在
+            response_cache - 删除该资源及其下级路径的缓存，以及该资源所属集合路径的列表、分页结果，
+                例如写入/resources/1时，删除/resources/1，/resources/1/...和/resources?page=2等缓存
+        url - str, 写入操作使用的url
+        opt_id - (Optional) Dictionary, 写入操作使用的opt_id
+        extra_params - (Optional) Dictionary, 写入操作使用的extra_params
+        """
+        path = urlsplit(url).path
+        if self.negative_cache is not None:
+            await self.negative_cache.invalidate_path(path)
+        if self.response_cache is None:
+            return
+        collection_path = self.get_collection_path(opt_id, extra_params)
+        if collection_path is None or collection_path == path:
+            # 写入的就是集合路径，只删除集合的列表、分页结果，保留集合中各资源的缓存
+            await self.response_cache.invalidate_path(path, include_descendants=False)
+        else:
+            await self.response_cache.invalidate_path(path)
+            await self.response_cache.invalidate_path(collection_path, include_descendants=False)
+
+    def get_collection_path(self, opt_id: Optional[Dict] = None, extra_params: Optional[Dict] = None) \
+            -> Optional[str]:
+        """
+        从model的_api_prefix/_api_name/_api_suffix模板得到资源所属集合的url路径，
+        集合资源的model由get_collection_model得到，例如：/resources/{id} -> /resources，
+        其余占位符使用opt_id和extra_params中的值替换，无法得到集合路径时返回None
+        """
+        collection_model = get_collection_model(self.model)
+        if collection_model is None:
+            return None
+        try:
+            return urlsplit(self.get_url(opt_id=opt_id, extra_params=extra_params, model=collection_model)).path
+        except (KeyError, IndexError):
+            return None
+
+    async def retrieve_from_backend(
+            self,
+            url: str,
+            header: Dict,
+            auth: Any,
+            timeout,
+            result_model: Type[BaseModel],
+    ) -> BaseModel:
+        """
+        使用http_backend执行Retrieve操作的GET请求，并将response转换为result_model类型返回
+        url - str, 不含rnd参数的请求url，请求时会自动增加rnd参数
+        header - Dictionary, 请求使用的header
+        auth - Dictionary, 请求使用的auth
+        timeout - int, 请求的超时设置
+        result_model - Type[BaseModel], response转换使用的model类型
+
+        Exceptions:
+            HTTPException, Resource API 调用发生异常时抛出，通常这类错误都会指定status_code, 程序可以根据status_code进行处理
+        """
+        response_dict = await self.get_response_dict(url, header, auth, timeout)
+        return result_model(**response_dict)
+
+    async def get_cached_response_dict(
+            self,
+            url: str,
+            header: Dict,
+            auth: Any,
+            timeout,
+            result_model: Type[BaseModel],
+            max_age: Optional[float] = None,
+            batch_id: Any = None,
+    ) -> Dict:
+        """
+        从response_cache中获取response内容，缓存不存在或已过期时使用http_backend请求并写入缓存
+        max_age - (Optional) float, 可以接受的缓存最大时间，单位：秒
+        batch_id - (Optional) Any, 缓存未命中时使用batch_loader按该ID批量获取
+        Memo::
+            config中设置了RESPONSE_CACHE_CONTROL时，缓存时间由响应头Cache-Control决定，
+            已过期但在stale-while-revalidate时间内的缓存会直接返回，同时在后台刷新；
+            刷新发生服务端错误时，在stale-if-error时间内继续返回已过期的缓存；
+            缓存未命中时使用response_cache.fetch_lock加锁，相同key的并发调用只有一个会请求backend；
+            设置了RESPONSE_CACHE_EARLY_REFRESH_BETA时，即将过期的缓存会按XFetch算法提前在后台刷新
+        """
+        key = self.response_cache.make_key(result_model, url, header, auth)
+        entry = await self.response_cache.get(key)
+        if self.warmer is not None:
+            self.warmer.record(key, url, header, auth, timeout, entry.expires_at if entry is not None else None)
+        # 按是否采用缓存项计数，不满足max_age的缓存项计为未命中
+        if entry is not None and entry.is_fresh(max_age):
+            self.response_cache.hits += 1
+            if max_age is None and entry.should_refresh_early(self.early_refresh_beta):
+                # 即将过期的缓存提前在后台刷新，避免过期时大量请求同时未命中
+                if self.revalidate_in_background(key, url, header, auth, timeout):
+                    self.response_cache.early_refreshes += 1
+            return entry.response
+        if entry is not None and max_age is None and entry.is_stale_while_revalidate():
+            self.response_cache.hits += 1
+            self.revalidate_in_background(key, url, header, auth, timeout)
+            return entry.response
+        self.response_cache.misses += 1
+        try:
+            # 相同key同一时间只有一个请求刷新缓存，其他调用等待并共享结果
+            response = await self.response_cache.fetch_lock.do(
+                key, lambda: self.fetch_and_store_response(key, url, header, auth, timeout, batch_id)
+            )
+        except HTTPException as e:
+            if entry is not None and entry.is_stale_if_error() and (
+                    status_codes.is_server_error(e.status_code) or e.status_code == status_codes.REQUEST_TIMEOUT
+            ):
+                return entry.response
+            raise e
+        return response.response
+
+    async def fetch_and_store_response(self, key: str, url: str, header: Dict, auth: Any, timeout,
+                                       batch_id: Any = None, background: bool = False) -> ClientBackendResponse:
+        """
+        使用http_backend请求response并写入response_cache，同时记录请求所用的时间，用于判断是否提前刷新
+        background - bool, 是否为预热、后台刷新发起的请求，@See fetch_response
+        """
+        started_at = time.monotonic()
+        response = await self.fetch_response(url, header, auth, timeout, batch_id, background)
+        await self.store_response(key, url, response, delta=time.monotonic() - started_at)
+        return response
+
+    async def store_response(self, key: str, url: str, response: ClientBackendResponse, delta: float = 0):
+        """
+        将response写入response_cache，设置了RESPONSE_CACHE_CONTROL时按照响应头Cache-Control决定是否缓存及缓存时间
+        delta - float, 获取response所用的时间，单位：秒
+        """
+        if not self.cache_control:
+            entry = self.response_cache.create_entry(key, url, status_codes.OK, response.response, delta=delta)
+        else:
+            policy = self.response_cache.get_cache_policy(response.headers)
+            if policy is None:
+                await self.response_cache.delete(key)
+                return
+            entry = self.response_cache.create_entry(key, url, status_codes.OK, response.response, policy=policy,
+                                                     delta=delta)
+        await self.response_cache.set(key, entry)
+        if self.warmer is not None:
+            self.warmer.stored(key, entry.expires_at)
+
+    def revalidate_in_background(self, key: str, url: str, header: Dict, auth: Any, timeout) -> bool:
+        """
+        在后台刷新已过期或即将过期的缓存，相同key同一时间只有一个刷新任务，刷新失败时保留原缓存，
+        创建了新的刷新任务时返回True
+        """
+        if key in self._revalidations:
+            return False
+
+        async def revalidate():
+            try:
+                await self.response_cache.fetch_lock.do(
+                    key, lambda: self.fetch_and_store_response(key, url, header, auth, timeout, background=True),
+                    background=True,
+                )
+            except HTTPException as e:
+                logger.info(f"<AsyncHTTPClient>:REVALIDATE_FAILED={url} STATUS_CODE={e.status_code}")
+
+        task = asyncio.ensure_future(revalidate())
+        self._revalidations[key] = task
+        task.add_done_callback(lambda _: self._revalidations.pop(key, None))
+        return True
+
+    async def fetch_response(self, url: str, header: Dict, auth: Any, timeout, batch_id: Any = None,
+                             background: bool = False) -> ClientBackendResponse:
+        """
+        使用http_backend请求response，设置了single_flight时合并相同的并发请求，@See get_response
+        batch_id - (Optional) Any, 不为None时由batch_loader合并到集合资源请求中获取
+        background - bool, 是否为预热、后台刷新发起的请求，合并时计入single_flight.background_shared
+        """
+        if batch_id is not None:
+            response_dict = await self.batch_loader.load_response(batch_id, timeout)
+            return ClientBackendResponse(status_code=status_codes.OK, response=response_dict)
+        if self.single_flight is not None:
+            return await self.single_flight.do(
+                self.get_request_key(url, header, auth),
+                lambda: self.get_response(url, header, auth, timeout),
+                background=background,
+            )
+        return await self.get_response(url, header, auth, timeout)
+
+    async def get_response_dict(self, url: str, header: Dict, auth: Any, timeout) -> Dict:
+        """
+        使用http_backend发起GET请求，返回200响应的内容Dict，其他响应代码抛出HTTPException
+        url - str, 不含rnd参数的请求url，请求时会自动增加rnd参数
+        header - Dictionary, 请求使用的header
+        auth - Dictionary, 请求使用的auth
+        timeout - int, 请求的超时设置
+
+        Exceptions:
+            HTTPException, Resource API 调用发生异常时抛出，通常这类错误都会指定status_code, 程序可以根据status_code进行处理
+        """
+        response = await self.get_response(url, header, auth, timeout)
+        return response.response
+
+    async def get_response(self, url: str, header: Dict, auth: Any, timeout) -> ClientBackendResponse:
+        """
+        使用http_backend发起GET请求，返回包含响应头的200响应ClientBackendResponse，其他响应代码抛出HTTPException
+        @See get_response_dict
+        """
         try:
             # 发起get请求
-            response = await self.http_backend.get(
-                url=self.get_url(
-                    opt_id=opt_id, extra_params=extra_params, with_rnd=True
-                ),
+            response = await self.request_backend(
+                "get",
+                url=self.with_rnd_param(url),
                 data=None,
-                header=self.get_headers(extra_headers),
-                auth=self.get_auth(extra_auths),
+                header=header,
+                auth=auth,
                 timeout=timeout,
             )
 
-            logger.info(f"<AsyncHTTPClient>:RESPONSE={str(response)}")
-
             if isinstance(response, Dict):
                 # 获取响应代码
                 status_code = response.get("status_code", 0)
                 response_dict = response.get("response", None)
+                response_headers = response.get("headers", None) or {}
             elif isinstance(response, ClientBackendResponse):
                 status_code = getattr(response, "status_code", 0)
                 response_dict = getattr(response, "response", None)
+                response_headers = getattr(response, "headers", None) or {}
             else:
                 status_code = 0
                 response_dict = None
+                response_headers = {}
 
             if status_code == status_codes.OK:
-                if opt_id:
-                    # 如果指定了opt_id,返回单个数据，否则返回分页数据
-                    obj = self.model(**response_dict)
-                elif extra_model:
-                    # 如果指定了extra_model，则返回
-                    obj = extra_model(**response_dict)
-                elif paging_model:
-                    # 如果指定了paging_model,返回分页模型数据，否则返回分页数据
-                    obj = paging_model(**response_dict)
-                else:
-                    # 其他情况，返回消息model
-                    obj = MessageModel(**response_dict)
-                # else:
-                #     # TODO 如果不指定paging_model,则自动返回一个PagedModel
-                #     raise NotImplementedError
-                #     obj = PagedModel.parse_obj(response_dict)
-                #     items_type_name = str.lower(self.model.__name__)
-                #     items_dict = response_dict.get(items_type_name, None)
-                #     items = [
-                #         self.model(**item) for item in items_dict if item is not None
-                #     ]
-                #     obj.__fields__[items_type_name] = items
-                return obj
+                if isinstance(response, ClientBackendResponse):
+                    return response
+                return ClientBackendResponse(status_code=status_code, response=response_dict, headers=response_headers)
             else:
                 raise HTTPException(status_code)
         except HTTPException as e:
@@ -765,6 +1485,312 @@ class AsyncHTTPClient(Generic[ModelType]):
         finally:
             pass
 
+    async def bulk_retrieve(
+            self,
+            opt_ids: Iterable[Dict],
+            concurrency: int = DEFAULT_BULK_CONCURRENCY,
+            return_exceptions: bool = False,
+            ordered: bool = True,
+            extra_params: Optional[Dict] = None,
+            extra_headers: Optional[Dict] = None,
+            extra_auths: Optional[Dict] = None,
+            timeout=DEFAULT_HTTP_REQUEST_TIMEOUT,
+    ) -> AsyncIterator[Tuple[Dict, Union[ModelType, HTTPException]]]:
+        """
+        并发调用远程Resource API，按opt_ids批量完成Retrieve操作，以异步迭代器的方式逐个返回(opt_id, 结果)，
+        每个opt_id的请求与retrieve(opt_id=opt_id)使用相同的get_url/http_backend.get调用路径。
+        opt_ids - Iterable[Dictionary], 需要获取的资源ID列表，可以是生成器，按需读取
+        concurrency - int, default = DEFAULT_BULK_CONCURRENCY, 同时执行中的请求数上限
+        return_exceptions - bool, default = False,
+                为True时，单个opt_id发生的HTTPException作为结果返回，不中断整个批次，
+                为False时，遇到第一个HTTPException即取消其余请求并抛出
+        ordered - bool, default = True, 为True时按opt_ids的输入顺序返回，为False时按完成顺序返回
+        extra_params - (Optional) Dictionary, 在http url parameters 中增加的相应的参数
+        extra_headers - (Optional) Dictionary, 在http header 中增加的相应的参数
+        extra_auths - (Optional) Dictionary, 在http auth 中增加的相应的参数
+        timeout - int, default = DEFAULT_HTTP_REQUEST_TIMEOUT
+
+        Exceptions::
+            HTTPException, return_exceptions为False时，Resource API 调用发生的第一个异常
+        Memo::
+            执行中的请求不会超过concurrency个，opt_ids在迭代过程中逐个读取，
+            ordered为True时，执行中的请求与已完成但等待按顺序返回的结果合计不超过concurrency个
+        Usage::
+        #    >>> async for opt_id, obj in client.bulk_retrieve([{"id": 1}, {"id": 2}], concurrency=10):
+        #    >>>     print(opt_id, obj)
+        """
+        assert concurrency > 0, "concurrency must be greater than 0"
+
+        async def fetch(index, opt_id):
+            try:
+                obj = await self.retrieve(
+                    opt_id=opt_id,
+                    extra_params=extra_params,
+                    extra_headers=extra_headers,
+                    extra_auths=extra_auths,
+                    timeout=timeout,
+                )
+            except HTTPException as e:
+                if not return_exceptions:
+                    raise e
+                obj = e
+            return index, opt_id, obj
+
+        pending = set()
+        buffered = {}
+        next_index = 0
+        iterator = iter(enumerate(opt_ids))
+        exhausted = False
+        try:
+            while not exhausted or pending:
+                # 补足执行中的请求数到concurrency，ordered时等待返回的结果同样计入，避免慢请求阻塞时结果无限堆积
+                while not exhausted and len(pending) + len(buffered) < concurrency:
+                    try:
+                        index, opt_id = next(iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(fetch(index, opt_id)))
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, opt_id, obj = task.result()
+                    if ordered:
+                        buffered[index] = (opt_id, obj)
+                    else:
+                        yield opt_id, obj
+                # 按输入顺序返回已就绪的连续结果
+                while next_index in buffered:
+                    yield buffered.pop(next_index)
+                    next_index += 1
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def retrieve_page(
+            self,
+            paging_model: Type[ModelType],
+            page_no: int,
+            condition: Optional[Dict] = None,
+            extra_params: Optional[Dict] = None,
+            extra_headers: Optional[Dict] = None,
+            extra_auths: Optional[Dict] = None,
+            timeout=DEFAULT_HTTP_REQUEST_TIMEOUT,
+            page_param: str = "page",
+    ) -> ModelType:
+        """
+        获取指定页码的分页数据，page_no会作为page_param参数拼接在url中，@See retrieve
+        """
+        return await self.retrieve(
+            condition=condition,
+            extra_params={**(extra_params or {}), page_param: page_no},
+            extra_headers=extra_headers,
+            extra_auths=extra_auths,
+            timeout=timeout,
+            paging_model=paging_model,
+        )
+
+    def retrieve_all(
+            self,
+            paging_model: Type[ModelType],
+            concurrency: int = DEFAULT_BULK_CONCURRENCY,
+            stream: bool = False,
+            condition: Optional[Dict] = None,
+            extra_params: Optional[Dict] = None,
+            extra_headers: Optional[Dict] = None,
+            extra_auths: Optional[Dict] = None,
+            timeout=DEFAULT_HTTP_REQUEST_TIMEOUT,
+            page_param: str = "page",
+    ) -> Union[Awaitable[List[ModelType]], AsyncIterator[ModelType]]:
+        """
+        获取分页资源的全部页，第1页返回后根据total_pages并发获取第2页到最后一页，按页码顺序组合返回
+        paging_model - Type[ModelType], 分页model，使用其has_next和total_pages字段判断是否还有后续页
+        concurrency - int, default = DEFAULT_BULK_CONCURRENCY, 同时执行中的请求数上限
+        stream - bool, default = False,
+                为False时返回awaitable，结果为按页码排列的分页model列表，
+                为True时返回异步迭代器，按页码顺序逐页返回，最多预取concurrency页，@See iter_pages
+        condition - (Optional) Dictionary, 用于条件筛选的参数列表
+        extra_params - (Optional) Dictionary, 在http url parameters 中增加的相应的参数
+        extra_headers - (Optional) Dictionary, 在http header 中增加的相应的参数
+        extra_auths - (Optional) Dictionary, 在http auth 中增加的相应的参数
+        timeout - int, default = DEFAULT_HTTP_REQUEST_TIMEOUT
+        page_param - str, default = "page", 页码使用的url参数名称
+
+        Exceptions::
+            HTTPException, Resource API 调用发生异常时抛出
+        Memo::
+            分页model不包含total_pages时，按has_next逐页顺序获取
+        Usage::
+        #    >>> pages = await client.retrieve_all(paging_model=PagedStaff, concurrency=8)
+        #    >>> async for page in client.retrieve_all(paging_model=PagedStaff, concurrency=8, stream=True):
+        #    >>>     print(page.page)
+        """
+        assert concurrency > 0, "concurrency must be greater than 0"
+        page_kwargs = dict(
+            condition=condition,
+            extra_params=extra_params,
+            extra_headers=extra_headers,
+            extra_auths=extra_auths,
+            timeout=timeout,
+            page_param=page_param,
+        )
+        if stream:
+            return self.iter_pages(paging_model=paging_model, prefetch=concurrency, **page_kwargs)
+        return self.gather_pages(paging_model=paging_model, concurrency=concurrency, **page_kwargs)
+
+    async def gather_pages(
+            self,
+            paging_model: Type[ModelType],
+            concurrency: int = DEFAULT_BULK_CONCURRENCY,
+            **page_kwargs,
+    ) -> List[ModelType]:
+        """
+        并发获取分页资源的全部页，返回按页码排列的分页model列表，@See retrieve_all
+        """
+        first_page = await self.retrieve_page(paging_model=paging_model, page_no=1, **page_kwargs)
+        if not getattr(first_page, "has_next", None):
+            return [first_page]
+        total_pages = getattr(first_page, "total_pages", None)
+        if not total_pages:
+            # 未知总页数，按has_next逐页获取
+            pages = [first_page]
+            async for page in self.iter_pages(paging_model=paging_model, start_page=2, **page_kwargs):
+                pages.append(page)
+            return pages
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(page_no):
+            async with semaphore:
+                return await self.retrieve_page(paging_model=paging_model, page_no=page_no, **page_kwargs)
+
+        tasks = [asyncio.ensure_future(fetch(page_no)) for page_no in range(2, total_pages + 1)]
+        try:
+            pages = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return [first_page, *pages]
+
+    async def iter_pages(
+            self,
+            paging_model: Type[ModelType],
+            condition: Optional[Dict] = None,
+            extra_params: Optional[Dict] = None,
+            extra_headers: Optional[Dict] = None,
+            extra_auths: Optional[Dict] = None,
+            timeout=DEFAULT_HTTP_REQUEST_TIMEOUT,
+            page_param: str = "page",
+            start_page: int = 1,
+            prefetch: int = DEFAULT_PAGE_PREFETCH,
+    ) -> AsyncIterator[ModelType]:
+        """
+        以异步迭代器的方式逐页调用retrieve(paging_model=paging_model)，按页码顺序返回分页model，
+        在调用者处理第N页的同时预先获取之后的页。
+        paging_model - Type[ModelType], 分页model，使用其has_next和total_pages字段判断是否还有后续页
+        condition - (Optional) Dictionary, 用于条件筛选的参数列表
+        extra_params - (Optional) Dictionary, 在http url parameters 中增加的相应的参数
+        extra_headers - (Optional) Dictionary, 在http header 中增加的相应的参数
+        extra_auths - (Optional) Dictionary, 在http auth 中增加的相应的参数
+        timeout - int, default = DEFAULT_HTTP_REQUEST_TIMEOUT
+        page_param - str, default = "page", 页码使用的url参数名称
+        start_page - int, default = 1, 起始页码
+        prefetch - int, default = DEFAULT_PAGE_PREFETCH, 预先获取的页数，0表示不预取
+
+        Exceptions::
+            HTTPException, Resource API 调用发生异常时抛出
+        Memo::
+            分页model包含total_pages时，最多预取prefetch页，否则只能在收到第N页且has_next为True后预取第N+1页，
+            has_next为False，或has_next与total_pages都没有时结束迭代。
+            内存中最多同时保留prefetch + 1页，适用于数据量很大的集合
+        Usage::
+        #    >>> async for page in client.iter_pages(paging_model=PagedStaff, prefetch=2):
+        #    >>>     print(page.page, page.staffs)
+        """
+        assert prefetch >= 0, "prefetch must not be less than 0"
+
+        def fetch(page_no):
+            return asyncio.ensure_future(self.retrieve_page(
+                paging_model=paging_model,
+                page_no=page_no,
+                condition=condition,
+                extra_params=extra_params,
+                extra_headers=extra_headers,
+                extra_auths=extra_auths,
+                timeout=timeout,
+                page_param=page_param,
+            ))
+
+        scheduled = collections.deque()
+        next_page_no = start_page
+
+        def schedule(last_page_no):
+            nonlocal next_page_no
+            while next_page_no <= last_page_no:
+                scheduled.append((next_page_no, fetch(next_page_no)))
+                next_page_no += 1
+
+        schedule(start_page)
+        try:
+            while scheduled:
+                page_no, task = scheduled.popleft()
+                page = await task
+                has_next = getattr(page, "has_next", None)
+                total_pages = getattr(page, "total_pages", None)
+                if not has_next:
+                    # has_next为False或不存在时，以当前页为最后一页
+                    yield page
+                    break
+                if total_pages:
+                    # 已知总页数，预取到prefetch页为止
+                    last_page_no = min(total_pages, page_no + max(prefetch, 1))
+                else:
+                    # 未知总页数，只能预取下一页
+                    last_page_no = page_no + 1
+                if prefetch > 0:
+                    schedule(last_page_no)
+                    yield page
+                else:
+                    # 不预取时，调用者处理完当前页以后才发起下一页请求
+                    yield page
+                    schedule(page_no + 1)
+        finally:
+            for _, pending in scheduled:
+                pending.cancel()
+
+    async def iter_items(
+            self,
+            paging_model: Type[ModelType],
+            items_field: str,
+            condition: Optional[Dict] = None,
+            extra_params: Optional[Dict] = None,
+            extra_headers: Optional[Dict] = None,
+            extra_auths: Optional[Dict] = None,
+            timeout=DEFAULT_HTTP_REQUEST_TIMEOUT,
+            page_param: str = "page",
+            start_page: int = 1,
+            prefetch: int = DEFAULT_PAGE_PREFETCH,
+    ) -> AsyncIterator[Any]:
+        """
+        以异步迭代器的方式逐条返回各页中的数据，@See iter_pages
+        items_field - str, 分页model中数据列表对应的字段名称
+        """
+        async for page in self.iter_pages(
+                paging_model=paging_model,
+                condition=condition,
+                extra_params=extra_params,
+                extra_headers=extra_headers,
+                extra_auths=extra_auths,
+                timeout=timeout,
+                page_param=page_param,
+                start_page=start_page,
+                prefetch=prefetch,
+        ):
+            for item in getattr(page, items_field, None) or []:
+                yield item
+
     async def update(
             self,
             opt_id: Optional[Dict],
@@ -799,16 +1825,16 @@ class AsyncHTTPClient(Generic[ModelType]):
         Usage::
         """
         try:
-            logger.info(f"<AsyncHTTPClient>:REQUEST_BODY={str(obj_in)}")
+            url = self.get_url(opt_id=opt_id, extra_params=extra_params)
             # 发起put请求
-            response = await self.http_backend.put(
-                url=self.get_url(opt_id=opt_id, extra_params=extra_params),
+            response = await self.request_backend(
+                "put",
+                url=url,
                 data=obj_in,
                 header=self.get_headers(extra_headers),
                 auth=self.get_auth(extra_auths),
                 timeout=timeout,
             )
-            logger.info(f"<AsyncHTTPClient>:RESPONSE={str(response)}")
             # 获取响应代码
 
             if isinstance(response, Dict):
@@ -823,6 +1849,7 @@ class AsyncHTTPClient(Generic[ModelType]):
                 response_dict = None
 
             if status_code == status_codes.OK:
+                await self.invalidate_cached_paths(url, opt_id, extra_params)
                 if opt_id:
                     # 如果指定了opt_id,返回单个数据
                     obj = self.model(**response_dict)
@@ -851,7 +1878,8 @@ def api_client_builder(
         resource_endpoint: str = "",
         client_id: str = "",
         client_secret: str = "",
-        config: Union[Dict, Any] = None
+        config: Union[Dict, Any] = None,
+        cached: bool = False,
 ) -> AsyncHTTPClient:
     """
     使用参数创建一个AsyncHTTPClient实例对象，并返回
@@ -862,12 +1890,24 @@ def api_client_builder(
         默认会从settings中获取"SERVICE_CLIENT_ID"属性，如果没有设定将设置为空，使用getattr(settings, "SERVICE_CLIENT_ID", "")
     client_secret - str, client_secret, 用于向资源接入服务端提供客户端的认证。
         默认会从settings中获取"SERVICE_CLIENT_SECRET"属性，如果没有设定将设置为空，使用getattr(settings, "SERVICE_CLIENT_SECRET", "")
+    cached - bool, 为True时使用api_client_factory返回缓存的client，相同参数只创建一次，默认False
 
     Memo::
-        
+        cached=True时，相同resource_endpoint，http_backend和config的client共享同一个backend实例及其连接池，
+        shutdown时请调用api_client_factory.close_all()
     Usage::
     """
     assert resource_endpoint, "resource_endpoint can not be empty"
+    if cached:
+        return api_client_factory.get_client(
+            model=model,
+            app=app,
+            http_backend=http_backend,
+            resource_endpoint=resource_endpoint,
+            client_id=client_id,
+            client_secret=client_secret,
+            config=config,
+        )
     return AsyncHTTPClient(
         model=model,
         app=app,
@@ -879,4 +1919,86 @@ def api_client_builder(
     )
 
 
+class APIClientFactory:
+    """
+    缓存AsyncHTTPClient的工厂，按照(model, app, resource_endpoint, http_backend, client_id, client_secret, config)
+    返回已创建的client，参数与api_client_builder相同
+    Memo::
+        使用backend名称或类型时，相同resource_endpoint，http_backend和config的client通过backend_registry共享backend实例，
+        不同model的client使用同一个连接池
+        传入backend实例时，按实例区分，由调用方管理backend的生命周期
+        创建的client使用工厂的registry判断共享backend，关闭单个client不会关闭其他client仍在使用的共享backend
+        close_all关闭所有缓存的client和由工厂创建的共享backend，之后再调用get_client会重新创建
+    Usage::
+    #    >>> factory = APIClientFactory()
+    #    >>> client = factory.get_client(Staff, http_backend="aiohttp", resource_endpoint="http://endpoint/api/v1")
+    #    >>> await factory.close_all()
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry or backend_registry
+        self._clients: Dict[Tuple, AsyncHTTPClient] = {}
+        self._backends: Dict[int, AsyncHTTPClientBackend] = {}
+
+    def __len__(self):
+        return len(self._clients)
+
+    def get_client(
+            self,
+            model: Type[ModelType],
+            app=None,
+            http_backend="",
+            resource_endpoint: str = "",
+            client_id: str = "",
+            client_secret: str = "",
+            config: Union[Dict, Any] = None,
+    ) -> AsyncHTTPClient:
+        """
+        返回缓存的AsyncHTTPClient，不存在时创建，@See api_client_builder
+        """
+        assert http_backend, "http_backend can not be empty"
+        assert resource_endpoint, "resource_endpoint can not be empty"
+        if isinstance(http_backend, str):
+            http_backend = self.registry.resolve(http_backend)
+        key = (model, app, resource_endpoint, http_backend, client_id, client_secret, get_config_key(config))
+        client = self._clients.get(key, None)
+        if client is not None:
+            return client
+
+        if isinstance(http_backend, type):
+            backend_class = http_backend
+            http_backend = self.registry.get_shared_instance(
+                backend_class, resource_endpoint, config, lambda: backend_class(config=config)
+            )
+            self._backends[id(http_backend)] = http_backend
+        client = self._clients[key] = AsyncHTTPClient(
+            model=model,
+            app=app,
+            http_backend=http_backend,
+            resource_endpoint=resource_endpoint,
+            client_id=client_id,
+            client_secret=client_secret,
+            config=config,
+            registry=self.registry,
+        )
+        return client
+
+    __call__ = get_client
+
+    async def close_all(self):
+        """
+        关闭所有缓存的client，以及工厂创建的共享backend
+        """
+        clients = list(self._clients.values())
+        backends = list(self._backends.values())
+        self._clients.clear()
+        self._backends.clear()
+        for client in clients:
+            await client.close()
+        for backend in backends:
+            await self.registry.release_shared_instance(backend)
+
+
+api_client_factory = APIClientFactory()
+
 APIClient = api_client_builder
@@ -1,6 +1,5 @@
 import asyncio
 import functools
-import json
 from typing import Dict, cast, Any, Union
 
 from fastapi.testclient import TestClient
@@ -31,6 +30,13 @@ class FastAPITestClientBackend(AsyncHTTPClientBackend):
         else:
             return asyncio.get_event_loop()
 
+    def create_auth_method(self, login: str, password: str) -> Any:
+        """
+        生成requests.auth.HTTPBasicAuth
+        @See AsyncHTTPClientBackend.create_auth_method(login, password)
+        """
+        return HTTPBasicAuth(login, password)
+
     async def send(self, url, data, header, auth, timeout):
         """
         @See AsyncHTTPClientBackend.send(url, header, auth, timeout)
@@ -41,12 +47,7 @@ class FastAPITestClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.head(url, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = HTTPBasicAuth(login, password)
-        else:
-            auth_method = auth
+        auth_method = self.get_auth_method(auth)
 
         future = self.get_event_loop().run_in_executor(
             None,
@@ -65,20 +66,14 @@ class FastAPITestClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.get(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = HTTPBasicAuth(login, password)
-        else:
-            auth_method = auth
+        auth_method = self.get_auth_method(auth)
 
         future = self.get_event_loop().run_in_executor(
             None,
             functools.partial(
                 self.get_test_client().get,
                 str(url),
-                data=json.dumps(
-                    data),
+                data=self.codec.encode(data),
                 headers=header,
                 auth=auth_method,
                 timeout=timeout
@@ -91,20 +86,14 @@ class FastAPITestClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.put(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = HTTPBasicAuth(login, password)
-        else:
-            auth_method = auth
+        auth_method = self.get_auth_method(auth)
 
         future = self.get_event_loop().run_in_executor(
             None,
             functools.partial(
                 self.get_test_client().put,
                 str(url),
-                data=json.dumps(
-                    data),
+                data=self.codec.encode(data),
                 headers=header,
                 auth=auth_method,
                 timeout=timeout
@@ -117,20 +106,14 @@ class FastAPITestClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.post(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = HTTPBasicAuth(login, password)
-        else:
-            auth_method = auth
+        auth_method = self.get_auth_method(auth)
 
         future = self.get_event_loop().run_in_executor(
             None,
             functools.partial(
                 self.get_test_client().post,
                 str(url),
-                data=json.dumps(
-                    data),
+                data=self.codec.encode(data),
                 headers=header,
                 auth=auth_method,
                 timeout=timeout
@@ -143,20 +126,14 @@ class FastAPITestClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.delete(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = HTTPBasicAuth(login, password)
-        else:
-            auth_method = auth
+        auth_method = self.get_auth_method(auth)
 
         future = self.get_event_loop().run_in_executor(
             None,
             functools.partial(
                 self.get_test_client().delete,
                 str(url),
-                data=json.dumps(
-                    data),
+                data=self.codec.encode(data),
                 headers=header,
                 auth=auth_method,
                 timeout=timeout
@@ -179,15 +156,17 @@ class FastAPITestClientBackend(AsyncHTTPClientBackend):
         # 没有返回content
         if not response.content:
             return ClientBackendResponse(
-                status_code=status, response={}
+                status_code=status, response={},
+                headers=self.get_response_headers(response.headers),
             )
         # 转换为字典格式
-        response_dict = cast(Dict[str, Any], response.json())
+        response_dict = cast(Dict[str, Any], self.codec.decode(response.content))
         # 解码过滤已收到的response
         self.filter_received_response(status, response_dict)
         # 返回组合后的ClientBackendResponse对象
         return ClientBackendResponse(
-            status_code=status, response=response_dict
+            status_code=status, response=response_dict,
+            headers=self.get_response_headers(response.headers),
         )
 
     def filter_received_response(self, status, response_dict):
@@ -1,6 +1,5 @@
 import asyncio
-import json
-from typing import Dict, cast, Any, Union
+from typing import Dict, List, Optional, cast, Any, Union
 
 import httpx
 from httpx import ConnectTimeout, HTTPError
@@ -8,13 +7,177 @@ from httpx import ConnectTimeout, HTTPError
 from omi_async_http_client._exceptions import HTTPException
 from omi_async_http_client._status_code import status_codes
 from omi_async_http_client.async_http_client import AsyncHTTPClientBackend
+from omi_async_http_client.async_http_client import AsyncHttpClientSession
 from omi_async_http_client.async_http_client import ClientBackendResponse
 
 
+class HttpxClientSession(AsyncHttpClientSession):
+    """
+    HttpxClientBackend使用的长连接Session，持有一个共享的httpx.AsyncClient，所有请求复用同一个连接池。
+    连接池与超时参数从backend的config中读取
+        HTTP_POOL_SIZE - int, 连接池的最大连接数，默认100
+        HTTP_MAX_KEEPALIVE_CONNECTIONS - int, 最大保持keep-alive的连接数，默认20
+        HTTP_KEEPALIVE_TIMEOUT - float, 空闲连接的keep-alive时间，单位：秒，默认5
+        HTTP_CONNECT_TIMEOUT - float, 建立连接的超时时间，单位：秒，未设置时使用请求的timeout
+        HTTP_READ_TIMEOUT - float, 读取响应的超时时间，单位：秒，未设置时使用请求的timeout
+        HTTP_WRITE_TIMEOUT - float, 发送请求的超时时间，单位：秒，未设置时使用请求的timeout
+        HTTP_POOL_TIMEOUT - float, 等待连接池可用连接的超时时间，单位：秒，未设置时使用请求的timeout
+        HTTP2_PRIOR_KNOWLEDGE - bool, 使用HTTP/2模式时，不经过TLS协商直接使用HTTP/2(h2c)，默认False
+    Memo::
+        httpx.AsyncClient的连接与创建时的event loop绑定，event loop变化时会自动重新创建
+    """
+
+    DEFAULT_POOL_SIZE = 100
+    DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+    DEFAULT_KEEPALIVE_TIMEOUT = 5
+    DEFAULT_TIMEOUT = 1 * 60
+
+    def __init__(self, backend):
+        super().__init__()
+        self._backend = backend
+        self._event_loop = None
+
+    def build_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self._backend.get_config_value("HTTP_POOL_SIZE", self.DEFAULT_POOL_SIZE),
+            max_keepalive_connections=self._backend.get_config_value("HTTP_MAX_KEEPALIVE_CONNECTIONS",
+                                                                     self.DEFAULT_MAX_KEEPALIVE_CONNECTIONS),
+            keepalive_expiry=self._backend.get_config_value("HTTP_KEEPALIVE_TIMEOUT",
+                                                            self.DEFAULT_KEEPALIVE_TIMEOUT),
+        )
+
+    def build_timeout(self, timeout=DEFAULT_TIMEOUT) -> httpx.Timeout:
+        """
+        使用config中的connect/read/write/pool超时设置构建httpx.Timeout，未设置的项使用timeout
+        """
+        return httpx.Timeout(
+            timeout,
+            connect=self._backend.get_config_value("HTTP_CONNECT_TIMEOUT", timeout),
+            read=self._backend.get_config_value("HTTP_READ_TIMEOUT", timeout),
+            write=self._backend.get_config_value("HTTP_WRITE_TIMEOUT", timeout),
+            pool=self._backend.get_config_value("HTTP_POOL_TIMEOUT", timeout),
+        )
+
+    async def create(self):
+        http2 = self._backend.http2
+        try:
+            self._client_or_session = httpx.AsyncClient(
+                http1=not (http2 and self._backend.get_config_value("HTTP2_PRIOR_KNOWLEDGE", False)),
+                http2=http2,
+                limits=self.build_limits(),
+                timeout=self.build_timeout(),
+            )
+        except ImportError as e:
+            # HTTP/2需要安装h2
+            raise ImportError("HTTP/2 support requires h2, install it with "
+                              "`pip install omi_async_http_client[http2]`") from e
+        self._event_loop = asyncio.get_event_loop()
+        return self._client_or_session
+
+    async def destroy(self):
+        client = self._client_or_session
+        self._client_or_session = None
+        self._event_loop = None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+    async def get_client(self) -> httpx.AsyncClient:
+        """
+        获取可用的httpx.AsyncClient，首次调用时创建，
+        如果client已关闭或event loop发生变化，则丢弃旧的client重新创建
+        """
+        client = self._client_or_session
+        if client is not None and not client.is_closed and self._event_loop is asyncio.get_event_loop():
+            return client
+        # 旧的连接绑定在原event loop上，无法在当前event loop中关闭，随原event loop一同释放
+        self._client_or_session = None
+        self._event_loop = None
+        return await self.create()
+
+    def get_connections(self) -> Optional[List]:
+        """
+        获取连接池中当前的连接列表，client尚未创建时返回空列表
+        Memo::
+            连接池不是httpx的公开接口，当前版本的httpx无法获取时返回None
+        """
+        client = self._client_or_session
+        if client is None or client.is_closed:
+            return []
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return None
+        return list(connections)
+
+
 class HttpxClientBackend(AsyncHTTPClientBackend):
-    def __init__(self, client=None, config=None, event_loop=None):
+    """
+    使用httpx实现的AsyncHTTPClientBackend
+    http2 - (Optional) bool, 是否启用HTTP/2多路复用模式，启用后并发请求会复用少量连接的多个stream，
+        需要安装h2(pip install httpx[http2])，不指定时使用config中的HTTP2设置，默认False
+    """
+
+    def __init__(self, client=None, config=None, event_loop=None, http2=None):
         super().__init__(client=client, config=config)
         self._event_loop = event_loop
+        self._http2 = http2
+        self._session = HttpxClientSession(self)
+        self._in_flight = 0
+        self._peak_in_flight = 0
+
+    @property
+    def http2(self) -> bool:
+        if self._http2 is not None:
+            return bool(self._http2)
+        return bool(self.get_config_value("HTTP2", False))
+
+    def get_connection_stats(self) -> Dict:
+        """
+        统计当前连接池的使用情况，返回Dict
+            http2 - bool, 是否启用了HTTP/2模式
+            connections - int, 连接池中的连接数
+            http2_connections - int, 其中协商为HTTP/2的连接数
+            in_flight - int, 正在执行的请求数
+            peak_in_flight - int, 执行中请求数的峰值
+            streams_per_connection - float, 平均每个连接上并发的请求(stream)数
+            connection_info - List[str], 各连接的状态描述
+        Memo::
+            当前版本的httpx无法获取连接池时，connections，http2_connections，streams_per_connection，
+            connection_info为None
+        """
+        connections = self._session.get_connections()
+        if connections is None:
+            return {
+                "http2": self.http2,
+                "connections": None,
+                "http2_connections": None,
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "streams_per_connection": None,
+                "connection_info": None,
+            }
+        connection_info = [
+            connection.info() if callable(getattr(connection, "info", None)) else repr(connection)
+            for connection in connections
+        ]
+        active = [info for info in connection_info if "CLOSED" not in info]
+        http2_connections = [info for info in active if "HTTP/2" in info]
+        if not active:
+            streams_per_connection = 0.0
+        elif http2_connections:
+            streams_per_connection = self._in_flight / len(active)
+        else:
+            # HTTP/1.1的连接同一时间只能处理一个请求，其余请求在连接池中排队
+            streams_per_connection = min(self._in_flight, len(active)) / len(active)
+        return {
+            "http2": self.http2,
+            "connections": len(active),
+            "http2_connections": len(http2_connections),
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "streams_per_connection": streams_per_connection,
+            "connection_info": connection_info,
+        }
 
     def get_event_loop(self):
         if self._event_loop is not None:
@@ -22,158 +185,131 @@ class HttpxClientBackend(AsyncHTTPClientBackend):
         else:
             return asyncio.get_event_loop()
 
-    async def send(self, url, data, header, auth, timeout):
-        """
-        @See AsyncHTTPClientBackend.send(url, header, auth, timeout)
-        """
-        raise NotImplementedError
-
-    async def head(self, url, header, auth, timeout):
+    async def close(self):
         """
-        @See AsyncHTTPClientBackend.head(url, header, auth, timeout)
+        关闭backend持有的httpx.AsyncClient及连接池
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = (login, password)
-        else:
-            auth_method = auth
+        await self._session.destroy()
 
+    async def request_http(
+            self,
+            method,
+            url,
+            content=None,
+            headers=None,
+            auth=None,
+            timeout=HttpxClientSession.DEFAULT_TIMEOUT,
+    ):
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.head(
-                    str(url),
-                    headers=header,
-                    auth=auth_method,
-                    timeout=timeout)
-
-            return self.prepare_response(response)
+            client = await self._session.get_client()
+            response = await client.request(
+                method,
+                str(url),
+                content=content,
+                # 条件请求的校验信息按client传入的auth识别身份，发送时才转换为backend原生的auth对象
+                headers=self.prepare_conditional_headers(method, url, headers, auth),
+                auth=self.get_auth_method(auth),
+                timeout=self._session.build_timeout(timeout),
+            )
+            return self.prepare_response(response, method, url, auth)
         except ConnectTimeout as err:
             # 服务器超时错误
             raise HTTPException(status_code=status_codes.REQUEST_TIMEOUT, detail=str(err))
         except HTTPError as err:
             # 其他类型错误统一使用503代码返回
             raise HTTPException(status_code=status_codes.SERVICE_UNAVAILABLE, detail=str(err))
+        finally:
+            self._in_flight -= 1
+
+    def create_auth_method(self, login: str, password: str) -> Any:
+        """
+        生成httpx.BasicAuth，Authorization头部只编码一次
+        @See AsyncHTTPClientBackend.create_auth_method(login, password)
+        """
+        return httpx.BasicAuth(login, password)
+
+    async def send(self, url, data, header, auth, timeout):
+        """
+        @See AsyncHTTPClientBackend.send(url, header, auth, timeout)
+        """
+        raise NotImplementedError
+
+    async def head(self, url, header, auth, timeout):
+        """
+        @See AsyncHTTPClientBackend.head(url, header, auth, timeout)
+        """
+        return await self.request_http(
+            method="head",
+            url=url,
+            content=None,
+            headers=header,
+            auth=auth,
+            timeout=timeout,
+        )
 
     async def get(self, url, data, header, auth, timeout) -> Union[ClientBackendResponse, Dict]:
         """
         @See AsyncHTTPClientBackend.get(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = (login, password)
-        else:
-            auth_method = auth
-
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    str(url),
-                    # data=json.dumps(
-                    #      data),
-                    headers=header,
-                    auth=auth_method,
-                    timeout=timeout
-                )
-            return self.prepare_response(response)
-        except ConnectTimeout as err:
-            # 服务器超时错误
-            raise HTTPException(status_code=status_codes.REQUEST_TIMEOUT, detail=str(err))
-        except HTTPError as err:
-            # 其他类型错误统一使用503代码返回
-            raise HTTPException(status_code=status_codes.SERVICE_UNAVAILABLE, detail=str(err))
+        return await self.request_http(
+            method="get",
+            url=url,
+            content=None,
+            headers=header,
+            auth=auth,
+            timeout=timeout,
+        )
 
     async def put(self, url, data, header, auth, timeout) -> Union[ClientBackendResponse, Dict]:
         """
         @See AsyncHTTPClientBackend.put(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = (login, password)
-        else:
-            auth_method = auth
-
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.put(
-                    str(url),
-                    data=json.dumps(
-                        data),
-                    headers=header,
-                    auth=auth_method,
-                    timeout=timeout
-                )
-            return self.prepare_response(response)
-        except ConnectTimeout as err:
-            # 服务器超时错误
-            raise HTTPException(status_code=status_codes.REQUEST_TIMEOUT, detail=str(err))
-        except HTTPError as err:
-            # 其他类型错误统一使用503代码返回
-            raise HTTPException(status_code=status_codes.SERVICE_UNAVAILABLE, detail=str(err))
+        return await self.request_http(
+            method="put",
+            url=url,
+            content=self.codec.encode(data),
+            headers=header,
+            auth=auth,
+            timeout=timeout,
+        )
 
     async def post(self, url, data, header, auth, timeout) -> Union[ClientBackendResponse, Dict]:
         """
         @See AsyncHTTPClientBackend.post(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = (login, password)
-        else:
-            auth_method = auth
-
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    str(url),
-                    data=json.dumps(
-                        data),
-                    headers=header,
-                    auth=auth_method,
-                    timeout=timeout
-                )
-            return self.prepare_response(response)
-        except ConnectTimeout as err:
-            # 服务器超时错误
-            raise HTTPException(status_code=status_codes.REQUEST_TIMEOUT, detail=str(err))
-        except HTTPError as err:
-            # 其他类型错误统一使用503代码返回
-            raise HTTPException(status_code=status_codes.SERVICE_UNAVAILABLE, detail=str(err))
+        return await self.request_http(
+            method="post",
+            url=url,
+            content=self.codec.encode(data),
+            headers=header,
+            auth=auth,
+            timeout=timeout,
+        )
 
     async def delete(self, url, data, header, auth, timeout) -> Union[ClientBackendResponse, Dict]:
         """
         @See AsyncHTTPClientBackend.delete(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = (login, password)
-        else:
-            auth_method = auth
-
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.delete(
-                    str(url),
-                    # data=json.dumps(
-                    #      data),
-                    headers=header,
-                    auth=auth_method,
-                    timeout=timeout
-                )
-            return self.prepare_response(response)
-        except ConnectTimeout as err:
-            # 服务器超时错误
-            raise HTTPException(status_code=status_codes.REQUEST_TIMEOUT, detail=str(err))
-        except HTTPError as err:
-            # 其他类型错误统一使用503代码返回
-            raise HTTPException(status_code=status_codes.SERVICE_UNAVAILABLE, detail=str(err))
+        return await self.request_http(
+            method="delete",
+            url=url,
+            content=None,
+            headers=header,
+            auth=auth,
+            timeout=timeout,
+        )
 
-    def prepare_response(self, response):
+    def prepare_response(self, response, method="get", url=None, auth=None):
         # 获得状态代码，不需要等到response收到
         status = response.status_code
+        # 条件请求命中，复用之前已解析的响应内容，不再解码响应
+        if status == status_codes.NOT_MODIFIED:
+            not_modified = self.get_not_modified_response(method, url, auth, response.headers)
+            if not_modified is not None:
+                return not_modified
+            self.filter_received_response(status, {})
         # 服务端50x错误
         if status_codes.is_server_error(status):
             raise HTTPException(status_code=status)
@@ -185,15 +321,19 @@ class HttpxClientBackend(AsyncHTTPClientBackend):
         # 没有返回content
         if not response.content:
             return ClientBackendResponse(
-                status_code=status, response={}
+                status_code=status, response={},
+                headers=self.get_response_headers(response.headers),
             )
         # 转换为字典格式
-        response_dict = cast(Dict[str, Any], response.json())
+        response_dict = cast(Dict[str, Any], self.codec.decode(response.content))
         # 解码过滤已收到的response
         self.filter_received_response(status, response_dict)
+        # 保存ETag/Last-Modified，用于之后的条件请求
+        self.store_validators(method, url, auth, status, response.headers, response_dict)
         # 返回组合后的ClientBackendResponse对象
         return ClientBackendResponse(
-            status_code=status, response=response_dict
+            status_code=status, response=response_dict,
+            headers=self.get_response_headers(response.headers),
         )
 
     def filter_received_response(self, status, response_dict):
@@ -234,6 +374,9 @@ class HttpxClientBackend(AsyncHTTPClientBackend):
         elif status == status_codes.UNPROCESSABLE_ENTITY:
             # HTTPValidationError
             raise HTTPException(status_code=status, detail=response_dict)
+        elif status == status_codes.NOT_MODIFIED:
+            # 没有可复用的已解析响应，无法处理304 Not Modified
+            raise HTTPException(status_code=status, detail=status_codes.get_reason_phrase(status))
         elif status in [status_codes.OK, status_codes.CREATED,
                         status_codes.ACCEPTED]:
             pass
@@ -17,33 +17,97 @@ limitations under the License.
 
 import asyncio
 import functools
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, cast, Any, Union, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectTimeout, HTTPError
 
 from ._exceptions import HTTPException
 from ._status_code import status_codes
-from .async_http_client import AsyncHTTPClientBackend, ClientBackendResponse
+from .async_http_client import AsyncHTTPClientBackend, AsyncHttpClientSession, ClientBackendResponse
 
 
-# class RequestsClientSession(AsyncHttpClientSession):
-#     def __init__(self):
-#         super().__init__()
-#         self._client_or_session = None
+class RequestsClientSession(AsyncHttpClientSession):
+    """
+    RequestsClientBackend使用的Session，持有一个专用的ThreadPoolExecutor，每个工作线程使用各自的requests.Session，
+    requests.Session的HTTPAdapter连接池大小与线程池大小一致，保证每个线程都可以复用连接。
+    线程池参数从backend的config中读取
+        HTTP_POOL_SIZE - int, 线程池的最大线程数，同时也是HTTPAdapter的连接池大小，默认10
+    Memo::
+        requests.Session不是线程安全的，因此使用thread-local方式为每个线程分别创建
+    """
 
-#     async def create(self):
-#         pass
+    DEFAULT_POOL_SIZE = 10
 
-#     async def destroy(self):
-#         pass
+    def __init__(self, backend):
+        super().__init__()
+        self._backend = backend
+        self._pool_size = self.DEFAULT_POOL_SIZE
+        self._local = threading.local()
+        self._http_sessions = []
+        self._lock = threading.Lock()
+
+    async def create(self):
+        self._pool_size = self._backend.get_config_value("HTTP_POOL_SIZE", self.DEFAULT_POOL_SIZE)
+        self._client_or_session = ThreadPoolExecutor(
+            max_workers=self._pool_size,
+            thread_name_prefix="RequestsClientBackend",
+        )
+        return self._client_or_session
+
+    async def destroy(self):
+        executor = self._client_or_session
+        self._client_or_session = None
+        if executor is not None:
+            # 等待执行中的请求结束，不阻塞当前event loop
+            await asyncio.get_event_loop().run_in_executor(
+                None, functools.partial(executor.shutdown, wait=True)
+            )
+        with self._lock:
+            http_sessions = self._http_sessions
+            self._http_sessions = []
+            self._local = threading.local()
+        for http_session in http_sessions:
+            http_session.close()
+
+    async def get_executor(self) -> ThreadPoolExecutor:
+        """
+        获取可用的ThreadPoolExecutor，首次调用时创建
+        """
+        if self._client_or_session is None:
+            await self.create()
+        return self._client_or_session
+
+    def get_http_session(self) -> requests.Session:
+        """
+        获取当前线程的requests.Session，首次调用时创建，在线程池的工作线程中调用
+        """
+        http_session = getattr(self._local, "http_session", None)
+        if http_session is None:
+            http_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self._pool_size, pool_maxsize=self._pool_size)
+            http_session.mount("http://", adapter)
+            http_session.mount("https://", adapter)
+            self._local.http_session = http_session
+            with self._lock:
+                self._http_sessions.append(http_session)
+        return http_session
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        """
+        使用当前线程的requests.Session发起请求，在线程池的工作线程中调用
+        """
+        return self.get_http_session().request(method=method, url=url, **kwargs)
 
 
 class RequestsClientBackend(AsyncHTTPClientBackend):
     def __init__(self, client=None, config=None, event_loop=None):
         super().__init__(client=client, config=config)
         self._event_loop = event_loop
+        self._session = RequestsClientSession(self)
 
     def get_event_loop(self):
         if self._event_loop is not None:
@@ -51,6 +115,12 @@ class RequestsClientBackend(AsyncHTTPClientBackend):
         else:
             return asyncio.get_event_loop()
 
+    async def close(self):
+        """
+        关闭backend专用的线程池及各线程持有的requests.Session
+        """
+        await self._session.destroy()
+
     async def request_http(
             self,
             method,
@@ -72,14 +142,15 @@ class RequestsClientBackend(AsyncHTTPClientBackend):
             # )
 
             future = self.get_event_loop().run_in_executor(
-                None,
+                await self._session.get_executor(),
                 functools.partial(
-                    requests.request,
+                    self._session.request,
                     method=method,
                     url=str(url),
-                    data=json.dumps(data),
-                    headers=headers,
-                    auth=auth,
+                    data=self.codec.encode(data),
+                    # 条件请求的校验信息按client传入的auth识别身份，发送时才转换为backend原生的auth对象
+                    headers=self.prepare_conditional_headers(method, url, headers, auth),
+                    auth=self.get_auth_method(auth),
                     timeout=timeout,
                 )
             )
@@ -87,6 +158,12 @@ class RequestsClientBackend(AsyncHTTPClientBackend):
 
             # 获得状态代码，不需要等到response收到
             status = response.status_code
+            # 条件请求命中，复用之前已解析的响应内容，不再解码响应
+            if status == status_codes.NOT_MODIFIED:
+                not_modified = self.get_not_modified_response(method, url, auth, response.headers)
+                if not_modified is not None:
+                    return not_modified
+                self.filter_received_response(status, {})
             # 服务端50x错误
             if status_codes.is_server_error(status):
                 raise HTTPException(status_code=status)
@@ -98,15 +175,19 @@ class RequestsClientBackend(AsyncHTTPClientBackend):
             # 没有返回content
             if not response.content:
                 return ClientBackendResponse(
-                    status_code=status, response={}
+                    status_code=status, response={},
+                    headers=self.get_response_headers(response.headers),
                 )
             # 转换为字典格式
-            response_dict = cast(Dict[str, Any], response.json())
+            response_dict = cast(Dict[str, Any], self.codec.decode(response.content))
             # 解码过滤已收到的response
             self.filter_received_response(status, response_dict)
+            # 保存ETag/Last-Modified，用于之后的条件请求
+            self.store_validators(method, url, auth, status, response.headers, response_dict)
             # 返回组合后的ClientBackendResponse对象
             return ClientBackendResponse(
-                status_code=status, response=response_dict
+                status_code=status, response=response_dict,
+                headers=self.get_response_headers(response.headers),
             )
         except ConnectTimeout as err:
             # 服务器超时错误
@@ -115,6 +196,13 @@ class RequestsClientBackend(AsyncHTTPClientBackend):
             # 其他类型错误统一使用503代码返回
             raise HTTPException(status_code=status_codes.SERVICE_UNAVAILABLE, detail=str(err))
 
+    def create_auth_method(self, login: str, password: str) -> Any:
+        """
+        生成requests可以直接使用的(username, password)元组
+        @See AsyncHTTPClientBackend.create_auth_method(login, password)
+        """
+        return (login, password)
+
     async def send(self, url, data, header, auth: Union[Tuple, Dict], timeout: int):
         """
         Will raise NotImplementedError
@@ -126,19 +214,12 @@ class RequestsClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.head(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = (login, password)
-        else:
-            auth_method = auth
-
         return await self.request_http(
             method="head",
             url=url,
             data=None,
             headers=header,
-            auth=auth_method,
+            auth=auth,
             timeout=timeout,
         )
 
@@ -147,19 +228,12 @@ class RequestsClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.get(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = (login, password)
-        else:
-            auth_method = auth
-
         return await self.request_http(
             method="get",
             url=url,
             data=None,
             headers=header,
-            auth=auth_method,
+            auth=auth,
             timeout=timeout,
         )
 
@@ -168,19 +242,12 @@ class RequestsClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.put(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = (login, password)
-        else:
-            auth_method = auth
-
         return await self.request_http(
             method="put",
             url=url,
             data=data,
             headers=header,
-            auth=auth_method,
+            auth=auth,
             timeout=timeout,
         )
 
@@ -189,19 +256,12 @@ class RequestsClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.post(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = login, password
-        else:
-            auth_method = auth
-
         return await self.request_http(
             method="post",
             url=url,
             data=data,
             headers=header,
-            auth=auth_method,
+            auth=auth,
             timeout=timeout
         )
 
@@ -210,19 +270,12 @@ class RequestsClientBackend(AsyncHTTPClientBackend):
         """
         @See AsyncHTTPClientBackend.delete(url, data, header, auth, timeout)
         """
-        if isinstance(auth, Dict):
-            login = auth.get("username", "")
-            password = auth.get("password", "")
-            auth_method = (login, password)
-        else:
-            auth_method = auth
-
         return await self.request_http(
             method="delete",
             url=url,
             data=data,
             headers=header,
-            auth=auth_method,
+            auth=auth,
             timeout=timeout,
         )
 
@@ -264,6 +317,9 @@ class RequestsClientBackend(AsyncHTTPClientBackend):
         elif status == status_codes.UNPROCESSABLE_ENTITY:
             # HTTPValidationError
             raise HTTPException(status_code=status, detail=response_dict)
+        elif status == status_codes.NOT_MODIFIED:
+            # 没有可复用的已解析响应，无法处理304 Not Modified
+            raise HTTPException(status_code=status, detail=status_codes.get_reason_phrase(status))
         elif status in [status_codes.OK, status_codes.CREATED, status_codes.ACCEPTED]:
             pass
         else:
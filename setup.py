@@ -22,5 +22,6 @@ setup(
     packages = find_packages(),
     include_package_data = True,
     platforms = "any",
-    install_requires = ["pydantic"]
+    install_requires = ["pydantic"],
+    extras_require = {"orjson": ["orjson"], "http2": ["httpx[http2]"]}
 )
\ No newline at end of file
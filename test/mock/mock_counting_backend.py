@@ -0,0 +1,43 @@
+from fastapi.testclient import TestClient
+
+from omi_async_http_client.async_http_client import APIClient
+from omi_async_http_client._exceptions import HTTPException
+from omi_async_http_client.fastapi_testclient_backend import FastAPITestClientBackend
+
+from mock_fastapi import app as mock_app
+
+
+class CountingBackend(FastAPITestClientBackend):
+    """
+    记录GET请求的FastAPITestClientBackend，用于检查缓存、合并请求等场景下实际发出的请求
+    get_count - int, GET请求的次数
+    urls - List[str], GET请求的url，包含rnd等query参数
+    fail - bool, 为True时GET请求抛出503 HTTPException，模拟服务端错误
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.get_count = 0
+        self.urls = []
+        self.fail = False
+
+    async def get(self, url, data, header, auth, timeout):
+        self.get_count += 1
+        self.urls.append(url)
+        if self.fail:
+            raise HTTPException(status_code=503)
+        return await super().get(url, data, header, auth, timeout)
+
+
+def build_counting_client(model, config=None, app=mock_app):
+    """
+    创建使用CountingBackend请求mock_fastapi的client
+    app - 关联生命周期的app，默认mock_fastapi的app
+    """
+    return APIClient(model=model,
+                     app=app,
+                     http_backend=CountingBackend(test_client=TestClient(mock_app)),
+                     client_id="client_id",
+                     client_secret="client_secret",
+                     resource_endpoint="/mock",
+                     config=config)
@@ -18,13 +18,17 @@ limitations under the License.
 import asyncio
 import os
 import sys
+from typing import Optional
 
 import pytest
 from aiohttp import BasicAuth
+from pydantic import BaseModel
 
 sys.path.append("../")
 
+from omi_async_http_client.async_http_client import APIClient
 from omi_async_http_client._exceptions import HTTPException
+from omi_async_http_client._model import RequestModel
 from omi_async_http_client.aiohttp_backend import AioHttpClientBackend
 
 # =======================================
@@ -42,6 +46,12 @@ backend = AioHttpClientBackend()
 backend_event_loop = AioHttpClientBackend(event_loop=asyncio.new_event_loop())
 
 
+@RequestModel(api_name="/resources/{id}", api_prefix="", api_suffix="")
+class ResourceID(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+
+
 @pytest.fixture(scope='function')
 def setup_function(request):
     def teardown_function():
@@ -199,5 +209,115 @@ async def test_delete_basic_auth(event_loop):
         assert httpex.status_code == 405
 
 
+@pytest.mark.asyncio
+async def test_pooled_session(event_loop):
+    pooled_backend = AioHttpClientBackend(config={
+        "HTTP_POOL_SIZE": 10,
+        "HTTP_POOL_SIZE_PER_HOST": 5,
+        "HTTP_KEEPALIVE_TIMEOUT": 30,
+    })
+    resp = await pooled_backend.get(
+        url=BASE_URL + "/mock/users/me",
+        data={},
+        header={},
+        auth=BasicAuth("client_id", "client_secret"),
+        timeout=60)
+    assert resp.status_code == 200
+    session = await pooled_backend._session.get_session()
+    assert session.connector.limit == 10
+    assert session.connector.limit_per_host == 5
+
+    # the same session is reused by later requests
+    resp = await pooled_backend.get(
+        url=BASE_URL + "/mock/users/me",
+        data={},
+        header={},
+        auth=BasicAuth("client_id", "client_secret"),
+        timeout=60)
+    assert resp.status_code == 200
+    assert await pooled_backend._session.get_session() is session
+
+    await pooled_backend.close()
+    assert session.closed
+
+
+def test_discard_session_of_other_event_loop():
+    discard_backend = AioHttpClientBackend()
+    old_loop = asyncio.new_event_loop()
+    new_loop = asyncio.new_event_loop()
+    try:
+        session = old_loop.run_until_complete(discard_backend._session.get_session())
+        connector = session.connector
+        # a new event loop gets a new session, the old one is closed in its own event loop
+        assert new_loop.run_until_complete(discard_backend._session.get_session()) is not session
+        old_loop.run_until_complete(asyncio.sleep(0.01))
+        assert session.closed
+        assert connector.closed
+
+        # the old event loop is gone, the session is closed in the current event loop
+        session = new_loop.run_until_complete(discard_backend._session.get_session())
+        connector = session.connector
+        new_loop.close()
+        assert old_loop.run_until_complete(discard_backend._session.get_session()) is not session
+        assert connector.closed
+        old_loop.run_until_complete(discard_backend.close())
+    finally:
+        new_loop.close()
+        old_loop.close()
+
+
+@pytest.mark.asyncio
+async def test_conditional_request(event_loop):
+    conditional_backend = AioHttpClientBackend(config={"HTTP_CONDITIONAL_REQUEST": True})
+    url = BASE_URL + "/mock/versioned_resources/1"
+    resp = await conditional_backend.get(url=url + "?rnd=aaaaaaaa", data={}, header={},
+                                         auth=BasicAuth("client_id", "client_secret"), timeout=60)
+    assert resp.status_code == 200
+    assert resp.response["name"] == "alpha"
+    assert len(conditional_backend.validator_store) == 1
+    headers = conditional_backend.prepare_conditional_headers("get", url + "?rnd=bbbbbbbb", {}, BasicAuth("client_id", "client_secret"))
+    assert headers["If-None-Match"].startswith('"')
+    assert "If-Modified-Since" in headers
+
+    # 304 Not Modified is turned into the previously parsed response
+    resp = await conditional_backend.get(url=url + "?rnd=bbbbbbbb", data={}, header={},
+                                         auth=BasicAuth("client_id", "client_secret"), timeout=60)
+    assert resp.status_code == 200
+    assert resp.response["name"] == "alpha"
+    assert conditional_backend.validator_store.revalidations == 1
+
+    # without stored validators, a 304 can not be handled
+    try:
+        await backend.get(url=url, data={}, header={"If-None-Match": headers["If-None-Match"]},
+                          auth=BasicAuth("client_id", "client_secret"), timeout=60)
+        assert False
+    except HTTPException as httpex:
+        assert httpex.status_code == 304
+    await conditional_backend.close()
+
+
+def test_auth_method():
+    auth = {"username": "client_id", "password": "client_secret"}
+    auth_method = backend.get_auth_method(auth)
+    assert isinstance(auth_method, BasicAuth)
+    assert auth_method.login == "client_id"
+    # the same credentials reuse the encoded BasicAuth
+    assert backend.get_auth_method(dict(auth)) is auth_method
+    assert backend.get_auth_method(auth_method) is auth_method
+    assert backend.get_auth_method({"username": "client_id", "password": "xxx"}) is not auth_method
+
+
+def test_client_without_credentials():
+    # the native auth is built on first use, a client without credentials can still be created
+    client = APIClient(model=ResourceID,
+                       http_backend=AioHttpClientBackend(),
+                       client_id=None,
+                       client_secret=None,
+                       resource_endpoint=BASE_URL + "/mock")
+    assert client.default_auth == {"username": None, "password": None}
+    with pytest.raises(ValueError):
+        client.default_auth_method
+
+
 if __name__ == '__main__':
     pytest.main([os.path.basename(__file__)])
@@ -0,0 +1,109 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import os
+import sys
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.append("../")
+
+from omi_async_http_client.async_http_client import APIClient
+from omi_async_http_client._model import ApiTemplate, RequestModel, get_api_template
+from omi_async_http_client.fastapi_testclient_backend import FastAPITestClientBackend
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="/tenants/{tenant}", api_suffix="detail")
+class TenantResource(BaseModel):
+    id: Optional[str]
+
+
+@RequestModel(api_name="resources", api_prefix="", api_suffix="")
+class Resource(BaseModel):
+    name: Optional[str]
+
+
+def build_client(model, resource_endpoint="http://localhost/api"):
+    return APIClient(model=model,
+                     app=None,
+                     http_backend=FastAPITestClientBackend(test_client=None),
+                     client_id="client_id",
+                     client_secret="client_secret",
+                     resource_endpoint=resource_endpoint)
+
+
+def test_compile():
+    template = TenantResource._api_template
+    assert isinstance(template, ApiTemplate)
+    assert template.placeholders == frozenset({"tenant", "id"})
+    assert template.render({"tenant": "t1", "id": 1}) == "/tenants/t1/resources/1/detail"
+    assert template.render({"tenant": "t1", "id": 1}, endpoint_with_slash=True) == "tenants/t1/resources/1/detail"
+    assert Resource._api_template.render({}) == "/resources"
+    with pytest.raises(KeyError):
+        template.render({"id": 1})
+
+
+def test_invalid_template():
+    with pytest.raises(AssertionError):
+        ApiTemplate("")
+    # the trailing '/' is checked after the placeholders are replaced, as before
+    with pytest.raises(AssertionError):
+        ApiTemplate("/resources/").render({})
+    with pytest.raises(AssertionError):
+        ApiTemplate("/resources/{id}").render({"id": "1/"})
+
+
+def test_format_placeholders():
+    # placeholders other than {name} are formatted with str.format, as before
+    template = ApiTemplate("/resources/{id:0>4}", "{version!s}")
+    assert template.placeholders == frozenset()
+    assert template.render({"id": 7, "version": "v1"}) == "/v1/resources/0007"
+    assert ApiTemplate("/resources/{{id}}").render({}) == "/resources/{id}"
+    with pytest.raises(KeyError):
+        template.render({"id": 7})
+
+    # the '/' of a prefix is checked after the placeholders are replaced
+    template = ApiTemplate("/resources", "{prefix}")
+    assert template.render({"prefix": "/v1"}) == "/v1/resources"
+    assert template.render({"prefix": "v1"}) == "/v1/resources"
+    assert template.render({"prefix": "/v1"}, endpoint_with_slash=True) == "v1/resources"
+
+
+def test_get_url():
+    client = build_client(TenantResource)
+    url = client.get_url(opt_id={"id": "1"}, extra_params={"tenant": "t1", "name": "a b"})
+    # params consumed by placeholders are still sent in the query, as before
+    assert url == "http://localhost/api/tenants/t1/resources/1/detail?client_id=client_id&id=1&tenant=t1&name=a+b"
+    url = build_client(TenantResource, "http://localhost/api/").get_url(opt_id={"id": "1", "tenant": "t1"})
+    assert url == "http://localhost/api/tenants/t1/resources/1/detail?client_id=client_id&id=1&tenant=t1"
+    assert build_client(Resource).get_url(opt_id={"id": "1"}) == "http://localhost/api/resources?client_id=client_id&id=1"
+
+
+def test_recompile_on_change():
+    class Renamed(Resource):
+        pass
+
+    assert get_api_template(Renamed) is Resource._api_template
+    Renamed._api_name = "/renamed"
+    assert get_api_template(Renamed).render({}) == "/renamed"
+    assert get_api_template(Resource).render({}) == "/resources"
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])
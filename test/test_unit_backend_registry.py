@@ -0,0 +1,173 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+import os
+import sys
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.append("../")
+
+from omi_async_http_client.async_http_client import APIClient, AsyncHTTPClient
+from omi_async_http_client._model import RequestModel
+from omi_async_http_client._registry import BackendRegistry, backend_registry
+from omi_async_http_client.aiohttp_backend import AioHttpClientBackend
+from omi_async_http_client.requests_backend import RequestsClientBackend
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="", api_suffix="")
+class ResourceID(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+
+
+class CustomClientBackend(RequestsClientBackend):
+    pass
+
+
+class FakeEntryPoint:
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return self.value
+
+
+class FakeEntryPoints(list):
+    def select(self, group):
+        return self if group == "omi_async_http_client.backends" else []
+
+
+def build_client(http_backend="aiohttp", endpoint="http://localhost:8003/mock", **config):
+    return APIClient(model=ResourceID,
+                     http_backend=http_backend,
+                     client_id="client_id",
+                     client_secret="client_secret",
+                     resource_endpoint=endpoint,
+                     config=config)
+
+
+def test_resolve_builtin_and_path():
+    registry = BackendRegistry()
+    assert registry.resolve("aiohttp") is AioHttpClientBackend
+    assert registry.resolve("AioHttpClientBackend") is AioHttpClientBackend
+    assert registry.resolve("omi_async_http_client.aiohttp_backend.AioHttpClientBackend") is AioHttpClientBackend
+    # resolved classes are cached
+    assert "aiohttp" in registry._classes
+    with pytest.raises(ValueError):
+        registry.resolve("SomeHttpClientBackend")
+    with pytest.raises(ValueError):
+        registry.resolve("omi_async_http_client.aiohttp_backend.NoSuchBackend")
+
+
+def test_register():
+    registry = BackendRegistry()
+    registry.register("custom", CustomClientBackend)
+    assert registry.resolve("Custom") is CustomClientBackend
+    registry.register("custom", "omi_async_http_client.requests_backend.RequestsClientBackend")
+    assert registry.resolve("custom") is RequestsClientBackend
+
+
+def test_entry_points(monkeypatch):
+    entry_point = FakeEntryPoint("thirdparty", CustomClientBackend)
+    monkeypatch.setattr("importlib.metadata.entry_points", lambda: FakeEntryPoints([entry_point]))
+    registry = BackendRegistry()
+    assert registry.resolve("thirdparty") is CustomClientBackend
+    assert registry.resolve("thirdparty") is CustomClientBackend
+    assert entry_point.loads == 1
+
+
+def test_client_uses_registry():
+    client = build_client("requests")
+    assert isinstance(client.http_backend, RequestsClientBackend)
+    client = build_client(CustomClientBackend)
+    assert isinstance(client.http_backend, CustomClientBackend)
+    assert client.http_backend.client_ref is client
+    with pytest.raises(ValueError):
+        build_client(BaseModel)
+
+
+@pytest.mark.asyncio
+async def test_shared_instance(event_loop):
+    first = build_client(HTTP_BACKEND_SHARED=True, HTTP_POOL_SIZE=10)
+    second = build_client(HTTP_BACKEND_SHARED=True, HTTP_POOL_SIZE=10)
+    other_config = build_client(HTTP_BACKEND_SHARED=True, HTTP_POOL_SIZE=20)
+    other_endpoint = build_client(endpoint="http://localhost:8003/other", HTTP_BACKEND_SHARED=True, HTTP_POOL_SIZE=10)
+    not_shared = build_client(HTTP_POOL_SIZE=10)
+    assert first.http_backend is second.http_backend
+    assert first.http_backend is not other_config.http_backend
+    assert first.http_backend is not other_endpoint.http_backend
+    assert first.http_backend is not not_shared.http_backend
+
+    obj = await first.retrieve(opt_id={"id": "1"}, extra_params={"id": "1"})
+    assert obj.name == "alpha"
+    # closing a client keeps the shared backend open for the others
+    await first.close()
+    obj = await second.retrieve(opt_id={"id": "1"}, extra_params={"id": "1"})
+    assert obj.name == "alpha"
+
+    await backend_registry.close_shared_instances()
+    assert not backend_registry.is_shared_instance(second.http_backend)
+    await not_shared.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_instance_keeps_config(event_loop):
+    registry = BackendRegistry()
+    config = {"HTTP_BACKEND_SHARED": True, "HTTP_POOL_SIZE": 10}
+
+    def build(config):
+        return AsyncHTTPClient(model=ResourceID,
+                               app=None,
+                               http_backend="aiohttp",
+                               client_id="client_id",
+                               client_secret="client_secret",
+                               resource_endpoint="http://localhost:8003/mock",
+                               config=config,
+                               registry=registry)
+
+    first = build(config)
+    backend = first.http_backend
+    assert registry.is_shared_instance(backend)
+    assert not backend_registry.is_shared_instance(backend)
+
+    # reusing the shared instance keeps the config and client it was created with
+    second = build(dict(config))
+    reused = AsyncHTTPClient(model=ResourceID, app=None, http_backend=backend, client_id="client_id",
+                             client_secret="client_secret", resource_endpoint="http://localhost:8003/mock",
+                             config=dict(config), registry=registry)
+    assert second.http_backend is backend and reused.http_backend is backend
+    assert backend.client_ref is first
+    with pytest.raises(ValueError):
+        AsyncHTTPClient(model=ResourceID, app=None, http_backend=backend, client_id="client_id",
+                        client_secret="client_secret", resource_endpoint="http://localhost:8003/mock",
+                        config={**config, "HTTP_POOL_SIZE": 20}, registry=registry)
+    assert backend.get_config_value("HTTP_POOL_SIZE") == 10
+
+    # the client checks the registry that created the backend before closing it
+    await first.close()
+    obj = await second.retrieve(opt_id={"id": "1"}, extra_params={"id": "1"})
+    assert obj.name == "alpha"
+    await registry.close_shared_instances()
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])
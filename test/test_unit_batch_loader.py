@@ -0,0 +1,177 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import asyncio
+import os
+import sys
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.append("../")
+
+from omi_async_http_client.async_http_client import APIClient
+from omi_async_http_client._model import RequestModel, get_collection_model
+from omi_async_http_client._exceptions import HTTPException
+
+from mock_fastapi import app
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="", api_suffix="")
+class ResourceID(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+    description: Optional[str]
+
+
+def build_client(config=None):
+    return APIClient(model=ResourceID,
+                     app=app,
+                     http_backend="fastapi_test_client",
+                     client_id="client_id",
+                     client_secret="client_secret",
+                     resource_endpoint="/mock",
+                     config={"BATCH_RETRIEVE": True, **(config or {})})
+
+
+def test_collection_model():
+    model = get_collection_model(ResourceID)
+    assert model._api_name == "/resources"
+    # the collection model and its compiled template are reused
+    assert get_collection_model(ResourceID) is model
+    assert build_client().batch_loader.batch_model is model
+    client = build_client()
+    url = client.get_url(extra_params={"id": "1,2"}, model=model)
+    assert url.startswith("/mock/resources?")
+
+
+@pytest.mark.asyncio
+async def test_batch_retrieve(event_loop):
+    client = build_client()
+    results = await asyncio.gather(
+        client.retrieve(opt_id={"id": "1"}),
+        client.retrieve(opt_id={"id": "2"}),
+        client.retrieve(opt_id={"id": "3"}),
+        client.retrieve(opt_id={"id": "3"}),
+        client.retrieve(opt_id={"id": "8"}),
+        return_exceptions=True,
+    )
+    assert client.batch_loader.batches == 1
+    assert getattr(results[0], "name") == "alpha"
+    assert getattr(results[1], "name") == "bravo"
+    assert getattr(results[2], "name") == "charlie"
+    # callers of the same id share one request but get their own objects
+    assert results[2] == results[3] and results[2] is not results[3]
+    results[2].name = "changed"
+    assert getattr(results[3], "name") == "charlie"
+    # missing id is returned as a 404 to its own caller
+    assert isinstance(results[4], HTTPException)
+    assert results[4].status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_batch_max_size(event_loop):
+    client = build_client({"BATCH_MAX_SIZE": 2, "BATCH_WINDOW": 0.01})
+    results = await client.batch_loader.load_many(["1", "2", "3", "4", "5"])
+    assert [getattr(result, "id") for result in results] == ["1", "2", "3", "4", "5"]
+    assert client.batch_loader.batches == 3
+
+
+@pytest.mark.asyncio
+async def test_retrieve_with_params_is_not_batched(event_loop):
+    client = build_client()
+    resp = await client.retrieve(opt_id={"id": "1"}, extra_params={"foo": "bar"})
+    assert getattr(resp, "name") == "alpha"
+    assert client.batch_loader.batches == 0
+
+
+@pytest.mark.asyncio
+async def test_plain_id_with_timeout_is_batched(event_loop):
+    client = build_client()
+    timeouts = []
+    get_response_dict = client.get_response_dict
+
+    async def recording_get_response_dict(url, header, auth, timeout):
+        timeouts.append(timeout)
+        return await get_response_dict(url, header, auth, timeout)
+
+    client.get_response_dict = recording_get_response_dict
+    alpha, bravo = await asyncio.gather(
+        client.retrieve(opt_id={"id": "1"}, timeout=5),
+        client.retrieve(opt_id={"id": "2"}, timeout=7),
+    )
+    assert getattr(alpha, "name") == "alpha" and getattr(bravo, "name") == "bravo"
+    assert client.batch_loader.batches == 1
+    # the batch uses the longest timeout of its callers
+    assert timeouts == [7]
+
+
+@pytest.mark.asyncio
+async def test_batch_tasks_are_kept(event_loop):
+    client = build_client({"BATCH_WINDOW": 60})
+    loader = client.batch_loader
+    pending = asyncio.ensure_future(asyncio.gather(loader.load("1"), loader.load("2")))
+    await asyncio.sleep(0)
+    loader.dispatch()
+    # the running batch is referenced by the loader until it finishes
+    assert len(loader._tasks) == 1
+    alpha, bravo = await pending
+    assert getattr(alpha, "name") == "alpha" and getattr(bravo, "name") == "bravo"
+    assert not loader._tasks
+
+    # shutdown dispatches the collected ids and waits for the batch
+    pending = asyncio.ensure_future(loader.load("3"))
+    await asyncio.sleep(0)
+    await client.shutdown()
+    assert pending.done() and getattr(pending.result(), "name") == "charlie"
+    assert not loader._tasks
+
+
+@pytest.mark.asyncio
+async def test_batch_uses_response_cache(event_loop):
+    client = build_client({"RESPONSE_CACHE": True})
+    for _ in range(3):
+        resp = await client.retrieve(opt_id={"id": "1"})
+        assert getattr(resp, "name") == "alpha"
+    assert client.batch_loader.batches == 1
+    assert client.response_cache.hits == 2
+    assert client.response_cache.misses == 1
+
+    # cache=False and max_age are honoured on the batched path as well
+    await client.retrieve(opt_id={"id": "1"}, cache=False)
+    await client.retrieve(opt_id={"id": "1"}, max_age=0)
+    assert client.batch_loader.batches == 3
+    # an entry rejected by max_age is counted as a miss, not a hit
+    assert client.response_cache.hits == 2
+    assert client.response_cache.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_uses_negative_cache(event_loop):
+    client = build_client({"NEGATIVE_CACHE_TTL": 60})
+    for _ in range(2):
+        try:
+            await client.retrieve(opt_id={"id": "404"})
+            assert False, "HTTPException should be raised"
+        except HTTPException as httpex:
+            assert httpex.status_code == 404
+    assert client.batch_loader.batches == 1
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])
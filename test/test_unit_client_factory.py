@@ -0,0 +1,121 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+import os
+import sys
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.append("../")
+
+from omi_async_http_client.async_http_client import APIClient, APIClientFactory, api_client_factory
+from omi_async_http_client._model import RequestModel
+from omi_async_http_client._registry import BackendRegistry, backend_registry
+from omi_async_http_client.aiohttp_backend import AioHttpClientBackend
+
+BASE_URL = "http://localhost:8003/mock"
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="", api_suffix="")
+class ResourceID(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+
+
+@RequestModel(api_name="/resources", api_prefix="", api_suffix="")
+class Resource(BaseModel):
+    name: Optional[str]
+    description: Optional[str]
+
+
+def build_client(factory, model=ResourceID, http_backend="aiohttp", client_id="client_id", **config):
+    return factory.get_client(model=model,
+                              http_backend=http_backend,
+                              resource_endpoint=BASE_URL,
+                              client_id=client_id,
+                              client_secret="client_secret",
+                              config=config)
+
+
+@pytest.mark.asyncio
+async def test_factory_reuses_clients(event_loop):
+    factory = APIClientFactory()
+    client = build_client(factory, HTTP_POOL_SIZE=10)
+    # aliases and classes resolve to the same key
+    assert build_client(factory, HTTP_POOL_SIZE=10) is client
+    assert build_client(factory, http_backend=AioHttpClientBackend, HTTP_POOL_SIZE=10) is client
+    assert build_client(factory, HTTP_POOL_SIZE=20) is not client
+    assert build_client(factory, client_id="other", HTTP_POOL_SIZE=10) is not client
+
+    # different models targeting the same endpoint share one backend
+    collection_client = build_client(factory, model=Resource, HTTP_POOL_SIZE=10)
+    assert collection_client is not client
+    assert collection_client.http_backend is client.http_backend
+    assert len(factory) == 4
+
+    obj = await client.retrieve(opt_id={"id": "1"}, extra_params={"id": "1"})
+    assert obj.name == "alpha"
+    # closing one client keeps the shared backend usable
+    await collection_client.close()
+    obj = await client.retrieve(opt_id={"id": "2"}, extra_params={"id": "2"})
+    assert obj.name == "bravo"
+
+    backend = client.http_backend
+    await factory.close_all()
+    assert len(factory) == 0
+    assert not backend_registry.is_shared_instance(backend)
+    assert build_client(factory, HTTP_POOL_SIZE=10) is not client
+    await factory.close_all()
+
+
+@pytest.mark.asyncio
+async def test_factory_registry(event_loop):
+    registry = BackendRegistry()
+    factory = APIClientFactory(registry=registry)
+    client = build_client(factory)
+    collection_client = build_client(factory, model=Resource)
+    backend = client.http_backend
+    assert collection_client.http_backend is backend
+    assert client.backend_registry is registry
+    assert registry.is_shared_instance(backend)
+    assert not backend_registry.is_shared_instance(backend)
+
+    # closing one factory client keeps the backend shared through the factory registry open
+    session = await backend._session.get_session()
+    await collection_client.close()
+    assert not session.closed
+    obj = await client.retrieve(opt_id={"id": "1"}, extra_params={"id": "1"})
+    assert obj.name == "alpha"
+
+    await factory.close_all()
+    assert not registry.is_shared_instance(backend)
+
+
+@pytest.mark.asyncio
+async def test_api_client_cached(event_loop):
+    client = APIClient(model=ResourceID, http_backend="aiohttp", resource_endpoint=BASE_URL,
+                       client_id="client_id", client_secret="client_secret", cached=True)
+    assert APIClient(model=ResourceID, http_backend="aiohttp", resource_endpoint=BASE_URL,
+                     client_id="client_id", client_secret="client_secret", cached=True) is client
+    assert APIClient(model=ResourceID, http_backend="aiohttp", resource_endpoint=BASE_URL,
+                     client_id="client_id", client_secret="client_secret") is not client
+    await api_client_factory.close_all()
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])
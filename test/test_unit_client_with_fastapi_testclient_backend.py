@@ -15,6 +15,7 @@ limitations under the License.
 
 """
 
+import asyncio
 import os
 import sys
 from typing import Optional
@@ -405,5 +406,77 @@ async def test_get_no_auth(event_loop):
         assert httpex.status_code == 404
 
 
+@pytest.mark.asyncio
+async def test_bulk_retrieve(event_loop):
+    opt_ids = [{"id": str(i)} for i in range(1, 9)]
+    results = [item async for item in httpclientid.bulk_retrieve(
+        opt_ids, concurrency=3, return_exceptions=True)]
+    # results keep the input order
+    assert [opt_id for opt_id, _ in results] == opt_ids
+    assert getattr(results[0][1], "name") == "alpha"
+    assert getattr(results[4][1], "name") == "echo"
+    for _, obj in results[5:]:
+        assert isinstance(obj, HTTPException)
+        assert obj.status_code == 404
+
+    results = [item async for item in httpclientid.bulk_retrieve(
+        opt_ids, concurrency=3, return_exceptions=True, ordered=False)]
+    assert sorted(opt_id["id"] for opt_id, _ in results) == [opt_id["id"] for opt_id in opt_ids]
+
+    try:
+        results = [item async for item in httpclientid.bulk_retrieve(opt_ids, concurrency=3)]
+        assert False, "HTTPException should be raised"
+    except HTTPException as httpex:
+        assert httpex.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_bulk_retrieve_ordered_window(event_loop):
+    started = []
+    started_before_first = []
+
+    async def retrieve(opt_id, **kwargs):
+        started.append(opt_id["id"])
+        if opt_id["id"] == "1":
+            await asyncio.sleep(0.05)
+            started_before_first.append(len(started))
+        return opt_id["id"]
+
+    opt_ids = [{"id": str(i)} for i in range(1, 9)]
+    httpclientid.retrieve = retrieve
+    try:
+        results = [item async for item in httpclientid.bulk_retrieve(opt_ids, concurrency=3)]
+    finally:
+        del httpclientid.retrieve
+    assert [obj for _, obj in results] == [opt_id["id"] for opt_id in opt_ids]
+    # results buffered behind the slow first request count towards the concurrency window
+    assert started_before_first == [3]
+
+
+def test_default_headers_and_auth():
+    # without extras, every call shares the read-only mappings built once
+    assert httpclient.get_headers() is httpclient.get_headers()
+    assert httpclient.get_auth({}) is httpclient.default_auth
+    assert httpclient.get_headers()["X_ClientId"] == "client_id"
+    try:
+        httpclient.get_headers()["X_ClientId"] = "other"
+        assert False, "TypeError should be raised"
+    except TypeError:
+        pass
+
+    headers = httpclient.get_headers({"X_Trace": "abc", "X_Skip": None})
+    assert headers["X_Trace"] == "abc"
+    assert "X_Skip" not in headers
+    assert "X_Trace" not in httpclient.default_headers
+    auth = httpclient.get_auth({"password": "another"})
+    assert auth == {"username": "client_id", "password": "another"}
+    assert httpclient.default_auth["password"] == "client_secret"
+
+    # the backend native auth object is built once and reused
+    assert isinstance(httpclient.default_auth_method, HTTPBasicAuth)
+    assert httpclient.http_backend.get_auth_method(httpclient.get_auth()) is httpclient.default_auth_method
+    assert httpclient.http_backend.get_auth_method(auth) is not httpclient.default_auth_method
+
+
 if __name__ == '__main__':
     pytest.main([os.path.basename(__file__)])
@@ -0,0 +1,120 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+import os
+import sys
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+sys.path.append("../")
+
+from omi_async_http_client import _codec
+from omi_async_http_client._codec import JSONCodec, OrjsonCodec, StdlibJSONCodec, get_codec
+from omi_async_http_client._model import RequestModel
+from omi_async_http_client.aiohttp_backend import AioHttpClientBackend
+from omi_async_http_client.async_http_client import APIClient
+from omi_async_http_client.fastapi_testclient_backend import FastAPITestClientBackend
+
+from mock_fastapi import app
+
+CODECS = [StdlibJSONCodec()] + ([OrjsonCodec()] if _codec.load_orjson() is not None else [])
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="", api_suffix="")
+class ResourceID(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+    description: Optional[str]
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda codec: codec.name)
+def test_round_trip(codec):
+    value = {"name": "名称", "items": [1, 2.5, True, None], "nested": {"id": "1"}}
+    encoded = codec.encode(value)
+    assert isinstance(encoded, bytes)
+    assert codec.decode(encoded) == value
+    assert codec.decode(encoded.decode("utf-8")) == value
+    assert codec.decode(b"") is None
+    # pydantic models are encoded as their dict
+    assert codec.decode(codec.encode(ResourceID(id="1", name="alpha"))) == \
+        {"id": "1", "name": "alpha", "description": None}
+    with pytest.raises(TypeError):
+        codec.encode({"value": object()})
+    with pytest.raises(ValueError):
+        codec.decode(b"<html></html>")
+
+
+PARITY_BODIES = [
+    {1: "a", 2.5: "b", True: "c", None: "d"},
+    {"nested": {1: [1, 2]}, "name": "名称"},
+    [1, "a", None, 1.5, False],
+    {"empty": {}, "list": []},
+]
+
+
+@pytest.mark.skipif(_codec.load_orjson() is None, reason="orjson is not installed")
+@pytest.mark.parametrize("body", PARITY_BODIES)
+def test_codec_parity(body):
+    # the same bodies are accepted and decode to the same value whichever codec is in use
+    stdlib, fast = StdlibJSONCodec(), OrjsonCodec()
+    assert fast.decode(fast.encode(body)) == stdlib.decode(stdlib.encode(body))
+    assert stdlib.decode(fast.encode(body)) == fast.decode(stdlib.encode(body))
+
+
+def test_get_codec(monkeypatch):
+    codec = StdlibJSONCodec()
+    assert get_codec(codec) is codec
+    assert isinstance(get_codec("json"), StdlibJSONCodec)
+    assert isinstance(get_codec(None), JSONCodec)
+    with pytest.raises(ValueError):
+        get_codec("yaml")
+
+    # fall back to the standard library without orjson
+    monkeypatch.setattr(_codec, "load_orjson", lambda: None)
+    assert isinstance(get_codec(None), StdlibJSONCodec)
+    assert isinstance(get_codec("auto"), StdlibJSONCodec)
+    with pytest.raises(ValueError):
+        get_codec("orjson")
+
+
+def test_backend_codec_config():
+    assert isinstance(AioHttpClientBackend(config={"JSON_CODEC": "json"}).codec, StdlibJSONCodec)
+    codec = StdlibJSONCodec()
+    backend = AioHttpClientBackend(config={"JSON_CODEC": codec})
+    assert backend.codec is codec
+    backend.setup_config({"JSON_CODEC": "json"})
+    assert backend.codec is not codec
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("codec", CODECS, ids=lambda codec: codec.name)
+async def test_client_codec(event_loop, codec):
+    client = APIClient(model=ResourceID,
+                       http_backend=FastAPITestClientBackend(test_client=TestClient(app)),
+                       client_id="client_id",
+                       client_secret="client_secret",
+                       resource_endpoint="/mock",
+                       config={"JSON_CODEC": codec})
+    assert client.http_backend.codec is codec
+    obj = await client.retrieve(opt_id={"id": "1"}, extra_params={"id": "1"})
+    assert obj.name == "alpha"
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])
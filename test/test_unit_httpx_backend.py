@@ -198,5 +198,131 @@ async def test_delete_basic_auth(event_loop):
         assert httpex.status_code == 405
 
 
+@pytest.mark.asyncio
+async def test_shared_client(event_loop):
+    pooled_backend = HttpxClientBackend(config={
+        "HTTP_POOL_SIZE": 10,
+        "HTTP_MAX_KEEPALIVE_CONNECTIONS": 5,
+        "HTTP_CONNECT_TIMEOUT": 3,
+    })
+    resp = await pooled_backend.get(
+        url=BASE_URL + "/mock/users/me",
+        data={},
+        header={},
+        auth=("client_id", "client_secret"),
+        timeout=60)
+    assert resp.status_code == 200
+    client = await pooled_backend._session.get_client()
+
+    # the same client is reused by later requests
+    resp = await pooled_backend.get(
+        url=BASE_URL + "/mock/users/me",
+        data={},
+        header={},
+        auth=("client_id", "client_secret"),
+        timeout=60)
+    assert resp.status_code == 200
+    assert await pooled_backend._session.get_client() is client
+
+    timeout = pooled_backend._session.build_timeout(60)
+    assert timeout.connect == 3
+    assert timeout.read == 60
+
+    await pooled_backend.close()
+    assert client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_http2_mode(event_loop):
+    assert backend.http2 is False
+    assert HttpxClientBackend(http2=True).http2 is True
+    assert HttpxClientBackend(config={"HTTP2": True}).http2 is True
+
+    http2_backend = HttpxClientBackend(http2=True)
+    stats = http2_backend.get_connection_stats()
+    assert stats["http2"] is True
+    assert stats["connections"] == 0
+    assert stats["in_flight"] == 0
+
+    resp = await http2_backend.get(
+        url=BASE_URL + "/mock/users/me",
+        data={},
+        header={},
+        auth=("client_id", "client_secret"),
+        timeout=60)
+    assert resp.status_code == 200
+    stats = http2_backend.get_connection_stats()
+    assert stats["connections"] == 1
+    assert stats["peak_in_flight"] == 1
+
+    # the pool is private to httpx, stats degrade to None when it cannot be inspected
+    client = await http2_backend._session.get_client()
+    transport = client._transport
+    client._transport = object()
+    try:
+        stats = http2_backend.get_connection_stats()
+    finally:
+        client._transport = transport
+    assert stats["connections"] is None
+    assert stats["connection_info"] is None
+    assert stats["peak_in_flight"] == 1
+    await http2_backend.close()
+
+
+@pytest.mark.asyncio
+async def test_conditional_request(event_loop):
+    conditional_backend = HttpxClientBackend(config={"HTTP_CONDITIONAL_REQUEST": True})
+    url = BASE_URL + "/mock/versioned_resources/1"
+    resp = await conditional_backend.get(url=url + "?rnd=aaaaaaaa", data={}, header={},
+                                         auth=("client_id", "client_secret"), timeout=60)
+    assert resp.status_code == 200
+    assert resp.response["name"] == "alpha"
+    assert len(conditional_backend.validator_store) == 1
+    headers = conditional_backend.prepare_conditional_headers("get", url + "?rnd=bbbbbbbb", {}, ("client_id", "client_secret"))
+    assert headers["If-None-Match"].startswith('"')
+    assert "If-Modified-Since" in headers
+
+    # 304 Not Modified is turned into the previously parsed response
+    resp = await conditional_backend.get(url=url + "?rnd=bbbbbbbb", data={}, header={},
+                                         auth=("client_id", "client_secret"), timeout=60)
+    assert resp.status_code == 200
+    assert resp.response["name"] == "alpha"
+    assert conditional_backend.validator_store.revalidations == 1
+
+    # without stored validators, a 304 can not be handled
+    try:
+        await backend.get(url=url, data={}, header={"If-None-Match": headers["If-None-Match"]},
+                          auth=("client_id", "client_secret"), timeout=60)
+        assert False
+    except HTTPException as httpex:
+        assert httpex.status_code == 304
+    await conditional_backend.close()
+
+
+@pytest.mark.asyncio
+async def test_conditional_request_identities(event_loop):
+    conditional_backend = HttpxClientBackend(config={"HTTP_CONDITIONAL_REQUEST": True})
+    url = BASE_URL + "/mock/versioned_resources/1"
+    alice = {"username": "alice", "password": "alice_secret"}
+    bob = {"username": "bob", "password": "bob_secret"}
+    resp = await conditional_backend.get(url=url + "?rnd=aaaaaaaa", data={}, header={}, auth=alice, timeout=60)
+    assert resp.status_code == 200
+    # validators are keyed on the client level username, not on the native httpx.BasicAuth
+    assert "If-None-Match" in conditional_backend.prepare_conditional_headers("get", url, {}, alice)
+    assert conditional_backend.prepare_conditional_headers("get", url, {}, bob) == {}
+    store = conditional_backend.validator_store
+    assert store.get_principal(conditional_backend.get_auth_method(alice)) != \
+        store.get_principal(conditional_backend.get_auth_method(bob))
+
+    resp = await conditional_backend.get(url=url + "?rnd=bbbbbbbb", data={}, header={}, auth=bob, timeout=60)
+    assert resp.status_code == 200
+    assert store.revalidations == 0
+    assert len(store) == 2
+    resp = await conditional_backend.get(url=url + "?rnd=cccccccc", data={}, header={}, auth=alice, timeout=60)
+    assert resp.response["name"] == "alpha"
+    assert store.revalidations == 1
+    await conditional_backend.close()
+
+
 if __name__ == '__main__':
     pytest.main([os.path.basename(__file__)])
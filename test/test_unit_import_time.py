@@ -0,0 +1,73 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.append("../")
+
+import omi_async_http_client
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只导入package时不应加载的第三方库，以及只在使用对应功能时才需要的标准库和可选依赖
+LAZY_MODULES = ["aiohttp", "fastapi", "httpx", "requests", "starlette", "sqlite3", "gzip", "orjson"]
+
+# import omi_async_http_client的时间上限，单位：秒，留有足够余量，只用于发现明显的回退
+IMPORT_TIME_BUDGET = 1.0
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import omi_async_http_client
+elapsed = time.perf_counter() - started
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def run_import():
+    env = {**os.environ, "PYTHONPATH": PACKAGE_ROOT}
+    output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], env=env, cwd=PACKAGE_ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_import_does_not_load_backends():
+    result = run_import()
+    assert result["loaded"] == []
+
+
+def test_import_time():
+    # 取多次中最快的一次，减少机器负载的影响
+    elapsed = min(run_import()["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_TIME_BUDGET, f"import omi_async_http_client took {elapsed:.3f}s"
+
+
+def test_lazy_backend_attributes():
+    from omi_async_http_client.aiohttp_backend import AioHttpClientBackend
+    assert omi_async_http_client.AioHttpClientBackend is AioHttpClientBackend
+    assert "AioHttpClientBackend" in vars(omi_async_http_client)
+    assert "HttpxClientBackend" in dir(omi_async_http_client)
+    with pytest.raises(AttributeError):
+        getattr(omi_async_http_client, "UnknownClientBackend")
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])
@@ -0,0 +1,129 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import asyncio
+import os
+import sys
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.append("../")
+
+from omi_async_http_client._model import RequestModel
+
+from test.mock.mock_counting_backend import build_counting_client
+
+
+class Resource(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+    description: Optional[str]
+
+
+@RequestModel(api_name="/paged_resources", api_prefix="", api_suffix="")
+class PagedResource(BaseModel):
+    page: int
+    has_next: bool
+    total_pages: Optional[int]
+    count: int
+    resources: List[Resource]
+
+
+def build_client():
+    return build_counting_client(PagedResource)
+
+
+@pytest.mark.asyncio
+async def test_iter_pages(event_loop):
+    client = build_client()
+    pages = [page async for page in client.iter_pages(paging_model=PagedResource, prefetch=2)]
+    total_pages = pages[0].total_pages
+    assert [page.page for page in pages] == list(range(1, total_pages + 1))
+    assert len(client.http_backend.urls) == total_pages
+
+
+@pytest.mark.asyncio
+async def test_iter_pages_prefetch(event_loop):
+    client = build_client()
+    iterator = client.iter_pages(paging_model=PagedResource, prefetch=2)
+    page = await iterator.__anext__()
+    assert page.page == 1
+    # page 2 and 3 are requested while page 1 is processed
+    await asyncio.sleep(0.1)
+    assert len(client.http_backend.urls) == 3
+    await iterator.aclose()
+
+
+@pytest.mark.asyncio
+async def test_iter_pages_without_total(event_loop):
+    client = build_client()
+    pages = [page async for page in client.iter_pages(
+        paging_model=PagedResource, extra_params={"with_total": "false"}, prefetch=3)]
+    total_pages = (pages[0].count + 1) // 2
+    assert [page.page for page in pages] == list(range(1, total_pages + 1))
+    assert pages[0].total_pages is None
+    assert len(client.http_backend.urls) == total_pages
+
+
+@pytest.mark.asyncio
+async def test_iter_pages_no_prefetch(event_loop):
+    client = build_client()
+    iterator = client.iter_pages(paging_model=PagedResource, prefetch=0)
+    page = await iterator.__anext__()
+    await asyncio.sleep(0.1)
+    assert len(client.http_backend.urls) == 1
+    pages = [page] + [page async for page in iterator]
+    assert [page.page for page in pages] == list(range(1, page.total_pages + 1))
+
+
+@pytest.mark.asyncio
+async def test_iter_items(event_loop):
+    client = build_client()
+    items = [item async for item in client.iter_items(
+        paging_model=PagedResource, items_field="resources", extra_params={"size": 3})]
+    assert [item.id for item in items][:5] == ["1", "2", "3", "4", "5"]
+
+
+@pytest.mark.asyncio
+async def test_retrieve_all(event_loop):
+    client = build_client()
+    pages = await client.retrieve_all(paging_model=PagedResource, concurrency=2)
+    total_pages = pages[0].total_pages
+    assert [page.page for page in pages] == list(range(1, total_pages + 1))
+    assert len(client.http_backend.urls) == total_pages
+
+
+@pytest.mark.asyncio
+async def test_retrieve_all_without_total(event_loop):
+    client = build_client()
+    pages = await client.retrieve_all(paging_model=PagedResource, extra_params={"with_total": "false"})
+    total_pages = (pages[0].count + 1) // 2
+    assert [page.page for page in pages] == list(range(1, total_pages + 1))
+
+
+@pytest.mark.asyncio
+async def test_retrieve_all_stream(event_loop):
+    client = build_client()
+    pages = [page async for page in client.retrieve_all(
+        paging_model=PagedResource, concurrency=2, stream=True, extra_params={"size": 1})]
+    assert [page.page for page in pages] == list(range(1, pages[0].total_pages + 1))
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])
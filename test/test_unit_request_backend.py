@@ -199,5 +199,62 @@ async def test_delete_basic_auth(event_loop):
         assert httpex.status_code == 405
 
 
+@pytest.mark.asyncio
+async def test_pooled_session(event_loop):
+    pooled_backend = RequestsClientBackend(config={"HTTP_POOL_SIZE": 4})
+    resp = await pooled_backend.get(
+        url=BASE_URL + "/mock/users/me",
+        data={},
+        header={},
+        auth=HTTPBasicAuth("client_id", "client_secret"),
+        timeout=60)
+    assert resp.status_code == 200
+    executor = await pooled_backend._session.get_executor()
+    assert executor._max_workers == 4
+
+    # the same executor is reused by later requests
+    resp = await pooled_backend.get(
+        url=BASE_URL + "/mock/users/me",
+        data={},
+        header={},
+        auth=HTTPBasicAuth("client_id", "client_secret"),
+        timeout=60)
+    assert resp.status_code == 200
+    assert await pooled_backend._session.get_executor() is executor
+
+    await pooled_backend.close()
+    assert executor._shutdown
+
+
+@pytest.mark.asyncio
+async def test_conditional_request(event_loop):
+    conditional_backend = RequestsClientBackend(config={"HTTP_CONDITIONAL_REQUEST": True})
+    url = BASE_URL + "/mock/versioned_resources/1"
+    resp = await conditional_backend.get(url=url + "?rnd=aaaaaaaa", data={}, header={},
+                                         auth=HTTPBasicAuth("client_id", "client_secret"), timeout=60)
+    assert resp.status_code == 200
+    assert resp.response["name"] == "alpha"
+    assert len(conditional_backend.validator_store) == 1
+    headers = conditional_backend.prepare_conditional_headers("get", url + "?rnd=bbbbbbbb", {}, HTTPBasicAuth("client_id", "client_secret"))
+    assert headers["If-None-Match"].startswith('"')
+    assert "If-Modified-Since" in headers
+
+    # 304 Not Modified is turned into the previously parsed response
+    resp = await conditional_backend.get(url=url + "?rnd=bbbbbbbb", data={}, header={},
+                                         auth=HTTPBasicAuth("client_id", "client_secret"), timeout=60)
+    assert resp.status_code == 200
+    assert resp.response["name"] == "alpha"
+    assert conditional_backend.validator_store.revalidations == 1
+
+    # without stored validators, a 304 can not be handled
+    try:
+        await backend.get(url=url, data={}, header={"If-None-Match": headers["If-None-Match"]},
+                          auth=HTTPBasicAuth("client_id", "client_secret"), timeout=60)
+        assert False
+    except HTTPException as httpex:
+        assert httpex.status_code == 304
+    await conditional_backend.close()
+
+
 if __name__ == '__main__':
     pytest.main([os.path.basename(__file__)])
@@ -0,0 +1,144 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+import logging
+import os
+import sys
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+sys.path.append("../")
+
+from omi_async_http_client.async_http_client import APIClient
+from omi_async_http_client._exceptions import HTTPException
+from omi_async_http_client._logging import RequestLogger, redact, redact_url
+from omi_async_http_client._model import RequestModel
+from omi_async_http_client.fastapi_testclient_backend import FastAPITestClientBackend
+
+from mock_fastapi import app
+
+LOGGER_NAME = "omi_async_http_client.async_http_client"
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="", api_suffix="")
+class ResourceID(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+    description: Optional[str]
+
+
+class Unprintable:
+    def __str__(self):
+        raise AssertionError("log content should not be built")
+
+    __repr__ = __str__
+
+
+def build_client(**config):
+    return APIClient(model=ResourceID,
+                     http_backend=FastAPITestClientBackend(test_client=TestClient(app)),
+                     client_id="client_id",
+                     client_secret="client_secret",
+                     resource_endpoint="/mock",
+                     config=config)
+
+
+def test_redact():
+    value = {
+        "X_ClientId": "client_id",
+        "X_Client_Secret": "client_secret",
+        "nested": [{"password": "secret", "name": "alpha"}],
+    }
+    assert redact(value) == {
+        "X_ClientId": "client_id",
+        "X_Client_Secret": "***",
+        "nested": [{"password": "***", "name": "alpha"}],
+    }
+    # the original value is not modified
+    assert value["X_Client_Secret"] == "client_secret"
+    assert redact({"api_key": "k"}, {"api_key"}) == {"api_key": "***"}
+    assert redact_url("http://host/a?client_id=x&client_secret=y") == "http://host/a?client_id=x&client_secret=***"
+    assert redact_url("http://host/a") == "http://host/a"
+
+
+def test_lazy_when_disabled():
+    logger = logging.getLogger("test_request_logging.disabled")
+    logger.setLevel(logging.WARNING)
+    request_logger = RequestLogger(logger)
+    # nothing is formatted when INFO is disabled
+    request_logger.log_request("get", Unprintable(), Unprintable(), None, Unprintable(), Unprintable(), 0.01)
+
+
+def test_sampling_slow_and_errors(caplog):
+    logger = logging.getLogger("test_request_logging.sampled")
+    request_logger = RequestLogger(logger, sample_rate=3, slow_threshold=1.0)
+    auth = {"username": "client_id", "password": "client_secret"}
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        for _ in range(6):
+            request_logger.log_request("get", "http://host/a", {}, auth, None, {"status_code": 200}, 0.01)
+        assert len(caplog.records) == 2
+        assert request_logger.sampled_out == 4
+
+        caplog.clear()
+        request_logger.log_request("get", "http://host/a", {}, auth, None, {"status_code": 200}, 2.0)
+        request_logger.log_request("get", "http://host/a", {}, auth, None, None, 0.01, HTTPException(404))
+        request_logger.log_request("get", "http://host/a", {}, auth, None, None, 0.01, HTTPException(503))
+        assert [r.levelno for r in caplog.records] == [logging.WARNING, logging.INFO, logging.ERROR]
+        record = caplog.records[-1].omi_http
+        assert record["status_code"] == 503
+        assert record["principal"] == "client_id"
+        assert "client_secret" not in caplog.text
+
+        # 4xx is logged at INFO and sampled like the normal requests
+        caplog.clear()
+        for _ in range(6):
+            request_logger.log_request("get", "http://host/a", {}, auth, None, None, 0.01, HTTPException(404))
+        assert [r.levelno for r in caplog.records] == [logging.INFO, logging.INFO]
+        assert caplog.records[0].omi_http["status_code"] == 404
+        assert request_logger.sampled_out == 8
+
+
+@pytest.mark.asyncio
+async def test_client_request_logging(event_loop, caplog):
+    client = build_client(LOG_SAMPLE_RATE=1)
+    with caplog.at_level(logging.DEBUG, logger=LOGGER_NAME):
+        obj = await client.retrieve(opt_id={"id": "1"}, extra_params={"id": "1"})
+        assert obj.name == "alpha"
+        records = [r for r in caplog.records if hasattr(r, "omi_http")]
+        assert len(records) == 1
+        record = records[0].omi_http
+        assert record["method"] == "GET"
+        assert record["status_code"] == 200
+        assert record["headers"]["X_Client_Secret"] == "***"
+        assert record["response"]["response"]["name"] == "alpha"
+        assert "client_secret" not in caplog.text
+
+        caplog.clear()
+        try:
+            await client.retrieve(opt_id={"id": "999"}, extra_params={"id": "999"})
+            assert False, "HTTPException should be raised"
+        except HTTPException as httpex:
+            assert httpex.status_code == 404
+        records = [r for r in caplog.records if hasattr(r, "omi_http")]
+        assert records[0].levelno == logging.INFO
+        assert records[0].omi_http["status_code"] == 404
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])
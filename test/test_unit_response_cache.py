@@ -0,0 +1,472 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import asyncio
+import os
+import sys
+import time
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.append("../")
+
+from omi_async_http_client._cache import MemoryResponseCache, parse_cache_control
+from omi_async_http_client._exceptions import HTTPException
+from omi_async_http_client._model import RequestModel, get_api_template, get_collection_model
+
+from test.mock.mock_counting_backend import build_counting_client
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="", api_suffix="")
+class ResourceID(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+    description: Optional[str]
+
+
+@RequestModel(api_name="/resources", api_prefix="", api_suffix="")
+class Resource(BaseModel):
+    name: Optional[str]
+    description: Optional[str]
+
+
+@RequestModel(api_name="/users/{uid}/orders/{id}", api_prefix="/v1", api_suffix="")
+class UserOrder(BaseModel):
+    id: Optional[str]
+
+
+@RequestModel(api_name="/cached_resources/{id}", api_prefix="", api_suffix="")
+class CachedResourceID(ResourceID):
+    pass
+
+
+def build_client(cache, model=ResourceID, **config):
+    return build_counting_client(model, {"RESPONSE_CACHE": cache, **config})
+
+
+def cache_control(value):
+    return {"cache_control": value}
+
+
+def create_entry(cache, key, response=None, ttl=None):
+    return cache.create_entry(key, "/mock/resources/" + key, 200, response or {"id": key}, ttl=ttl)
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_ttl(event_loop):
+    cache = MemoryResponseCache(ttl=0.05)
+    await cache.set("1", create_entry(cache, "1"))
+    entry = await cache.get("1")
+    assert entry.response == {"id": "1"}
+    assert entry.path == "/mock/resources/1"
+    time.sleep(0.06)
+    assert await cache.get("1") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_lru(event_loop):
+    cache = MemoryResponseCache(max_entries=2)
+    await cache.set("1", create_entry(cache, "1"))
+    await cache.set("2", create_entry(cache, "2"))
+    # "1" becomes the most recently used entry
+    await cache.get("1")
+    await cache.set("3", create_entry(cache, "3"))
+    assert await cache.get("2") is None
+    assert await cache.get("1") is not None
+    assert await cache.get("3") is not None
+    assert cache.stats["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_max_bytes(event_loop):
+    cache = MemoryResponseCache(max_bytes=50)
+    await cache.set("1", create_entry(cache, "1", {"data": "x" * 20}))
+    await cache.set("2", create_entry(cache, "2", {"data": "y" * 20}))
+    assert len(cache) == 1
+    assert cache.stats["bytes"] <= 50
+    assert await cache.get("2") is not None
+
+
+def test_make_key():
+    cache = MemoryResponseCache(vary_headers=["Accept"])
+    auth = {"username": "client_id", "password": "client_secret"}
+    key = cache.make_key(ResourceID, "/mock/resources/1?client_id=client_id", {"Accept": "a", "X": "1"}, auth)
+    assert "client_secret" not in key
+    assert " client_id " in key
+    # headers which are not in vary_headers are ignored
+    assert key == cache.make_key(ResourceID, "/mock/resources/1?client_id=client_id", {"Accept": "a"}, auth)
+    assert key != cache.make_key(ResourceID, "/mock/resources/1?client_id=client_id", {"Accept": "b"}, auth)
+
+
+@pytest.mark.asyncio
+async def test_retrieve_with_cache(event_loop):
+    client = build_client(True)
+    assert isinstance(client.response_cache, MemoryResponseCache)
+    first = await client.retrieve(opt_id={"id": "1"})
+    second = await client.retrieve(opt_id={"id": "1"})
+    assert getattr(first, "name") == "alpha"
+    assert first == second and first is not second
+    assert client.http_backend.get_count == 1
+    assert client.response_cache.stats["hits"] == 1
+
+    # bypass the cache
+    await client.retrieve(opt_id={"id": "1"}, cache=False)
+    assert client.http_backend.get_count == 2
+
+    # entry is older than max_age
+    await asyncio.sleep(0.02)
+    await client.retrieve(opt_id={"id": "1"}, max_age=0.01)
+    assert client.http_backend.get_count == 3
+
+    # a different header is cached separately
+    await client.retrieve(opt_id={"id": "1"}, extra_headers={"foo": "bar"})
+    assert client.http_backend.get_count == 4
+
+
+@pytest.mark.asyncio
+async def test_retrieve_without_cache(event_loop):
+    client = build_client(None)
+    assert client.response_cache is None
+    await client.retrieve(opt_id={"id": "1"})
+    await client.retrieve(opt_id={"id": "1"})
+    assert client.http_backend.get_count == 2
+
+
+def test_cache_policy():
+    assert parse_cache_control('max-age=60, Private, stale-if-error="30"') == {
+        "max-age": "60", "private": None, "stale-if-error": "30"}
+    cache = MemoryResponseCache(ttl=10)
+    assert cache.get_cache_policy({}).ttl == 10
+    assert cache.get_cache_policy({"Cache-Control": "no-store"}) is None
+    assert cache.get_cache_policy({"cache-control": "no-cache"}).ttl == 0
+    assert cache.get_cache_policy({"cache-control": "public"}).ttl == 10
+    policy = cache.get_cache_policy({"cache-control": "max-age=5, s-maxage=50, stale-while-revalidate=7, private"})
+    assert (policy.ttl, policy.stale_while_revalidate, policy.stale_if_error) == (5, 7, 0)
+    shared_cache = MemoryResponseCache(shared=True)
+    assert shared_cache.get_cache_policy({"cache-control": "max-age=5, private"}) is None
+    assert shared_cache.get_cache_policy({"cache-control": "max-age=5, s-maxage=50"}).ttl == 50
+
+
+@pytest.mark.asyncio
+async def test_response_headers(event_loop):
+    client = build_client(None, model=CachedResourceID)
+    response = await client.get_response(
+        client.get_url(opt_id={"id": "1"}, extra_params=cache_control("max-age=30")),
+        client.get_headers(), client.get_auth(), 60)
+    assert response.headers["cache-control"] == "max-age=30"
+    assert response.response["name"] == "alpha"
+
+
+@pytest.mark.asyncio
+async def test_cache_control_max_age(event_loop):
+    client = build_client(True, model=CachedResourceID, RESPONSE_CACHE_CONTROL=True)
+    await client.retrieve(opt_id={"id": "1"}, extra_params=cache_control("max-age=60"))
+    await client.retrieve(opt_id={"id": "1"}, extra_params=cache_control("max-age=60"))
+    assert client.http_backend.get_count == 1
+
+    # no-store responses are never cached
+    await client.retrieve(opt_id={"id": "1"}, extra_params=cache_control("no-store"))
+    await client.retrieve(opt_id={"id": "1"}, extra_params=cache_control("no-store"))
+    assert client.http_backend.get_count == 3
+    assert len(client.response_cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_control_private(event_loop):
+    client = build_client(True, model=CachedResourceID, RESPONSE_CACHE_CONTROL=True, RESPONSE_CACHE_SHARED=True)
+    await client.retrieve(opt_id={"id": "1"}, extra_params=cache_control("max-age=60, private"))
+    await client.retrieve(opt_id={"id": "1"}, extra_params=cache_control("max-age=60, private"))
+    assert client.http_backend.get_count == 2
+    assert len(client.response_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(event_loop):
+    client = build_client(True, model=CachedResourceID, RESPONSE_CACHE_CONTROL=True)
+    params = cache_control("max-age=0, stale-while-revalidate=60")
+    first = await client.retrieve(opt_id={"id": "1"}, extra_params=params)
+    # the stale entry is served right away while a refresh runs in background
+    second = await client.retrieve(opt_id={"id": "1"}, extra_params=params)
+    third = await client.retrieve(opt_id={"id": "1"}, extra_params=params)
+    assert first == second == third
+    assert len(client._revalidations) == 1
+    await asyncio.gather(*client._revalidations.values())
+    assert client.http_backend.get_count == 2
+    assert len(client._revalidations) == 0
+
+    # max_age asks for a fresh response
+    await client.retrieve(opt_id={"id": "1"}, extra_params=params, max_age=60)
+    assert client.http_backend.get_count == 3
+
+    # a background refresh joining a caller's fetch is not a stampede avoided
+    await asyncio.gather(
+        client.retrieve(opt_id={"id": "1"}, extra_params=params, max_age=0),
+        client.retrieve(opt_id={"id": "1"}, extra_params=params),
+    )
+    await asyncio.gather(*client._revalidations.values())
+    assert client.http_backend.get_count == 4
+    assert client.response_cache.stats["stampedes_avoided"] == 0
+    assert client.response_cache.stats["background_joins"] == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_if_error(event_loop):
+    client = build_client(True, model=CachedResourceID, RESPONSE_CACHE_CONTROL=True)
+    await client.retrieve(opt_id={"id": "1"}, extra_params=cache_control("max-age=0, stale-if-error=60"))
+    client.http_backend.fail = True
+    resource = await client.retrieve(opt_id={"id": "1"}, extra_params=cache_control("max-age=0, stale-if-error=60"))
+    assert getattr(resource, "name") == "alpha"
+    assert client.http_backend.get_count == 2
+
+    # no stale entry to fall back on
+    with pytest.raises(HTTPException):
+        await client.retrieve(opt_id={"id": "2"}, extra_params=cache_control("max-age=0, stale-if-error=60"))
+
+
+@pytest.mark.asyncio
+async def test_invalidate_path(event_loop):
+    cache = MemoryResponseCache()
+    for key in ["1", "2", "10"]:
+        await cache.set(key, create_entry(cache, key))
+    await cache.set("all", cache.create_entry("all", "/mock/resources?name=a", 200, {}))
+    await cache.set("other", cache.create_entry("other", "/mock/resources_other/1", 200, {}))
+    assert await cache.invalidate_path("/mock/resources/1", include_descendants=False) == 1
+    assert await cache.get("10") is not None
+    assert await cache.invalidate_path("/mock/resources/") == 3
+    assert await cache.get("other") is not None
+
+
+@pytest.mark.asyncio
+async def test_negative_cache(event_loop):
+    client = build_client(None, NEGATIVE_CACHE_TTL=60)
+    writer = build_client(None, model=ResourceID)
+    resource_id = "n" + str(time.time_ns())[-4:]
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            await client.retrieve(opt_id={"id": resource_id})
+        assert exc_info.value.status_code == 404
+    assert client.http_backend.get_count == 1
+
+    # the resource appears, but the cached 404 is still served
+    await writer.http_backend.post(writer.resource_endpoint + "/resources", {"id": resource_id, "name": "negative"},
+                                   writer.get_headers(), writer.get_auth(), 60)
+    with pytest.raises(HTTPException):
+        await client.retrieve(opt_id={"id": resource_id})
+    await client.retrieve(opt_id={"id": resource_id}, cache=False)
+    assert client.http_backend.get_count == 2
+
+    # an update through this client invalidates the cached 404
+    await client.update(opt_id={"id": resource_id}, obj_in={"name": "negative", "description": "updated"})
+    resource = await client.retrieve(opt_id={"id": resource_id})
+    assert getattr(resource, "description") == "updated"
+    assert client.http_backend.get_count == 3
+
+
+@pytest.mark.asyncio
+async def test_negative_cache_ttl(event_loop):
+    client = build_client(None, NEGATIVE_CACHE_TTL=0.01)
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            await client.retrieve(opt_id={"id": "not-exists"})
+        await asyncio.sleep(0.02)
+    assert client.http_backend.get_count == 2
+    assert build_client(None).negative_cache is None
+
+
+def test_get_collection_path():
+    assert build_client(None).get_collection_path() == "/mock/resources"
+    assert build_client(None, model=Resource).get_collection_path() == "/mock/resources"
+    client = build_client(None, model=UserOrder)
+    assert client.get_collection_path({"uid": "7", "id": "1"}) == "/mock/v1/users/7/orders"
+    assert client.get_collection_path({"id": "1"}) is None
+    # the collection template is compiled once per model, not on every write
+    template = get_api_template(get_collection_model(UserOrder))
+    client.get_collection_path({"uid": "8", "id": "1"})
+    assert get_api_template(get_collection_model(UserOrder)) is template
+
+
+@pytest.mark.asyncio
+async def test_write_invalidation(event_loop):
+    cache = MemoryResponseCache()
+    client = build_client(cache)
+    list_client = build_client(cache, model=Resource)
+    first = await client.retrieve(opt_id={"id": "1"})
+    await client.retrieve(opt_id={"id": "2"})
+    await list_client.retrieve(extra_params={"name": "a"})
+    await list_client.retrieve(extra_params={"name": "b"})
+    assert len(cache) == 4
+
+    # the item and the listings of its collection are evicted, other items are kept
+    await client.update(opt_id={"id": "1"},
+                        obj_in={"name": getattr(first, "name"), "description": getattr(first, "description")})
+    assert len(cache) == 1
+    await client.retrieve(opt_id={"id": "2"})
+    assert client.http_backend.get_count == 2
+    await client.retrieve(opt_id={"id": "1"})
+    assert client.http_backend.get_count == 3
+
+    # a create on the collection only evicts the listings
+    await list_client.retrieve(extra_params={"name": "a"})
+    await list_client.create(obj_in={"id": "n" + str(time.time_ns())[-4:], "name": "invalidation"})
+    assert len(cache) == 2
+    assert cache.stats["entries"] == 2
+
+
+def test_should_refresh_early():
+    cache = MemoryResponseCache()
+    entry = cache.create_entry("1", "/mock/resources/1", 200, {}, ttl=0.001, delta=10)
+    assert entry.should_refresh_early(1.0)
+    assert not entry.should_refresh_early(0)
+    entry = cache.create_entry("1", "/mock/resources/1", 200, {}, ttl=1000, delta=0.001)
+    assert not entry.should_refresh_early(1.0)
+    assert not cache.create_entry("1", "/mock/resources/1", 200, {}, ttl=0.001).should_refresh_early(1.0)
+
+
+@pytest.mark.asyncio
+async def test_stampede_protection(event_loop):
+    client = build_client(True)
+    results = await asyncio.gather(*[client.retrieve(opt_id={"id": "1"}) for _ in range(10)])
+    assert all(result == results[0] for result in results)
+    assert client.http_backend.get_count == 1
+    assert client.response_cache.stats["stampedes_avoided"] == 9
+    assert client.response_cache.stats["misses"] == 10
+    assert client.response_cache.stats["background_joins"] == 0
+
+
+@pytest.mark.asyncio
+async def test_early_refresh(event_loop):
+    client = build_client(True, RESPONSE_CACHE_EARLY_REFRESH_BETA=1.0)
+    await client.retrieve(opt_id={"id": "1"})
+    entry = next(iter(client.response_cache._entries.values()))
+    assert entry.delta > 0
+    # a slow fetch close to expiry is refreshed before it expires
+    entry.delta = 1000
+    await asyncio.gather(*[client.retrieve(opt_id={"id": "1"}) for _ in range(5)])
+    assert client.response_cache.stats["early_refreshes"] == 1
+    await asyncio.gather(*client._revalidations.values())
+    assert client.http_backend.get_count == 2
+    assert next(iter(client.response_cache._entries.values())) is not entry
+
+
+@pytest.mark.asyncio
+async def test_snapshot(event_loop, tmp_path):
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    cache = MemoryResponseCache()
+    for key in ["1", "2", "3"]:
+        await cache.set(key, create_entry(cache, key))
+    await cache.set("expired", create_entry(cache, "expired", ttl=-1))
+    await cache.get("1")
+    assert await cache.dump(path, batch_size=2) == 4
+
+    restored = MemoryResponseCache(max_entries=2)
+    assert await restored.load(path, batch_size=2) == 3
+    # the most recently used entries are kept
+    assert list(restored._entries.keys()) == ["3", "1"]
+    assert (await restored.get("1")).response == {"id": "1"}
+
+    limited = MemoryResponseCache()
+    assert await limited.load(path, limit=1) == 1
+    assert len(limited) == 1
+
+    # a limited load keeps the most recently used entries
+    hot = MemoryResponseCache()
+    for index in range(10):
+        await hot.set(f"k{index}", create_entry(hot, f"k{index}"))
+    for key in ["k0", "k1", "k2"]:
+        await hot.get(key)
+    await hot.dump(path, batch_size=4)
+    limited = MemoryResponseCache()
+    assert await limited.load(path, limit=3, batch_size=4) == 3
+    assert list(limited._entries.keys()) == ["k0", "k1", "k2"]
+
+    with open(path, "wb") as snapshot:
+        snapshot.write(b"not a snapshot")
+    with pytest.raises((OSError, ValueError)):
+        await limited.load(path)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_lifecycle(event_loop, tmp_path):
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    client = build_client(True, RESPONSE_CACHE_SNAPSHOT=path)
+    await client.startup()
+    first = await client.retrieve(opt_id={"id": "1"})
+    await client.shutdown()
+    # the cache is shared per snapshot path while the first client is alive, empty it to simulate a restart
+    await client.response_cache.clear()
+
+    restarted = build_client(True, RESPONSE_CACHE_SNAPSHOT=path, RESPONSE_CACHE_SNAPSHOT_WAIT=5)
+    assert restarted.response_cache is client.response_cache
+    await restarted.startup()
+    assert first == await restarted.retrieve(opt_id={"id": "1"})
+    assert restarted.http_backend.get_count == 0
+    await restarted.shutdown()
+
+    # without RESPONSE_CACHE_SNAPSHOT_WAIT the snapshot is loaded in the background
+    await client.response_cache.clear()
+    await client.startup()
+    assert len(client.response_cache) == 0
+    await client._snapshot_task
+    assert len(client.response_cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_shared_snapshot(event_loop, tmp_path):
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    clients = [build_client(True, model=model, RESPONSE_CACHE_SNAPSHOT=path)
+               for model in (ResourceID, CachedResourceID)]
+    cache = clients[0].response_cache
+    assert clients[1].response_cache is cache
+    assert build_client(True, RESPONSE_CACHE_SNAPSHOT=str(tmp_path / "other.jsonl.gz")).response_cache is not cache
+
+    for client in clients:
+        await client.startup()
+        await client.startup()
+        await client._snapshot_task
+        await client.retrieve(opt_id={"id": "1"})
+    assert len(cache) == 2
+
+    await clients[0].shutdown()
+    await clients[0].shutdown()
+    # the snapshot is written once the last client sharing the cache shuts down
+    assert not os.path.exists(path)
+    await clients[1].shutdown()
+    restored = MemoryResponseCache()
+    assert await restored.load(path) == 2
+
+    loads = []
+    load = cache.load
+
+    async def counting_load(*args, **kwargs):
+        loads.append(args)
+        return await load(*args, **kwargs)
+
+    await cache.clear()
+    cache.load = counting_load
+    for client in clients:
+        await client.startup()
+    await asyncio.gather(*[client._snapshot_task for client in clients])
+    assert len(loads) == 1
+    assert len(cache) == 2
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])
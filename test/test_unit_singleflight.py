@@ -0,0 +1,138 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import asyncio
+import os
+import sys
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.append("../")
+
+from omi_async_http_client._model import RequestModel
+from omi_async_http_client._exceptions import HTTPException
+from omi_async_http_client._singleflight import SingleFlight
+
+from test.mock.mock_counting_backend import build_counting_client
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="", api_suffix="")
+class ResourceID(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+    description: Optional[str]
+
+
+def build_client(single_flight=True):
+    return build_counting_client(ResourceID, {"SINGLE_FLIGHT": single_flight})
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_result(event_loop):
+    flight = SingleFlight()
+    calls = []
+
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*[flight.do("key", func) for _ in range(5)])
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.shared == 4
+    assert not flight.in_flight("key")
+
+    # a finished flight is executed again
+    assert await flight.do("key", func) == "result"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_background_joins(event_loop):
+    flight = SingleFlight()
+
+    async def func():
+        await asyncio.sleep(0.01)
+        return "result"
+
+    # a background call joining a caller's flight is counted separately
+    await asyncio.gather(flight.do("key", func), flight.do("key", func, background=True))
+    assert flight.shared == 0
+    assert flight.background_shared == 1
+
+    # a caller joining a background flight is a shared call
+    await asyncio.gather(flight.do("key", func, background=True), flight.do("key", func))
+    assert flight.shared == 1
+    assert flight.background_shared == 1
+    assert flight.executions == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exception(event_loop):
+    flight = SingleFlight()
+
+    async def func():
+        await asyncio.sleep(0.01)
+        raise HTTPException(status_code=404)
+
+    results = await asyncio.gather(*[flight.do("key", func) for _ in range(3)], return_exceptions=True)
+    for result in results:
+        assert isinstance(result, HTTPException)
+        assert result.status_code == 404
+    assert flight.executions == 1
+
+
+@pytest.mark.asyncio
+async def test_retrieve_single_flight(event_loop):
+    client = build_client()
+    results = await asyncio.gather(*[client.retrieve(opt_id={"id": "1"}) for _ in range(5)])
+    assert client.http_backend.get_count == 1
+    for result in results:
+        assert getattr(result, "name") == "alpha"
+    # every coalesced caller gets its own object
+    assert len({id(result) for result in results}) == 5
+    results[0].name = "changed"
+    assert getattr(results[1], "name") == "alpha"
+
+    # different headers are not coalesced
+    await asyncio.gather(
+        client.retrieve(opt_id={"id": "1"}),
+        client.retrieve(opt_id={"id": "1"}, extra_headers={"foo": "bar"}),
+    )
+    assert client.http_backend.get_count == 3
+
+    results = await asyncio.gather(*[client.retrieve(opt_id={"id": "8"}) for _ in range(3)],
+                                   return_exceptions=True)
+    assert client.http_backend.get_count == 4
+    for result in results:
+        assert isinstance(result, HTTPException)
+        assert result.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_retrieve_without_single_flight(event_loop):
+    client = build_client(single_flight=False)
+    assert client.single_flight is None
+    await asyncio.gather(*[client.retrieve(opt_id={"id": "1"}) for _ in range(3)])
+    assert client.http_backend.get_count == 3
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])
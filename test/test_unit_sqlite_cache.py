@@ -0,0 +1,218 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import asyncio
+import os
+import sys
+import time
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.append("../")
+
+from omi_async_http_client._model import RequestModel
+from omi_async_http_client._sqlite_cache import SQLiteResponseCache
+
+from test.mock.mock_counting_backend import build_counting_client
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="", api_suffix="")
+class ResourceID(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+    description: Optional[str]
+
+
+def build_client(path):
+    return build_counting_client(ResourceID, {"RESPONSE_CACHE": True, "RESPONSE_CACHE_PATH": path})
+
+
+def create_entry(cache, key, response=None, ttl=None):
+    return cache.create_entry(key, "/mock/resources/" + key, 200, response or {"id": key}, ttl=ttl)
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_ttl(event_loop, tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "cache.db"), ttl=0.05)
+    await cache.set("1", create_entry(cache, "1"))
+    entry = await cache.get("1")
+    assert entry.response == {"id": "1"}
+    assert entry.path == "/mock/resources/1"
+    assert entry.size > 0
+    time.sleep(0.06)
+    assert await cache.get("1") is None
+    assert len(cache) == 0
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_lru(event_loop, tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "cache.db"), max_entries=2)
+    await cache.set("1", create_entry(cache, "1"))
+    await cache.set("2", create_entry(cache, "2"))
+    # "1" becomes the most recently used entry
+    await cache.get("1")
+    await cache.set("3", create_entry(cache, "3"))
+    assert await cache.get("2") is None
+    assert await cache.get("1") is not None
+    assert await cache.get("3") is not None
+    assert cache.stats["evictions"] == 1
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_max_bytes(event_loop, tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "cache.db"), max_bytes=50)
+    await cache.set("1", create_entry(cache, "1", {"data": "x" * 20}))
+    await cache.set("2", create_entry(cache, "2", {"data": "y" * 20}))
+    assert len(cache) == 1
+    assert cache.stats["bytes"] <= 50
+    assert await cache.get("2") is not None
+    await cache.delete("2")
+    assert len(cache) == 0
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_shared_file(event_loop, tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = SQLiteResponseCache(path)
+    reader = SQLiteResponseCache(path)
+    await writer.set("1", create_entry(writer, "1"))
+    assert (await reader.get("1")).response == {"id": "1"}
+    await reader.clear()
+    assert await writer.get("1") is None
+    writer.close()
+    reader.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_invalidate_path(event_loop, tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "cache.db"))
+    for key in ["1", "2", "10"]:
+        await cache.set(key, create_entry(cache, key))
+    await cache.set("other", cache.create_entry("other", "/mock/resources_other/1", 200, {}))
+    assert await cache.invalidate_path("/mock/resources/1", include_descendants=False) == 1
+    assert await cache.get("10") is not None
+    assert await cache.invalidate_path("/mock/resources") == 2
+    assert await cache.get("other") is not None
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_snapshot(event_loop, tmp_path):
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    cache = SQLiteResponseCache(str(tmp_path / "cache.db"))
+    for key in ["1", "2", "3"]:
+        await cache.set(key, create_entry(cache, key))
+    assert await cache.dump(path) == 3
+    cache.close()
+
+    restored = SQLiteResponseCache(str(tmp_path / "restored.db"), max_entries=2)
+    assert await restored.load(path) == 3
+    assert len(restored) == 2
+    assert await restored.get("1") is None
+    assert (await restored.get("3")).response == {"id": "3"}
+    restored.close()
+
+
+@pytest.mark.asyncio
+async def test_retrieve_after_restart(event_loop, tmp_path):
+    path = str(tmp_path / "cache.db")
+    client = build_client(path)
+    assert isinstance(client.response_cache, SQLiteResponseCache)
+    first = await client.retrieve(opt_id={"id": "1"})
+    assert client.http_backend.get_count == 1
+    client.response_cache.close()
+
+    # a new client on the same file serves the cached response without a request
+    restarted = build_client(path)
+    second = await restarted.retrieve(opt_id={"id": "1"})
+    assert first == second
+    assert restarted.http_backend.get_count == 0
+    restarted.response_cache.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_batched_access(event_loop, tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteResponseCache(path, max_entries=2, access_flush_size=2, access_flush_interval=60)
+    await cache.set("1", create_entry(cache, "1"))
+    await cache.set("2", create_entry(cache, "2"))
+
+    def accessed_at(key):
+        return cache._execute(lambda connection: connection.execute(
+            "SELECT accessed_at FROM responses WHERE key = ?", (key,)).fetchone()[0])
+
+    stored_at = accessed_at("1")
+    # a hit only records the access time in memory
+    await cache.get("1")
+    assert accessed_at("1") == stored_at
+    # pending access times are written before eviction, "2" is the least recently used entry
+    await cache.set("3", create_entry(cache, "3"))
+    assert accessed_at("1") > stored_at
+    assert await cache.get("2") is None
+    # access times are written in batches of access_flush_size
+    await cache.get("1")
+    await cache.get("3")
+    assert not cache._accessed
+    await cache.get("3")
+    cache.close()
+    assert not cache._accessed
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_incremental_stats(event_loop, tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteResponseCache(path)
+    await cache.set("1", create_entry(cache, "1", {"data": "x" * 10}))
+    await cache.set("2", create_entry(cache, "2"))
+    # replacing an entry does not count it twice
+    await cache.set("1", create_entry(cache, "1"))
+    assert cache.stats["entries"] == 2
+    assert cache.stats["bytes"] == 2 * len('{"id":"1"}')
+    await cache.invalidate_path("/mock/resources/2")
+    assert len(cache) == 1
+    await cache.clear()
+    assert cache.stats["entries"] == 0
+    assert cache.stats["bytes"] == 0
+
+    # files created without the stats table are counted once when opened
+    await cache.set("1", create_entry(cache, "1"))
+    cache._execute(lambda connection: connection.executescript(
+        "DROP TRIGGER responses_insert; DROP TRIGGER responses_delete; DROP TABLE responses_stats;"))
+    cache.close()
+    reopened = SQLiteResponseCache(path)
+    assert len(reopened) == 1
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_client_close_closes_cache(event_loop, tmp_path):
+    client = build_client(str(tmp_path / "cache.db"))
+    await client.retrieve(opt_id={"id": "1"})
+    await client.retrieve(opt_id={"id": "1"})
+    assert client.response_cache._connection is not None
+    await client.close()
+    assert client.response_cache._connection is None
+    assert not client.response_cache._accessed
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])
@@ -0,0 +1,138 @@
+"""
+Copyright 2020 limc.cn All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+"""
+
+import asyncio
+import os
+import sys
+import time
+from typing import Optional
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+sys.path.append("../")
+
+from omi_async_http_client._model import RequestModel
+from omi_async_http_client._warmer import RefreshAheadWarmer
+
+from test.mock.mock_counting_backend import build_counting_client
+
+
+@RequestModel(api_name="/resources/{id}", api_prefix="", api_suffix="")
+class ResourceID(BaseModel):
+    id: Optional[str]
+    name: Optional[str]
+    description: Optional[str]
+
+
+def build_client(client_app=None, **config):
+    return build_counting_client(ResourceID, {"RESPONSE_CACHE": True, "RESPONSE_CACHE_WARM_TOP_K": 1, **config},
+                                 app=client_app)
+
+
+def test_warmer_from_config():
+    client = build_client()
+    assert isinstance(client.warmer, RefreshAheadWarmer)
+    assert client.warmer.top_k == 1
+    assert build_client(RESPONSE_CACHE_WARM_TOP_K=0).warmer is None
+    assert build_client(RESPONSE_CACHE=None).warmer is None
+
+
+@pytest.mark.asyncio
+async def test_refresh_hot_keys(event_loop):
+    client = build_client(RESPONSE_CACHE_WARM_AHEAD=3600)
+    for _ in range(4):
+        await client.retrieve(opt_id={"id": "1"})
+    await client.retrieve(opt_id={"id": "2"})
+    assert len(client.http_backend.urls) == 2
+    hot_keys = client.warmer.get_hot_keys()
+    assert len(hot_keys) == 1 and hot_keys[0].hits == 4
+
+    # only the hottest key which expires within refresh_ahead is refreshed
+    assert await client.warmer.refresh_due() == 1
+    assert client.http_backend.urls[-1].split("?")[0] == "/mock/resources/1"
+    assert client.warmer.refreshes == 1
+    # access counts decay after each round
+    assert client.warmer.get_hot_keys()[0].hits == 2
+
+    # keys which are far from expiry are not refreshed
+    client.warmer.refresh_ahead = 0
+    assert await client.warmer.refresh_due() == 0
+    assert len(client.http_backend.urls) == 3
+
+
+@pytest.mark.asyncio
+async def test_warmer_start_stop(event_loop):
+    client = build_client(RESPONSE_CACHE_WARM_AHEAD=3600, RESPONSE_CACHE_WARM_INTERVAL=0.01)
+    for _ in range(3):
+        await client.retrieve(opt_id={"id": "1"})
+    await client.startup()
+    assert client.warmer.running
+    await asyncio.sleep(0.1)
+    await client.close()
+    assert not client.warmer.running
+    assert client.warmer.refreshes > 0
+    assert len(client.http_backend.urls) >= client.warmer.refreshes + 1
+
+
+@pytest.mark.asyncio
+async def test_cold_keys_are_not_warmed(event_loop):
+    client = build_client(RESPONSE_CACHE_WARM_AHEAD=3600, RESPONSE_CACHE_WARM_TOP_K=5)
+    # a key read once is tracked but never warmed
+    await client.retrieve(opt_id={"id": "2"})
+    assert len(client.warmer) == 1
+    assert client.warmer.get_hot_keys() == []
+    for _ in range(4):
+        assert await client.warmer.refresh_due() == 0
+    # and is dropped once its decayed access count is low enough
+    assert len(client.warmer) == 0
+    assert len(client.http_backend.urls) == 1
+
+    # keys not read within the idle timeout are dropped as well
+    for _ in range(3):
+        await client.retrieve(opt_id={"id": "3"})
+    client.warmer.idle_timeout = 10
+    client.warmer.decay(time.time() + 11)
+    assert len(client.warmer) == 0
+
+
+def test_app_lifecycle():
+    lifecycle_app = FastAPI()
+    client = build_client(lifecycle_app)
+    with TestClient(lifecycle_app):
+        assert client.warmer.running
+    assert not client.warmer.running
+
+
+def test_app_lifecycle_only_with_background_tasks():
+    lifecycle_app = FastAPI()
+    for _ in range(10):
+        build_counting_client(ResourceID, {"RESPONSE_CACHE": True}, app=lifecycle_app)
+    # clients without warmer or snapshot do not keep themselves alive through the app
+    assert len(lifecycle_app.router.on_startup) == 0
+    assert len(lifecycle_app.router.on_shutdown) == 0
+
+    client = build_client(lifecycle_app)
+    client.setup_app(lifecycle_app)
+    assert len(lifecycle_app.router.on_startup) == 1
+    assert len(lifecycle_app.router.on_shutdown) == 1
+
+
+if __name__ == '__main__':
+    pytest.main([os.path.basename(__file__)])